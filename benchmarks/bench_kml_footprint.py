@@ -0,0 +1,56 @@
+"""Benchmark reading a map overlay KML footprint in-process against converting it with an ogr2ogr subprocess"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from subprocess import PIPE, run
+
+from osgeo import ogr
+
+from hyp3_gamma.dem import get_geometry_from_kml
+
+
+def ogr2ogr_geometry_from_kml(kml_file: str) -> ogr.Geometry:
+    """The original implementation of `get_geometry_from_kml`, for comparison"""
+    cmd = ['ogr2ogr', '-f', 'GeoJSON', '-mapfieldtype', 'DateTime=String', '/vsistdout', kml_file]
+    geojson = json.loads(run(cmd, stdout=PIPE, check=True).stdout)
+    geometry = geojson['features'][0]['geometry']
+    longitudes = [point[0] for point in geometry['coordinates'][0]]
+    if any(lon < -160 for lon in longitudes) and any(160 < lon for lon in longitudes):
+        for point in geometry['coordinates'][0]:
+            if point[0] < 0:
+                point[0] += 360
+    return ogr.CreateGeometryFromJson(json.dumps(geometry))
+
+
+def time_it(function, kml_file: str, repeat: int) -> tuple[ogr.Geometry, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        geometry = function(kml_file)
+    return geometry, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'kml_files',
+        nargs='*',
+        default=sorted(str(path) for path in (Path(__file__).parents[1] / 'tests' / 'data').glob('*.kml')),
+        help='Map overlay KML files (default: the KML files in tests/data)',
+    )
+    parser.add_argument('--repeat', type=int, default=20, help='Number of times to read each file')
+    args = parser.parse_args()
+
+    for kml_file in args.kml_files:
+        expected, subprocess_seconds = time_it(ogr2ogr_geometry_from_kml, kml_file, args.repeat)
+        geometry, in_process_seconds = time_it(get_geometry_from_kml, kml_file, args.repeat)
+        assert geometry.Equals(expected), f'{kml_file}: {geometry.ExportToWkt()} != {expected.ExportToWkt()}'
+        print(
+            f'{Path(kml_file).name}: ogr2ogr {subprocess_seconds * 1e3:.2f} ms, '
+            f'in-process {in_process_seconds * 1e3:.3f} ms ({subprocess_seconds / in_process_seconds:.0f}x)'
+        )
+
+
+if __name__ == '__main__':
+    main()
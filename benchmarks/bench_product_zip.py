@@ -0,0 +1,91 @@
+"""Benchmark zipping an RTC product directory with every member deflated vs. storing already-compressed members"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from zipfile import ZIP_STORED, ZipFile
+
+from hyp3_gamma.packaging import COMPRESSION_CHOICES, make_product_zip
+
+
+# (suffix, size relative to a backscatter GeoTIFF, whether the file is already compressed)
+RTC_PRODUCT_FILES = [
+    ('_VV.tif', 1.0, True),
+    ('_VH.tif', 1.0, True),
+    ('_area.tif', 1.0, True),
+    ('_inc_map.tif', 1.0, True),
+    ('_dem.tif', 0.5, True),
+    ('_ls_map.tif', 0.1, True),
+    ('_rgb.tif', 0.3, True),
+    ('.png', 0.01, True),
+    ('_rgb.png', 0.01, True),
+    ('.kmz', 0.01, True),
+    ('_rgb.kmz', 0.01, True),
+    ('.png.aux.xml', 0.00001, False),
+    ('_VV.xml', 0.0002, False),
+    ('_VH.xml', 0.0002, False),
+    ('.README.md.txt', 0.0001, False),
+    ('.log', 0.0005, False),
+    ('_shape.shp', 0.000001, False),
+]
+
+
+def synthetic_rtc_product(directory: Path, backscatter_size: int) -> Path:
+    """Write a product directory with the members and sizes of a 30 m RTC product
+
+    Already-compressed members (DEFLATE COGs, PNGs, KMZs) are filled with random bytes, which deflate about as badly;
+    text members are filled with repeated metadata-like lines.
+    """
+    product_dir = directory / 'S1A_IW_20230101T000000_DVP_RTC30_G_gpuned_ABCD'
+    product_dir.mkdir()
+    chunk_size = 64 * 1024 * 1024
+    for suffix, relative_size, compressed in RTC_PRODUCT_FILES:
+        size = max(int(backscatter_size * relative_size), 100)
+        with open(product_dir / f'{product_dir.name}{suffix}', 'wb') as f:
+            while size > 0:
+                n = min(size, chunk_size)
+                f.write(os.urandom(n) if compressed else (b'<gmd:value>0.123456789</gmd:value>\n' * (n // 35 + 1))[:n])
+                size -= n
+    return product_dir
+
+
+def time_it(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--product-dir', type=Path, help='Product directory to zip; defaults to a synthetic product')
+    parser.add_argument(
+        '--backscatter-size',
+        type=int,
+        default=220,
+        help='Size of each synthetic backscatter GeoTIFF in MB; the default is typical of a 30 m RTC product',
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.product_dir is None:
+            product_dir = synthetic_rtc_product(Path(tmp_dir), args.backscatter_size * 1024 * 1024)
+        else:
+            product_dir = Path(tmp_dir) / args.product_dir.name
+            product_dir.symlink_to(args.product_dir.resolve(), target_is_directory=True)
+
+        total_size = sum(path.stat().st_size for path in product_dir.iterdir())
+        print(f'{product_dir.name}: {len(list(product_dir.iterdir()))} files, {total_size / 1e6:.1f} MB')
+
+        for compression in COMPRESSION_CHOICES:
+            zip_file, seconds = time_it(make_product_zip, product_dir, compression=compression)
+            with ZipFile(zip_file) as z:
+                stored = sum(1 for info in z.infolist() if info.compress_type == ZIP_STORED and not info.is_dir())
+            size = os.path.getsize(zip_file)
+            print(f'{compression:8s} {seconds:8.2f} s  {size / 1e6:10.1f} MB  ({stored} members stored)')
+            os.remove(zip_file)
+
+
+if __name__ == '__main__':
+    main()
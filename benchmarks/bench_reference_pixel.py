@@ -0,0 +1,71 @@
+"""Benchmark the reference pixel search against the original generic_filter implementation"""
+
+import argparse
+import time
+
+import numpy as np
+import scipy.ndimage
+
+from hyp3_gamma.insar.unwrapping_geocoding import get_reference_pixel
+
+
+def generic_filter_reference_pixel(coherence: np.ndarray, window_size=(5, 5), coherence_threshold=0.3):
+    def sum_valid_coherence_values(array: np.ndarray) -> float:
+        if (array < coherence_threshold).any() or (array == np.float64(1.0)).any():
+            return 0.0
+        return array.sum()
+
+    pixel_weights = scipy.ndimage.generic_filter(
+        input=coherence,
+        function=sum_valid_coherence_values,
+        size=window_size,
+        mode='constant',
+        cval=0.0,
+    )
+    x, y = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+    return int(x), int(y)
+
+
+def synthetic_coherence(lines: int, samples: int, seed: int = 0) -> np.ndarray:
+    """Smooth, spatially correlated coherence with low-coherence patches, like a GAMMA `.cc` file"""
+    rng = np.random.default_rng(seed)
+    coherence = scipy.ndimage.gaussian_filter(rng.random((lines, samples), dtype=np.float32), sigma=4)
+    coherence = (coherence - coherence.min()) / (coherence.max() - coherence.min())
+    coherence[rng.random((lines, samples)) < 0.01] = 0.0
+    return coherence.astype('>f4')
+
+
+def time_it(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--shape',
+        type=int,
+        nargs=2,
+        default=(6750, 6800),
+        metavar=('LINES', 'SAMPLES'),
+        help='Size of the synthetic coherence array; the default is a typical 10x2-look interferogram',
+    )
+    parser.add_argument('--skip-generic-filter', action='store_true', help='Only time the vectorized search')
+    args = parser.parse_args()
+
+    coherence = synthetic_coherence(*args.shape)
+    print(f'Coherence array: {coherence.shape[0]} lines x {coherence.shape[1]} samples')
+
+    pixel, seconds = time_it(get_reference_pixel, coherence)
+    print(f'vectorized:     {seconds:10.2f} s  -> {pixel}')
+
+    if not args.skip_generic_filter:
+        expected, legacy_seconds = time_it(generic_filter_reference_pixel, coherence)
+        print(f'generic_filter: {legacy_seconds:10.2f} s  -> {expected}')
+        print(f'speedup:        {legacy_seconds / seconds:10.1f}x')
+        assert pixel == expected, 'Reference pixels differ!'
+
+
+if __name__ == '__main__':
+    main()
@@ -7,15 +7,14 @@ import sys
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from importlib.metadata import entry_points
 from pathlib import Path
-from shutil import make_archive
 
-from hyp3lib.aws import upload_file_to_s3
 from hyp3lib.fetch import write_credentials_to_netrc_file
-from hyp3lib.image import create_thumbnail
 from hyp3lib.util import string_is_true
 
 from hyp3_gamma import util
-from hyp3_gamma.insar.ifm_sentinel import insar_sentinel_gamma
+from hyp3_gamma.aws import upload_product_to_s3
+from hyp3_gamma.insar.ifm_sentinel import get_copol, insar_sentinel_gamma
+from hyp3_gamma.packaging import make_product_zip
 from hyp3_gamma.rtc.rtc_sentinel import rtc_sentinel_gamma
 
 
@@ -106,17 +105,15 @@ def rtc():
         include_rgb=args.include_rgb,
         dem_name=args.dem_name,
     )
-    output_zip = make_archive(base_name=product_name, format='zip', base_dir=product_name)
-
+    product_dir = Path(product_name)
+    # the thumbnails are uploaded alongside the zip file, but aren't included in it
+    zip_files = sorted(path for path in product_dir.iterdir() if not path.name.endswith('_thumb.png'))
     if args.bucket:
-        product_dir = Path(product_name)
-        for browse in product_dir.glob('*.png'):
-            create_thumbnail(browse, output_dir=product_dir)
-
-        upload_file_to_s3(Path(output_zip), args.bucket, args.bucket_prefix)
-
-        for product_file in product_dir.iterdir():
-            upload_file_to_s3(product_file, args.bucket, args.bucket_prefix)
+        # the zip file is streamed straight to S3; make_asf_browse already made the thumbnails of its browse images
+        util.create_thumbnails(product_dir)
+        upload_product_to_s3(product_dir, args.bucket, args.bucket_prefix, zip_files=zip_files)
+    else:
+        make_product_zip(product_dir, files=zip_files)
 
 
 def phase_filter_valid_range(x: str) -> float:
@@ -162,7 +159,10 @@ def insar():
     write_credentials_to_netrc_file(username, password)
 
     with concurrent.futures.ProcessPoolExecutor() as executor:
-        downloaded_granules = [granule for granule in executor.map(util.get_granule, args.granules)]
+        futures = [
+            executor.submit(util.get_granule, granule, polarizations=[get_copol(granule)]) for granule in args.granules
+        ]
+        downloaded_granules = [future.result() for future in futures]
     reference_granule, secondary_granule = util.earlier_granule_first(*downloaded_granules)
 
     rlooks, alooks = (20, 4) if args.looks == '20x4' else (10, 2)
@@ -181,17 +181,15 @@ def insar():
         phase_filter_parameter=args.phase_filter_parameter,
     )
 
-    output_zip = make_archive(base_name=product_name, format='zip', base_dir=product_name)
-
+    product_dir = Path(product_name)
+    # the thumbnails are uploaded alongside the zip file, but aren't included in it
+    zip_files = sorted(path for path in product_dir.iterdir() if not path.name.endswith('_thumb.png'))
     if args.bucket:
-        product_dir = Path(product_name)
-        for browse in product_dir.glob('*.png'):
-            create_thumbnail(browse, output_dir=product_dir)
-
-        upload_file_to_s3(Path(output_zip), args.bucket, args.bucket_prefix)
-
-        for product_file in product_dir.iterdir():
-            upload_file_to_s3(product_file, args.bucket, args.bucket_prefix)
+        # the zip file is streamed straight to S3; make_asf_browse already made the thumbnails of its browse images
+        util.create_thumbnails(product_dir)
+        upload_product_to_s3(product_dir, args.bucket, args.bucket_prefix, zip_files=zip_files)
+    else:
+        make_product_zip(product_dir, files=zip_files)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,264 @@
+"""Upload product files to AWS S3"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable
+from urllib.parse import urlencode
+
+import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from hyp3lib.aws import get_content_type, get_tag_set
+
+from hyp3_gamma.packaging import write_product_zip
+from hyp3_gamma.task_runner import TaskRunner
+
+
+log = logging.getLogger(__name__)
+
+
+def _get_extra_args(key: str) -> dict:
+    tags = {tag['Key']: tag['Value'] for tag in get_tag_set(Path(key).name)['TagSet']}
+    return {'ContentType': get_content_type(key), 'Tagging': urlencode(tags)}
+
+
+class S3MultipartWriter:
+    """Writable, non-seekable file object that streams its content to S3 as a multipart upload.
+
+    Parts are uploaded in the background as soon as `part_size` bytes have been written, with at most
+    `max_concurrency` parts buffered or in flight at once. The upload is completed when the `with` block exits, or
+    aborted if it exits with an exception.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        key: str,
+        extra_args: dict | None = None,
+        part_size: int = 16 * 1024 * 1024,
+        max_concurrency: int = 4,
+    ):
+        """Args:
+        s3_client: boto3 S3 client
+        bucket: S3 bucket
+        key: S3 key
+        extra_args: extra arguments for `create_multipart_upload`, e.g. `ContentType`
+        part_size: size of each part (other than the last), in bytes; at least 5 MB
+        max_concurrency: maximum number of parts to upload at once
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.extra_args = extra_args or {}
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self._buffer = bytearray()
+        self._parts: dict[Future, int] = {}
+        self._etags: dict[int, str] = {}
+        self._upload_id: str | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __enter__(self):
+        response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra_args)
+        self._upload_id = response['UploadId']
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        completed = False
+        try:
+            if exc_type is None:
+                self._complete()
+                completed = True
+        finally:
+            assert self._executor is not None
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            if not completed:
+                self._abort()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, body: bytes):
+        self._wait(self.max_concurrency - 1)
+        assert self._executor is not None
+        part_number = len(self._parts) + len(self._etags) + 1
+        future = self._executor.submit(
+            self.s3_client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts[future] = part_number
+
+    def _wait(self, max_in_flight: int):
+        while len(self._parts) > max_in_flight:
+            done, _ = wait(self._parts, return_when=FIRST_COMPLETED)
+            for future in done:
+                part_number = self._parts.pop(future)
+                self._etags[part_number] = future.result()['ETag']
+
+    def _complete(self):
+        if self._buffer or not (self._parts or self._etags):
+            self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        self._wait(0)
+        parts = [{'ETag': etag, 'PartNumber': part_number} for part_number, etag in sorted(self._etags.items())]
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': parts}
+        )
+
+    def _abort(self):
+        log.warning(f'Aborting upload of s3://{self.bucket}/{self.key}')
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+
+
+class S3Uploader:
+    """Upload files to S3 concurrently through a single client and connection pool.
+
+    Uploads keep the behavior of `hyp3lib.aws.upload_file_to_s3`: each file is uploaded to `<prefix>/<file name>` with
+    its guessed content type and a `file_type` tag. Files larger than 8 MB are sent as multipart uploads.
+    """
+
+    def __init__(self, max_workers: int = 8, multipart_concurrency: int = 4, retries: int = 3, s3_client=None):
+        """Args:
+        max_workers: maximum number of files to upload at once
+        multipart_concurrency: maximum number of parts of each multipart upload to send at once
+        retries: maximum number of attempts for each request, and for each file upload as a whole
+        s3_client: boto3 S3 client to use; defaults to a client with a connection for every concurrent part
+        """
+        self.max_workers = max_workers
+        self.multipart_concurrency = multipart_concurrency
+        self.retries = retries
+        self.transfer_config = TransferConfig(max_concurrency=multipart_concurrency)
+        if s3_client is None:
+            config = Config(
+                max_pool_connections=(max_workers + 1) * multipart_concurrency,
+                retries={'max_attempts': retries, 'mode': 'standard'},
+            )
+            s3_client = boto3.client('s3', config=config)
+        self.s3_client = s3_client
+
+    def _retry(self, description: str, function: Callable, *args, **kwargs):
+        attempt = 1
+        while True:
+            log.info(description)
+            try:
+                return function(*args, **kwargs)
+            except (S3UploadFailedError, BotoCoreError, ClientError) as e:
+                if attempt >= self.retries:
+                    raise
+                log.warning(f'{description} failed (attempt {attempt} of {self.retries}): {e}')
+                time.sleep(2**attempt)
+                attempt += 1
+
+    def upload_file(self, path_to_file: Path, bucket: str, prefix: str = '') -> str:
+        """Upload a file, retrying the whole upload if it fails
+
+        Returns:
+            the S3 key of the uploaded file
+        """
+        key = str(Path(prefix) / path_to_file.name)
+        self._retry(
+            f'Uploading s3://{bucket}/{key}',
+            self.s3_client.upload_file,
+            str(path_to_file),
+            bucket,
+            key,
+            ExtraArgs=_get_extra_args(key),
+            Config=self.transfer_config,
+        )
+        return key
+
+    def upload_files(self, paths: Iterable[Path], bucket: str, prefix: str = '') -> list[str]:
+        """Upload files concurrently
+
+        Returns:
+            the S3 keys of the uploaded files, in the order of `paths`
+        """
+        tasks = TaskRunner(max_workers=self.max_workers)
+        names = [tasks.add(str(path), self.upload_file, Path(path), bucket, prefix) for path in paths]
+        results = tasks.run()
+        return [results[name] for name in names]
+
+    def _stream_product_zip(self, product_dir: Path, files: list[Path] | None, bucket: str, key: str):
+        with S3MultipartWriter(
+            self.s3_client,
+            bucket,
+            key,
+            _get_extra_args(key),
+            max_concurrency=self.multipart_concurrency,
+        ) as writer:
+            write_product_zip(writer, product_dir, files)
+
+    def upload_product_zip(
+        self, product_dir: Path, bucket: str, prefix: str = '', files: Iterable[Path] | None = None
+    ) -> str:
+        """Zip a product directory straight to S3, without writing the zip file to disk
+
+        The zip file is uploaded as `<prefix>/<product_dir name>.zip`; see `hyp3_gamma.packaging.write_product_zip`.
+
+        Returns:
+            the S3 key of the zip file
+        """
+        product_dir = Path(product_dir)
+        key = str(Path(prefix) / f'{product_dir.name}.zip')
+        files = list(files) if files is not None else None
+        self._retry(
+            f'Streaming {product_dir} to s3://{bucket}/{key}', self._stream_product_zip, product_dir, files, bucket, key
+        )
+        return key
+
+    def upload_product(
+        self, product_dir: Path, bucket: str, prefix: str = '', zip_files: Iterable[Path] | None = None
+    ) -> list[str]:
+        """Upload a product zip file and every file in the product directory, all at once
+
+        The zip file is streamed to S3 (see `upload_product_zip`) while the individual files are uploaded, so the
+        product is never duplicated on disk.
+
+        Args:
+            product_dir: Product directory
+            bucket: S3 bucket
+            prefix: S3 prefix
+            zip_files: Files in `product_dir` to include in the zip file; defaults to all of them
+
+        Returns:
+            the S3 keys of the zip file and then each product file
+        """
+        product_dir = Path(product_dir)
+        tasks = TaskRunner(max_workers=self.max_workers)
+        names = [tasks.add(f'{product_dir}.zip', self.upload_product_zip, product_dir, bucket, prefix, zip_files)]
+        for path in sorted(product_dir.iterdir()):
+            names.append(tasks.add(str(path), self.upload_file, path, bucket, prefix))
+        results = tasks.run()
+        return [results[name] for name in names]
+
+
+def upload_files_to_s3(paths: Iterable[Path], bucket: str, prefix: str = '') -> list[str]:
+    """Upload files to S3 concurrently; see `S3Uploader`"""
+    return S3Uploader().upload_files(paths, bucket, prefix)
+
+
+def upload_product_to_s3(
+    product_dir: Path, bucket: str, prefix: str = '', zip_files: Iterable[Path] | None = None
+) -> list[str]:
+    """Stream a product zip file to S3 while uploading the product files; see `S3Uploader.upload_product`"""
+    return S3Uploader().upload_product(product_dir, bucket, prefix, zip_files)
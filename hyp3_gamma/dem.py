@@ -1,10 +1,16 @@
 import json
+import math
 from pathlib import Path
-from subprocess import PIPE, run
+from tempfile import TemporaryDirectory
 
 import numpy as np
-from hyp3lib import dem
-from osgeo import ogr
+from hyp3lib import DemError, dem
+from lxml import etree
+from osgeo import gdal, ogr
+from pyproj import Transformer
+
+from hyp3_gamma.tile_cache import tile_paths
+from hyp3_gamma.util import GDALConfigManager
 
 
 def crosses_antimeridian(geometry: dict) -> bool:
@@ -14,16 +20,32 @@ def crosses_antimeridian(geometry: dict) -> bool:
     return any(lon < -160 for lon in longitudes) and any(160 < lon for lon in longitudes)
 
 
-def get_geometry_from_kml(kml_file: str) -> ogr.Geometry:
-    cmd = ['ogr2ogr', '-f', 'GeoJSON', '-mapfieldtype', 'DateTime=String', '/vsistdout', kml_file]
-    geojson_str = run(cmd, stdout=PIPE, check=True).stdout
-    geojson = json.loads(geojson_str)
-    geometry = geojson['features'][0]['geometry']
+def get_footprint_from_kml(kml_file: str | Path) -> dict:
+    """Read the footprint of a Sentinel-1 map overlay KML (`preview/map-overlay.kml`) as a GeoJSON polygon
+
+    The footprint is the ring of the four corners in the `gx:LatLonQuad` element, read in-process with lxml; this gives
+    the same polygon as converting the KML to GeoJSON with `ogr2ogr`, without starting a process. Longitudes are
+    unwrapped to beyond +180 degrees if the footprint crosses the antimeridian.
+
+    Args:
+        kml_file: Path to the KML file
+    """
+    coordinates = etree.parse(str(kml_file)).find('.//{*}LatLonQuad/{*}coordinates')
+    if coordinates is None or not coordinates.text:
+        raise ValueError(f'No gx:LatLonQuad coordinates found in {kml_file}')
+
+    ring = [[float(value) for value in point.split(',')[:2]] for point in coordinates.text.split()]
+    ring.append(list(ring[0]))
+    geometry = {'type': 'Polygon', 'coordinates': [ring]}
     if crosses_antimeridian(geometry):
-        for point in geometry['coordinates'][0]:
+        for point in ring:
             if point[0] < 0:
                 point[0] += 360
-    return ogr.CreateGeometryFromJson(json.dumps(geometry))
+    return geometry
+
+
+def get_geometry_from_kml(kml_file: str | Path) -> ogr.Geometry:
+    return ogr.CreateGeometryFromJson(json.dumps(get_footprint_from_kml(kml_file)))
 
 
 def get_buffer_distance(lat_in_dd: float, buffer_in_km: float) -> tuple[float, float]:
@@ -62,28 +84,94 @@ def utm_from_lon_lat(lon: float, lat: float) -> int:
     return hemisphere + zone
 
 
+def get_dem_grid(geometry: ogr.Geometry) -> tuple[int, float]:
+    """Get the UTM EPSG code and buffer in degrees of the DEM mosaic `prepare_dem_geotiff` creates for a geometry"""
+    centroid = geometry.Centroid()
+
+    buffer_distance_km = 25.0
+    buffer_in_degrees = get_buffer_in_degrees_for(geometry, buffer_distance_km)
+
+    epsg_code = utm_from_lon_lat(centroid.GetX(), centroid.GetY())
+    return epsg_code, buffer_in_degrees
+
+
+def get_dem_bounds(geometry: ogr.Geometry, pixel_size: float) -> tuple[int, list[float]]:
+    """Get the UTM EPSG code and bounds [min x, min y, max x, max y] of the DEM mosaic `prepare_dem_geotiff` creates
+
+    As in `gdal.Warp`, the lower left and upper right corners of the buffered geometry's envelope are transformed to
+    UTM, and the bounds are then extended to multiples of the pixel size (`targetAlignedPixels`).
+    """
+    epsg_code, buffer_in_degrees = get_dem_grid(geometry)
+    minx, maxx, miny, maxy = geometry.Buffer(buffer_in_degrees).GetEnvelope()
+    transformer = Transformer.from_crs('EPSG:4326', f'EPSG:{epsg_code}', always_xy=True)
+    min_x, min_y = transformer.transform(minx, miny)
+    max_x, max_y = transformer.transform(maxx, maxy)
+    bounds = [
+        math.floor(min_x / pixel_size) * pixel_size,
+        math.floor(min_y / pixel_size) * pixel_size,
+        math.ceil(max_x / pixel_size) * pixel_size,
+        math.ceil(max_y / pixel_size) * pixel_size,
+    ]
+    return epsg_code, [float(bound) for bound in bounds]
+
+
+def get_dem_tile_paths(geometry: ogr.Geometry) -> list[str]:
+    """Get the paths of the Copernicus GLO-30 Public DEM tiles that intersect a geometry in EPSG:4326 (lon/lat)"""
+    ds = ogr.Open(dem.DEM_GEOJSON)
+    layer = ds.GetLayer()
+    file_paths = [feature.GetField('file_path') for feature in layer if feature.GetGeometryRef().Intersects(geometry)]
+    del ds
+    return file_paths
+
+
 def prepare_dem_geotiff(output_name: str, geometry: ogr.Geometry, pixel_size: float = 30.0) -> None:
     """Create a DEM mosaic GeoTIFF covering a given geometry.
 
     The DEM mosaic is assembled from the Copernicus GLO-30 Public DEM. The output GeoTIFF covers the input geometry
     buffered by 25km, is projected to the UTM zone of the geometry centroid, and has a pixel size of 30m.
 
+    This follows `hyp3lib.dem.prepare_dem_geotiff`, but the DEM tiles are read through the node-local tile cache if
+    one is configured (see `tile_cache.TileCache.from_environment`).
+
     Args:
         output_name: Path for the output GeoTIFF
         geometry: Geometry in EPSG:4326 (lon/lat) projection for which to prepare a DEM mosaic
         pixel_size: Pixel size for the output GeoTIFF in meters
 
     """
-    centroid = geometry.Centroid()
-
-    buffer_distance_km = 25.0
-    buffer_in_degrees = get_buffer_in_degrees_for(geometry, buffer_distance_km)
-
-    epsg_code = utm_from_lon_lat(centroid.GetX(), centroid.GetY())
-    dem.prepare_dem_geotiff(
-        Path(output_name),
-        geometry,
-        epsg_code=epsg_code,
-        pixel_size=pixel_size,
-        buffer_size_in_degrees=buffer_in_degrees,
-    )
+    if geometry.GetGeometryName() != 'POLYGON':
+        raise DemError(f'{geometry.GetGeometryName()} geometry is invalid; only POLYGON is supported.')
+
+    epsg_code, buffer_in_degrees = get_dem_grid(geometry)
+    buffered_geometry = geometry.Buffer(buffer_in_degrees)
+    minx, maxx, miny, maxy = buffered_geometry.GetEnvelope()
+    if not (-200 <= minx <= maxx <= 200):
+        raise DemError(f'Extent of buffered geometry ({minx} - {maxx}) is not between -200 and +200 degrees longitude.')
+
+    if not get_dem_tile_paths(geometry):
+        raise DemError(f'Copernicus GLO-30 Public DEM does not intersect this geometry: {geometry}')
+
+    with (
+        GDALConfigManager(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'),
+        TemporaryDirectory() as temp_dir,
+        tile_paths(get_dem_tile_paths(buffered_geometry)) as dem_file_paths,
+    ):
+        dem_vrt = str(Path(temp_dir) / 'dem.vrt')
+        gdal.BuildVRT(dem_vrt, dem_file_paths)
+        # This is required to ensure the VRT is treated as a point dataset
+        vrt_ds = gdal.Open(dem_vrt, gdal.GA_Update)
+        vrt_ds.SetMetadataItem('AREA_OR_POINT', 'Point')
+        vrt_ds = None
+        gdal.Warp(
+            str(output_name),
+            dem_vrt,
+            dstSRS=f'EPSG:{epsg_code}',
+            outputBoundsSRS='EPSG:4326',
+            outputBounds=[minx, miny, maxx, maxy],
+            xRes=pixel_size,
+            yRes=pixel_size,
+            targetAlignedPixels=True,
+            resampleAlg='cubic',
+            multithread=True,
+            format='GTiff',
+        )
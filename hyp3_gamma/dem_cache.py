@@ -0,0 +1,163 @@
+"""Node-local cache of prepared DEMs, shared by the jobs running on a node"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from tempfile import mkdtemp
+
+from osgeo import ogr
+
+from hyp3_gamma.dem import get_dem_bounds
+from hyp3_gamma.util import file_lock
+
+
+log = logging.getLogger(__name__)
+
+DEM_VERSION = 'GLO-30+egm2008-5'
+DEFAULT_MAX_BYTES = 20 * 2**30
+
+
+class DemCache:
+    """A size-bounded, least-recently-used cache of DEM files in a directory
+
+    Each entry is a subdirectory named by its key, holding the files of one prepared DEM. Entries are written to a
+    temporary directory and renamed into place, so a partial entry is never used. A lock file per key makes concurrent
+    jobs that need the same DEM build it only once, and eviction skips entries that are in use.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Args:
+        directory: Directory to store the cache in; created if it doesn't exist
+        max_bytes: Total size of the cache entries above which the least recently used entries are evicted
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls) -> 'DemCache | None':
+        """Get the cache configured by `HYP3_DEM_CACHE` and `HYP3_DEM_CACHE_MAX_BYTES`, or None if it's not set"""
+        directory = os.environ.get('HYP3_DEM_CACHE')
+        if not directory:
+            return None
+        max_bytes = int(os.environ.get('HYP3_DEM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return cls(directory, max_bytes)
+
+    @staticmethod
+    def get_key(geometry: ogr.Geometry, pixel_size: float) -> str:
+        """Get the cache key of a Copernicus DEM prepared by `dem.prepare_dem_geotiff` and `dem_import`
+
+        The key is a hash of the output EPSG code, bounds, and pixel size (see `dem.get_dem_bounds`), and the DEM and
+        geoid versions, which together determine the prepared DEM. Acquisitions of the same frame on different dates
+        usually have slightly different footprints, but the same DEM grid, so they share a cache entry.
+        """
+        epsg_code, bounds = get_dem_bounds(geometry, pixel_size)
+        parameters = {
+            'epsg': epsg_code,
+            'bounds': bounds,
+            'pixel_size': float(pixel_size),
+            'version': DEM_VERSION,
+        }
+        return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+    def get_or_create(self, key: str, files: Mapping[str, str | Path], create: Callable[[], None]) -> bool:
+        """Copy a cache entry's files to their local paths, creating the entry if it doesn't exist
+
+        Args:
+            key: Cache key, e.g. from `get_key`
+            files: Local path of each of the entry's files, by name within the entry
+            create: Function that creates the local files when the entry doesn't exist
+
+        Returns:
+            Whether the files were found in the cache
+        """
+        entry = self.directory / key
+        with file_lock(self._lock_file(key)):
+            if entry.is_dir():
+                log.info(f'Using cached DEM {entry}')
+                for name, path in files.items():
+                    shutil.copyfile(entry / name, path)
+                os.utime(entry)
+                return True
+
+            create()
+            temp_dir = Path(mkdtemp(dir=self.directory, prefix='.tmp-'))
+            try:
+                for name, path in files.items():
+                    shutil.copyfile(path, temp_dir / name)
+                temp_dir.rename(entry)
+            except BaseException:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                raise
+            log.info(f'Cached DEM in {entry}')
+
+        try:
+            self.evict()
+        except OSError as e:
+            log.warning(f'Failed to evict cached DEMs from {self.directory}: {e}')
+        return False
+
+    def evict(self) -> list[str]:
+        """Remove least recently used entries until the cache fits in `max_bytes`, skipping entries that are in use
+
+        Returns:
+            The keys of the removed entries
+        """
+        mtimes, sizes = {}, {}
+        for entry in self.directory.iterdir():
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            try:
+                mtimes[entry] = entry.stat().st_mtime
+                sizes[entry] = sum(file.stat().st_size for file in entry.iterdir())
+            except FileNotFoundError:
+                # evicted by another job while the cache was scanned
+                mtimes.pop(entry, None)
+        entries = sorted(mtimes, key=mtimes.__getitem__)
+        total = sum(sizes.values())
+
+        evicted = []
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            with file_lock(self._lock_file(entry.name), blocking=False) as locked:
+                if not locked or not entry.is_dir():
+                    continue
+                shutil.rmtree(entry)
+            log.info(f'Evicted cached DEM {entry}')
+            total -= sizes[entry]
+            evicted.append(entry.name)
+        return evicted
+
+    def _lock_file(self, key: str) -> Path:
+        return self.directory / f'.{key}.lock'
+
+
+def get_or_create_dem(
+    geometry: ogr.Geometry,
+    pixel_size: float,
+    dem_tif: str | Path,
+    dem_image: str | Path,
+    dem_par: str | Path,
+    create: Callable[[], None],
+) -> None:
+    """Get a prepared Copernicus DEM from the cache configured by the environment, or create it
+
+    Args:
+        geometry: Geometry in EPSG:4326 (lon/lat) projection the DEM was prepared for
+        pixel_size: Pixel size of the DEM in meters
+        dem_tif: Local path of the DEM GeoTIFF
+        dem_image: Local path of the GAMMA DEM image
+        dem_par: Local path of the GAMMA DEM parameter file
+        create: Function that creates the three local files; called directly if no cache is configured
+    """
+    cache = DemCache.from_environment()
+    if cache is None:
+        create()
+        return
+    files = {'dem.tif': dem_tif, 'dem.image': dem_image, 'dem.par': dem_par}
+    cache.get_or_create(DemCache.get_key(geometry, pixel_size), files, create)
@@ -0,0 +1,58 @@
+"""Managed subprocessing for GAMMA programs in a working directory
+
+Tracks `hyp3lib.execute.execute` as of hyp3lib 4.0.0, which has no `cwd` parameter; remove this module once it does.
+"""
+
+import os
+import shlex
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TextIO
+
+from hyp3lib import ExecuteError
+from hyp3lib.execute import execute as hyp3lib_execute
+
+
+def execute(
+    cmd: str,
+    expected: str | Path | None = None,
+    logfile: TextIO | None = None,
+    uselogging: bool = False,
+    cwd: str | Path | None = None,
+    env: Mapping[str, object] | None = None,
+) -> str:
+    """Run a command with `hyp3lib.execute.execute`, optionally in another working directory or environment
+
+    The command changes directory and exports variables in its shell instead of the process doing so with `os.chdir`
+    and `os.environ`, so commands can run in different directories and environments concurrently from several threads.
+
+    Args:
+        cmd: The command to subprocess in a shell
+        expected: Ensure an expected file created by the cmd exists; relative to `cwd` if given
+        logfile: A file to to write the cmd's stdout to
+        uselogging: Instead of printing status messages of this function, log them with the logging module
+        cwd: Directory to run the command in; defaults to the current working directory
+        env: Environment variables to set for the command, in addition to the process's own
+
+    Returns:
+        output: The stdout of cmd
+    """
+    prefix = []
+    if cwd is not None:
+        prefix.append(f'cd {shlex.quote(str(cwd))}')
+        if expected is not None:
+            expected = os.path.join(cwd, expected)
+    if env:
+        prefix.append('export ' + ' '.join(f'{name}={shlex.quote(str(value))}' for name, value in env.items()))
+    if not prefix:
+        return hyp3lib_execute(cmd, expected=expected, logfile=logfile, uselogging=uselogging)
+
+    try:
+        return hyp3lib_execute(' && '.join([*prefix, cmd]), expected, logfile, uselogging)
+    except ExecuteError as e:
+        # hyp3lib names the failed tool by the first word of the command, which is now `cd` or `export`
+        shell_tool = prefix[0].split(' ')[0]
+        message = str(e)
+        if not message.startswith(f'{shell_tool}: '):
+            raise
+        raise ExecuteError(f'{cmd.split(" ")[0]}: {message.removeprefix(f"{shell_tool}: ")}') from e
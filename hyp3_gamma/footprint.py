@@ -0,0 +1,69 @@
+"""Footprints of rasters in other coordinate systems, computed from their edges rather than by warping them"""
+
+from pathlib import Path
+
+import numpy as np
+from osgeo import gdal
+from pyproj import CRS, Transformer
+
+
+gdal.UseExceptions()
+
+
+def get_edge_pixels(width: int, height: int, densify_points: int = 21) -> tuple[np.ndarray, np.ndarray]:
+    """Get the pixel and line coordinates of points around the edges of a raster, clockwise from its upper left corner
+
+    Args:
+        width: Number of pixels in the raster
+        height: Number of lines in the raster
+        densify_points: Number of points to add along each edge between its corners
+    """
+    pixels = np.linspace(0, width, densify_points + 2)
+    lines = np.linspace(0, height, densify_points + 2)
+    x = np.concatenate([pixels[:-1], np.full(lines.size - 1, width), pixels[:0:-1], np.zeros(lines.size - 1)])
+    y = np.concatenate([np.zeros(pixels.size - 1), lines[:-1], np.full(pixels.size - 1, height), lines[:0:-1]])
+    return x, y
+
+
+def get_footprint(dataset, dst_crs='EPSG:4326', densify_points: int = 21) -> tuple[np.ndarray, np.ndarray]:
+    """Get the coordinates of points around the edges of a raster in another coordinate system
+
+    The edge points are located with the raster's geotransform, or its GCPs if it has no projection, and transformed
+    with pyproj. Nothing is warped, so this takes microseconds to milliseconds whatever the raster size.
+
+    Args:
+        dataset: Path to the raster, or an open GDAL dataset
+        dst_crs: Coordinate system to get the coordinates in, as accepted by `pyproj.CRS.from_user_input`
+        densify_points: Number of points to add along each edge between its corners, so the footprint follows
+            edges that are curved in `dst_crs`
+
+    Returns:
+        The x (e.g. longitude or easting) and y coordinates of the points
+    """
+    if isinstance(dataset, (str, Path)):
+        dataset = gdal.Open(str(dataset))
+    pixels, lines = get_edge_pixels(dataset.RasterXSize, dataset.RasterYSize, densify_points)
+
+    if not dataset.GetProjection() and dataset.GetGCPCount():
+        gcp_transformer = gdal.Transformer(dataset, None, [])
+        points, _ = gcp_transformer.TransformPoints(0, np.column_stack([pixels, lines]).tolist())
+        x, y = np.asarray(points)[:, :2].T
+        src_crs = CRS.from_wkt(dataset.GetGCPProjection())
+    else:
+        geotransform = dataset.GetGeoTransform()
+        x = geotransform[0] + pixels * geotransform[1] + lines * geotransform[2]
+        y = geotransform[3] + pixels * geotransform[4] + lines * geotransform[5]
+        src_crs = CRS.from_wkt(dataset.GetProjection())
+
+    transformer = Transformer.from_crs(src_crs, CRS.from_user_input(dst_crs), always_xy=True)
+    x, y = transformer.transform(x, y)
+    return np.asarray(x), np.asarray(y)
+
+
+def get_bounds(dataset, dst_crs='EPSG:4326', densify_points: int = 21) -> list[float]:
+    """Get the bounds [min x, min y, max x, max y] of a raster in another coordinate system
+
+    See `get_footprint`; bounds that cross the antimeridian are not unwrapped.
+    """
+    x, y = get_footprint(dataset, dst_crs, densify_points)
+    return [float(x.min()), float(y.min()), float(x.max()), float(y.max())]
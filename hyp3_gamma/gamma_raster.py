@@ -0,0 +1,39 @@
+"""Read-only, memory-mapped access to GAMMA binary raster files"""
+
+import numpy as np
+
+
+# GAMMA binary rasters are headerless, row-major, and big-endian
+FLOAT = np.dtype('>f4')
+FCOMPLEX = np.dtype('>c8')
+BYTE = np.dtype('u1')
+
+
+def open_raster(raster_file: str, lines: int, samples: int, dtype=FLOAT) -> np.memmap:
+    """Open a GAMMA binary raster as a read-only memory-mapped array.
+
+    Only the pages backing the pixels that are actually indexed are read from disk.
+
+    Args:
+        raster_file: GAMMA binary raster file
+        lines: number of lines (rows) in the raster
+        samples: number of samples (columns) in the raster
+        dtype: data type of the raster; `FLOAT`, `FCOMPLEX`, `BYTE`, or any other numpy dtype
+
+    Returns:
+        array of shape (lines, samples) backed by `raster_file`
+    """
+    return np.memmap(raster_file, dtype=dtype, mode='r', shape=(int(lines), int(samples)))
+
+
+def read_pixel(raster_file: str, lines: int, samples: int, line: int, sample: int, dtype=FLOAT):
+    """Read a single pixel value from a GAMMA binary raster"""
+    return open_raster(raster_file, lines, samples, dtype=dtype)[line, sample]
+
+
+def read_window(
+    raster_file: str, lines: int, samples: int, line_slice: slice, sample_slice: slice, dtype=FLOAT
+) -> np.ndarray:
+    """Read a window of a GAMMA binary raster into memory as a native-endian array"""
+    window = open_raster(raster_file, lines, samples, dtype=dtype)[line_slice, sample_slice]
+    return np.array(window, dtype=window.dtype.newbyteorder('='))
@@ -1,25 +1,24 @@
 import logging
-import re
+
+from hyp3_gamma.par_file import ParFile
 
 
 def get_parameter(parFile, parameter, uselogging=False):
-    """Read a value from a par file"""
-    value = None
+    """Read a value from a par file
+
+    The parameter name must match a key in the par file exactly (ignoring case), and the unparsed text of the value,
+    including any units, is returned. Use `hyp3_gamma.par_file.ParFile` to get typed values.
+    """
     try:
-        with open(parFile, 'r') as myfile:
-            parameter = parameter.lower()
-            for line in myfile:
-                if parameter in line.lower():
-                    t = re.split(':', line)
-                    value = t[1].strip()
+        par = ParFile.read(parFile)
     except IOError:
         if uselogging:
             logging.error('Unable to find file {}'.format(parFile))
         raise Exception('ERROR: Unable to find file {}'.format(parFile))
 
-    if value is None:
+    if parameter not in par:
         if uselogging:
-            logging.error('Unable to find parameter {} in file {}'.format(parameter, parFile))
-        raise Exception('ERROR: Unable to find parameter {} in file {}'.format(parameter, parFile))
+            logging.error('Unable to find parameter {} in file {}'.format(parameter.lower(), parFile))
+        raise Exception('ERROR: Unable to find parameter {} in file {}'.format(parameter.lower(), parFile))
 
-    return value
+    return par.text(parameter)
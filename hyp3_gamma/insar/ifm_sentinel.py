@@ -12,13 +12,12 @@ from pathlib import Path
 from secrets import token_hex
 
 from hyp3lib import GranuleError
-from hyp3lib.execute import execute
 from lxml import etree, objectify
 from s1_orbits import fetch_for_scene
 
 import hyp3_gamma
+from hyp3_gamma.execute import execute
 from hyp3_gamma.get_gamma_version import get_gamma_version
-from hyp3_gamma.get_parameter import get_parameter
 from hyp3_gamma.insar.getDemFileGamma import get_dem_file_gamma
 from hyp3_gamma.insar.interf_pwr_s1_lt_tops_proc import interf_pwr_s1_lt_tops_proc
 from hyp3_gamma.insar.par_s1_slc_single import par_s1_slc_single
@@ -26,20 +25,21 @@ from hyp3_gamma.insar.slc_copy_s1_full_sw import slc_copy_s1_full_sw
 from hyp3_gamma.insar.unwrapping_geocoding import unwrapping_geocoding
 from hyp3_gamma.make_asf_browse import make_asf_browse
 from hyp3_gamma.metadata import create_metadata_file_set_insar
+from hyp3_gamma.par_file import ParFile
+from hyp3_gamma.task_runner import TaskRunner
 
 
 log = logging.getLogger(__name__)
 
 
 def get_bursts(mydir, name):
-    back = os.getcwd()
-    os.chdir(os.path.join(mydir, 'annotation'))
+    annotation_dir = os.path.join(mydir, 'annotation')
 
     total_bursts = None
     time = []
-    for myfile in os.listdir('.'):
+    for myfile in os.listdir(annotation_dir):
         if name in myfile:
-            root = etree.parse(myfile)
+            root = etree.parse(os.path.join(annotation_dir, myfile))
             for coord in root.iter('azimuthAnxTime'):
                 text = coord.text
                 assert text is not None
@@ -47,18 +47,21 @@ def get_bursts(mydir, name):
             for count in root.iter('burstList'):
                 total_bursts = int(count.attrib['count'])
 
-    os.chdir(back)
-
     return time, total_bursts
 
 
-def get_burst_overlaps(reference_dir, secondary_dir):
-    log.info(f'Calculating burst overlaps; in directory {os.getcwd()}')
-    burst_tab1 = '%s_burst_tab' % reference_dir[17:25]
-    burst_tab2 = '%s_burst_tab' % secondary_dir[17:25]
+def get_burst_overlaps(reference_dir, secondary_dir, work_dir='.'):
+    """Write the burst tab files for the overlapping bursts of a pair of SAFE directories to `work_dir`
+
+    Returns:
+        The names of the reference and secondary burst tab files
+    """
+    log.info(f'Calculating burst overlaps; in directory {work_dir}')
+    burst_tab1 = '%s_burst_tab' % os.path.basename(reference_dir)[17:25]
+    burst_tab2 = '%s_burst_tab' % os.path.basename(secondary_dir)[17:25]
 
-    with open(burst_tab1, 'w') as f1:
-        with open(burst_tab2, 'w') as f2:
+    with open(os.path.join(work_dir, burst_tab1), 'w') as f1:
+        with open(os.path.join(work_dir, burst_tab2), 'w') as f2:
             for name in ['001.xml', '002.xml', '003.xml']:
                 time1, total_bursts1 = get_bursts(reference_dir, name)
                 log.info(f'total_bursts1, time1 {total_bursts1} {time1}')
@@ -203,68 +206,71 @@ def move_output_files(
     include_wrapped_phase,
     include_inc_map,
     include_dem,
+    work_dir='.',
 ):
     inName = f'{reference}.mli.geo.tif'
     outName = f'{os.path.join(prod_dir, long_output)}_amp.tif'
-    shutil.copy(inName, outName)
+    shutil.copy(os.path.join(work_dir, inName), outName)
 
     inName = 'water_mask.tif'
     outName = f'{os.path.join(prod_dir, long_output)}_water_mask.tif'
-    shutil.copy(inName, outName)
+    shutil.copy(os.path.join(work_dir, inName), outName)
 
     inName = f'{output}.cc.geo.tif'
     outName = f'{os.path.join(prod_dir, long_output)}_corr.tif'
-    if os.path.isfile(inName):
-        shutil.copy(inName, outName)
+    if os.path.isfile(os.path.join(work_dir, inName)):
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     inName = f'{output}.adf.unw.geo.tif'
     outName = f'{os.path.join(prod_dir, long_output)}_unw_phase.tif'
-    shutil.copy(inName, outName)
+    shutil.copy(os.path.join(work_dir, inName), outName)
 
     if include_wrapped_phase:
         inName = f'{output}.diff0.man.adf.geo.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_wrapped_phase.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     if include_dem:
         inName = f'{output}.dem.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_dem.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     if include_displacement_maps:
         inName = f'{output}.los.disp.geo.org.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_los_disp.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
         inName = f'{output}.vert.disp.geo.org.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_vert_disp.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     if include_inc_map:
         inName = f'{output}.inc.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_inc_map.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
         inName = f'{output}.inc_ell.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_inc_map_ell.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     if include_look_vectors:
         inName = f'{output}.lv_theta.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_lv_theta.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
         inName = f'{output}.lv_phi.tif'
         outName = f'{os.path.join(prod_dir, long_output)}_lv_phi.tif'
-        shutil.copy(inName, outName)
+        shutil.copy(os.path.join(work_dir, inName), outName)
 
     make_asf_browse(
-        f'{output}.diff0.man.adf.bmp.geo.tif',
+        os.path.join(work_dir, f'{output}.diff0.man.adf.bmp.geo.tif'),
         f'{os.path.join(prod_dir, long_output)}_color_phase',
         use_nn=True,
+        thumbnail_size=(100, 100),
     )
 
     make_asf_browse(
-        f'{output}.adf.unw.geo.bmp.tif',
+        os.path.join(work_dir, f'{output}.adf.unw.geo.bmp.tif'),
         f'{os.path.join(prod_dir, long_output)}_unw_phase',
         use_nn=True,
+        thumbnail_size=(100, 100),
     )
 
 
@@ -277,31 +283,32 @@ def make_parameter_file(
     coords,
     ref_point_info,
     phase_filter_parameter,
+    work_dir='.',
 ):
+    """Write the InSAR product's parameter (.txt) file
+
+    The SAFE directories, the reference MLI parameter file, and `baseline.log` are read from `work_dir`, and
+    `parameter_file_name` is relative to it.
+    """
     res = 20 * int(alooks)
 
     reference_date = mydir[:15]
     secondary_date = mydir[17:]
     reference_date_short = reference_date[:8]
 
-    log.info(f'In directory {os.getcwd()} looking for file with date {reference_date_short}')
-    reference_file = glob.glob('*%s*.SAFE' % reference_date)[0]
-    secondary_file = glob.glob('*%s*.SAFE' % secondary_date)[0]
+    log.info(f'In directory {work_dir} looking for file with date {reference_date_short}')
+    reference_file = glob.glob(os.path.join(work_dir, '*%s*.SAFE' % reference_date))[0]
+    secondary_file = glob.glob(os.path.join(work_dir, '*%s*.SAFE' % secondary_date))[0]
 
-    parfile = f'{reference_date_short}.mli.par'
-    erad_nadir = get_parameter(parfile, 'earth_radius_below_sensor')
-    erad_nadir = erad_nadir.split()[0]
-    sar_to_earth_center = get_parameter(parfile, 'sar_to_earth_center')
-    sar_to_earth_center = sar_to_earth_center.split()[0]
+    mli_par = ParFile.read(os.path.join(work_dir, f'{reference_date_short}.mli.par'))
+    erad_nadir = mli_par.text('earth_radius_below_sensor').split()[0]
+    sar_to_earth_center = mli_par.text('sar_to_earth_center').split()[0]
     height = float(sar_to_earth_center) - float(erad_nadir)
-    near_slant_range = get_parameter(parfile, 'near_range_slc')
-    near_slant_range = near_slant_range.split()[0]
-    center_slant_range = get_parameter(parfile, 'center_range_slc')
-    center_slant_range = center_slant_range.split()[0]
-    far_slant_range = get_parameter(parfile, 'far_range_slc')
-    far_slant_range = far_slant_range.split()[0]
-
-    with open('baseline.log') as f:
+    near_slant_range = mli_par.text('near_range_slc').split()[0]
+    center_slant_range = mli_par.text('center_range_slc').split()[0]
+    far_slant_range = mli_par.text('far_range_slc').split()[0]
+
+    with open(os.path.join(work_dir, 'baseline.log')) as f:
         for line in f:
             if 'estimated baseline perpendicular component' in line:
                 # FIXME: RE is overly complicated here. this is two simple string splits
@@ -309,13 +316,11 @@ def make_parameter_file(
                 s = re.split(r'\s+', t[1])
                 baseline = float(s[1])
 
-    back = os.getcwd()
-    os.chdir(os.path.join(reference_file, 'annotation'))
-
+    annotation_dir = os.path.join(reference_file, 'annotation')
     utctime = None
-    for myfile in os.listdir('.'):
+    for myfile in os.listdir(annotation_dir):
         if '001.xml' in myfile:
-            root = etree.parse(myfile)
+            root = etree.parse(os.path.join(annotation_dir, myfile))
             for coord in root.iter('productFirstLineUtcTime'):
                 utc = coord.text
                 assert utc is not None
@@ -325,27 +330,18 @@ def make_parameter_file(
                 s = t[1].split(':')
                 log.info(f'{s}')
                 utctime = ((int(s[0]) * 60 + int(s[1])) * 60) + float(s[2])
-    os.chdir(back)
 
-    heading = None
-    name = f'{reference_date[:8]}.mli.par'
-    with open(name) as f:
-        for line in f:
-            if 'heading' in line:
-                t = re.split(':', line)
-                # FIXME: RE is overly complicated here. this is two simple string splits
-                s = re.split(r'\s+', t[1])
-                heading = float(s[1])
+    heading = float(mli_par['heading']) if 'heading' in mli_par else None
 
     reference_orbit_parameters = get_orbit_parameters(reference_file)
     secondary_orbit_parameters = get_orbit_parameters(secondary_file)
 
-    reference_file = reference_file.replace('.SAFE', '')
-    secondary_file = secondary_file.replace('.SAFE', '')
+    reference_file = os.path.basename(reference_file).replace('.SAFE', '')
+    secondary_file = os.path.basename(secondary_file).replace('.SAFE', '')
 
     phase_filter = 'adf' if phase_filter_parameter > 0.0 else 'none'
 
-    with open(parameter_file_name, 'w') as f:
+    with open(os.path.join(work_dir, parameter_file_name), 'w') as f:
         f.write('Reference Granule: %s\n' % reference_file)
         f.write('Secondary Granule: %s\n' % secondary_file)
         f.write('Reference Pass Direction: %s\n' % reference_orbit_parameters['pass_direction'])
@@ -381,6 +377,21 @@ def make_parameter_file(
         f.write('Speckle filter: no\n')
 
 
+def ingest_granule(granule: str, pol: str, work_dir: str = '.') -> str:
+    """Download the orbit file for a granule and ingest the granule into GAMMA format
+
+    `granule` is the name of a SAFE directory in `work_dir`.
+
+    Returns:
+        The orbit file used
+    """
+    log.info(f'Downloading orbit file for {granule}')
+    orbit_file = str(fetch_for_scene(granule, dir=work_dir))
+    log.info(f'Got orbit file {orbit_file} from s1_orbits')
+    par_s1_slc_single(os.path.join(work_dir, granule), pol, os.path.abspath(orbit_file), work_dir=work_dir)
+    return orbit_file
+
+
 def insar_sentinel_gamma(
     reference_file,
     secondary_file,
@@ -393,10 +404,19 @@ def insar_sentinel_gamma(
     include_dem=False,
     apply_water_mask=False,
     phase_filter_parameter=0.6,
+    work_dir='.',
 ):
+    """Create an InSAR product from a pair of Sentinel-1 IW SLC granules
+
+    The granules' SAFE directories are read from, and all intermediate files and the product directory are written to,
+    `work_dir`. The current working directory is never changed.
+
+    Returns:
+        The name of the product directory in `work_dir`
+    """
     log.info('\n\nSentinel-1 differential interferogram creation program\n')
 
-    wrk = os.getcwd()
+    wrk = os.path.abspath(work_dir)
     reference_date = reference_file[17:32]
     reference = reference_file[17:25]
     secondary_date = secondary_file[17:32]
@@ -411,33 +431,39 @@ def insar_sentinel_gamma(
     pol = get_copol(reference_file)
     log.info(f'Processing the {pol} polarization')
 
-    # Ingest the data files into gamma format
-    log.info('Starting par_S1_SLC')
-    orbit_files = []
-    for granule in (reference_file, secondary_file):
-        log.info(f'Downloading orbit file for {granule}')
-        orbit_file = str(fetch_for_scene(granule))
-        log.info(f'Got orbit file {orbit_file} from s1_orbits')
-        par_s1_slc_single(granule, pol, os.path.abspath(orbit_file))
-        orbit_files.append(orbit_file)
-
-    # Fetch the DEM file
-    log.info('Getting a DEM file')
+    # Ingest the data files into gamma format while fetching the DEM file
+    log.info('Starting par_S1_SLC and getting a DEM file')
     dem_source = 'GLO-30'
     dem_pixel_size = int(alooks) * 40  # typically 160 or 80; IFG pixel size will be half the DEM pixel size (80 or 40)
-    get_dem_file_gamma('big.dem', 'big.par', reference_file, pixel_size=dem_pixel_size)
+    tasks = TaskRunner()
+    tasks.add('reference', ingest_granule, reference_file, pol, work_dir=wrk)
+    tasks.add('secondary', ingest_granule, secondary_file, pol, work_dir=wrk)
+    tasks.add(
+        'big.dem',
+        get_dem_file_gamma,
+        os.path.join(wrk, 'big.dem'),
+        os.path.join(wrk, 'big.par'),
+        os.path.join(wrk, reference_file),
+        pixel_size=dem_pixel_size,
+    )
+    results = tasks.run()
+    orbit_files = [results['reference'], results['secondary']]
     log.info(f'Got dem of type {dem_source}')
 
     # Figure out which bursts overlap between the two swaths
-    burst_tab1, burst_tab2 = get_burst_overlaps(reference_file, secondary_file)
-    log.info(f'Finished calculating overlap - in directory {os.getcwd()}')
-    shutil.move(burst_tab1, f'{reference}/{burst_tab1}')
-    shutil.move(burst_tab2, f'{secondary}/{burst_tab2}')
+    burst_tab1, burst_tab2 = get_burst_overlaps(
+        os.path.join(wrk, reference_file), os.path.join(wrk, secondary_file), work_dir=wrk
+    )
+    log.info('Finished calculating overlap')
+    shutil.move(os.path.join(wrk, burst_tab1), os.path.join(wrk, reference, burst_tab1))
+    shutil.move(os.path.join(wrk, burst_tab2), os.path.join(wrk, secondary, burst_tab2))
 
     # Mosaic the swaths together and copy SLCs over
     log.info('Starting slc_copy_s1_full_sw')
-    os.chdir(reference)
-    slc_copy_s1_full_sw(
+    tasks = TaskRunner()
+    tasks.add(
+        'SLC1_tab',
+        slc_copy_s1_full_sw,
         wrk,
         reference,
         'SLC_TAB',
@@ -447,28 +473,42 @@ def insar_sentinel_gamma(
         dempath=wrk,
         raml=rlooks,
         azml=alooks,
+        slc_dir=os.path.join(wrk, reference),
     )
-    os.chdir('..')
-    os.chdir(secondary)
-    slc_copy_s1_full_sw(wrk, secondary, 'SLC_TAB', burst_tab2, mode=2, raml=rlooks, azml=alooks)
-    os.chdir('..')
+    tasks.add(
+        'SLC2_tab',
+        slc_copy_s1_full_sw,
+        wrk,
+        secondary,
+        'SLC_TAB',
+        burst_tab2,
+        mode=2,
+        raml=rlooks,
+        azml=alooks,
+        slc_dir=os.path.join(wrk, secondary),
+    )
+    tasks.run()
 
     # Interferogram creation, matching, refinement
     log.info('Starting interf_pwr_s1_lt_tops_proc.py 0')
     hgt = f'DEM/HGT_SAR_{rlooks}_{alooks}'
-    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, iterations=3, step=0)
+    interf_pwr_s1_lt_tops_proc(
+        reference, secondary, hgt, rlooks=rlooks, alooks=alooks, iterations=3, step=0, work_dir=wrk
+    )
 
     log.info('Starting interf_pwr_s1_lt_tops_proc.py 1')
-    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, step=1)
+    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, step=1, work_dir=wrk)
 
     log.info('Starting interf_pwr_s1_lt_tops_proc.py 2')
-    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, iterations=3, step=2)
+    interf_pwr_s1_lt_tops_proc(
+        reference, secondary, hgt, rlooks=rlooks, alooks=alooks, iterations=3, step=2, work_dir=wrk
+    )
 
-    g = open('offsetfit3.log')
     offset = '1.0'
-    for line in g:
-        if 'final azimuth offset poly. coeff.:' in line:
-            offset = line.split(':')[1]
+    with open(os.path.join(wrk, 'offsetfit3.log')) as g:
+        for line in g:
+            if 'final azimuth offset poly. coeff.:' in line:
+                offset = line.split(':')[1]
     if float(offset) > 0.02:
         log.error(f'ERROR: Found azimuth offset of {offset}!')
         sys.exit(1)
@@ -481,10 +521,11 @@ def insar_sentinel_gamma(
     execute(
         f'ScanSAR_coreg_overlap.py SLC1_tab SLC2R_tab {output} {output}.off.it {output}.off.it.corrected',
         uselogging=True,
+        cwd=wrk,
     )
 
     log.info('Starting interf_pwr_s1_lt_tops_proc.py 3')
-    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, step=3)
+    interf_pwr_s1_lt_tops_proc(reference, secondary, hgt, rlooks=rlooks, alooks=alooks, step=3, work_dir=wrk)
 
     # Perform phase unwrapping and geocoding of results
     log.info('Starting phase unwrapping and geocoding')
@@ -497,34 +538,40 @@ def insar_sentinel_gamma(
         alooks=alooks,
         alpha=phase_filter_parameter,
         apply_water_mask=apply_water_mask,
+        include_displacement_maps=include_displacement_maps,
+        include_look_vectors=include_look_vectors,
+        include_wrapped_phase=include_wrapped_phase,
+        include_inc_map=include_inc_map,
+        include_dem=include_dem,
+        work_dir=wrk,
     )
 
     # Generate metadata
     log.info('Collecting metadata and output files')
 
-    os.chdir(wrk)
-
     # Move the outputs to the product directory
     pixel_spacing = int(alooks) * 20
     product_name = get_product_name(reference_file, secondary_file, orbit_files, pixel_spacing, apply_water_mask)
-    os.mkdir(product_name)
+    product_dir = Path(wrk) / product_name
+    product_dir.mkdir()
     move_output_files(
         output,
         reference,
-        product_name,
+        str(product_dir),
         product_name,
         include_displacement_maps,
         include_look_vectors,
         include_wrapped_phase,
         include_inc_map,
         include_dem,
+        work_dir=wrk,
     )
 
     reference_granule = os.path.splitext(os.path.basename(reference_file))[0]
     secondary_granule = os.path.splitext(os.path.basename(secondary_file))[0]
 
     create_metadata_file_set_insar(
-        product_dir=Path(product_name),
+        product_dir=product_dir,
         reference_granule_name=reference_granule,
         secondary_granule_name=secondary_granule,
         processing_date=datetime.now(timezone.utc),
@@ -542,6 +589,7 @@ def insar_sentinel_gamma(
     execute(
         f'base_init {reference}.slc.par {secondary}.slc.par - - base > baseline.log',
         uselogging=True,
+        cwd=wrk,
     )
 
     make_parameter_file(
@@ -553,6 +601,7 @@ def insar_sentinel_gamma(
         coords,
         ref_point_info,
         phase_filter_parameter,
+        work_dir=wrk,
     )
 
     log.info('Done!!!')
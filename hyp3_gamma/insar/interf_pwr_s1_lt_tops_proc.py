@@ -6,8 +6,7 @@ import os
 import shutil
 import sys
 
-from hyp3lib.execute import execute
-
+from hyp3_gamma.execute import execute
 from hyp3_gamma.get_parameter import get_parameter
 
 
@@ -43,6 +42,7 @@ def coregister_data(
     rlooks,
     alooks,
     iterations,
+    work_dir='.',
 ):
     if cnt < iterations + 1:
         offi = ifgname + f'.off_{cnt}'
@@ -64,9 +64,10 @@ def coregister_data(
         f'SLC_interp_lt_S1_TOPS {SLC2tab} {spar} {SLC1tab} {mpar} {lt}'
         f' {mmli} {smli} {offit} {SLC2Rtab} {srslc} {srpar}',
         uselogging=True,
+        cwd=work_dir,
     )
 
-    execute(f'create_offset {mpar} {spar} {offi} 1 {rlooks} {alooks} 0', uselogging=True)
+    execute(f'create_offset {mpar} {spar} {offi} 1 {rlooks} {alooks} 0', uselogging=True, cwd=work_dir)
 
     if cnt < iterations + 1:
         cmd_sfx = '256 64 offsets 1 64 256 0.2'
@@ -75,10 +76,11 @@ def coregister_data(
     execute(
         f'offset_pwr {reference}.slc {secondary}.rslc {mpar} {srpar} {offi} offs snr {cmd_sfx}',
         uselogging=True,
+        cwd=work_dir,
     )
 
-    with open(f'offsetfit{cnt}.log', 'w') as log:
-        execute(f'offset_fit offs snr {offi} - - 0.2 1', uselogging=True, logfile=log)
+    with open(os.path.join(work_dir, f'offsetfit{cnt}.log'), 'w') as log:
+        execute(f'offset_fit offs snr {offi} - - 0.2 1', uselogging=True, logfile=log, cwd=work_dir)
 
     if cnt < iterations + 1:
         ifg_diff_sfx = f'it{cnt}'
@@ -88,25 +90,33 @@ def coregister_data(
         f'SLC_diff_intf {reference}.slc {secondary}.rslc {mpar} {srpar} {offi}'
         f' {ifgname}.sim_unw {ifgname}.diff0.{ifg_diff_sfx} {rlooks} {alooks} 0 0',
         uselogging=True,
+        cwd=work_dir,
     )
 
-    width = get_parameter(offi, 'interferogram_width')
+    width = get_parameter(os.path.join(work_dir, offi), 'interferogram_width')
     execute(
         f'rasmph_pwr {ifgname}.diff0.{ifg_diff_sfx} {reference}.mli {width} - - 3 3',
         uselogging=True,
+        cwd=work_dir,
     )
 
     if cnt == 0:
         offit = ifgname + '.off.it'
-        shutil.copy(offi, offit)
+        shutil.copy(os.path.join(work_dir, offi), os.path.join(work_dir, offit))
     elif cnt < iterations + 1:
-        execute(f'offset_add {offit} {offi} {offi}.temp', uselogging=True)
-        shutil.copy(f'{offi}.temp', offit)
+        execute(f'offset_add {offit} {offi} {offi}.temp', uselogging=True, cwd=work_dir)
+        shutil.copy(os.path.join(work_dir, f'{offi}.temp'), os.path.join(work_dir, offit))
     else:
-        execute(f'offset_add {offit} {offi} {offi}.out', uselogging=True)
+        execute(f'offset_add {offit} {offi} {offi}.out', uselogging=True, cwd=work_dir)
+
 
+def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, iterations=5, step=0, work_dir='.'):
+    """Run a step of the coregistration of a pair's SLCs with the DEM
 
-def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, iterations=5, step=0):
+    The inputs are read from, and the outputs written to, `work_dir`; `dem` is relative to it. The current working
+    directory is never changed, so several pairs can be processed at once.
+    """
+    work_dir = os.path.abspath(work_dir)
     # Setup various file names that we'll need
     ifgname = f'{reference}_{secondary}'
     SLC2tab = 'SLC2_tab'
@@ -119,22 +129,23 @@ def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, i
     off = ifgname + '.off_temp'
 
     # Make a fresh slc2r tab
-    create_slc2r_tab(SLC2tab, SLC2Rtab)
+    create_slc2r_tab(os.path.join(work_dir, SLC2tab), os.path.join(work_dir, SLC2Rtab))
 
     if step == 0:
-        if not os.path.isfile(dem):
-            log.info(f'Currently in directory {os.getcwd()}')
+        if not os.path.isfile(os.path.join(work_dir, dem)):
+            log.info(f'Currently in directory {work_dir}')
             log.error(f"ERROR: Input DEM file {dem} can't be found!")
             sys.exit(1)
         log.info(f'Input DEM file {dem} found')
         log.info('Preparing initial look up table and sim_unw file')
-        execute(f'create_offset {mpar} {spar} {off} 1 {rlooks} {alooks} 0', uselogging=True)
+        execute(f'create_offset {mpar} {spar} {off} 1 {rlooks} {alooks} 0', uselogging=True, cwd=work_dir)
 
-        execute(f'rdc_trans {mmli} {dem} {smli} {lt}', uselogging=True)
+        execute(f'rdc_trans {mmli} {dem} {smli} {lt}', uselogging=True, cwd=work_dir)
 
         execute(
             f'phase_sim_orb {mpar} {spar} {off} {dem} {ifgname}.sim_unw {mpar} -',
             uselogging=True,
+            cwd=work_dir,
         )
 
     elif step == 1:
@@ -154,6 +165,7 @@ def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, i
             rlooks,
             alooks,
             iterations,
+            work_dir,
         )
     elif step == 2:
         log.info('Starting iterative coregistration with look up table')
@@ -173,6 +185,7 @@ def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, i
                 rlooks,
                 alooks,
                 iterations,
+                work_dir,
             )
     elif step == 3:
         log.info('Starting single interation coregistration with look up table')
@@ -191,6 +204,7 @@ def interf_pwr_s1_lt_tops_proc(reference, secondary, dem, rlooks=10, alooks=2, i
             rlooks,
             alooks,
             iterations,
+            work_dir,
         )
     else:
         log.error(f'ERROR: Unrecognized step {step}; must be from 0 - 2')
@@ -3,13 +3,14 @@ import logging
 import os
 
 from hyp3lib import OrbitDownloadError
-from hyp3lib.execute import execute
 from hyp3lib.get_orb import downloadSentinelOrbitFile
 
+from hyp3_gamma.execute import execute
 from hyp3_gamma.get_parameter import get_parameter
+from hyp3_gamma.task_runner import TaskRunner
 
 
-def make_cmd(swath, acquisition_date, out_dir, pol=None):
+def make_cmd(swath, acquisition_date, out_dir, pol=None, safe_dir='.'):
     """Assemble the par_S1_SLC gamma commands
 
     Args:
@@ -17,17 +18,18 @@ def make_cmd(swath, acquisition_date, out_dir, pol=None):
         acquisition_date: The acquisition date of the SLC imagery
         out_dir: Where to output the GAMMA formatted files
         pol: pol: polarization (e.g., 'vv')
+        safe_dir: Sentinel-1 SAFE directory location
     """
     if pol is None:
-        m = glob.glob(f'measurement/s1*-iw{swath}*')[0]
-        n = glob.glob(f'annotation/s1*-iw{swath}*')[0]
-        o = glob.glob(f'annotation/calibration/calibration-s1*-iw{swath}*')[0]
-        p = glob.glob(f'annotation/calibration/noise-s1*-iw{swath}*')[0]
+        m = glob.glob(f'{safe_dir}/measurement/s1*-iw{swath}*')[0]
+        n = glob.glob(f'{safe_dir}/annotation/s1*-iw{swath}*')[0]
+        o = glob.glob(f'{safe_dir}/annotation/calibration/calibration-s1*-iw{swath}*')[0]
+        p = glob.glob(f'{safe_dir}/annotation/calibration/noise-s1*-iw{swath}*')[0]
     else:
-        m = glob.glob(f'measurement/s1*-iw{swath}*{pol}*')[0]
-        n = glob.glob(f'annotation/s1*-iw{swath}*{pol}*')[0]
-        o = glob.glob(f'annotation/calibration/calibration-s1*-iw{swath}*{pol}*')[0]
-        p = glob.glob(f'annotation/calibration/noise-s1*-iw{swath}*{pol}*')[0]
+        m = glob.glob(f'{safe_dir}/measurement/s1*-iw{swath}*{pol}*')[0]
+        n = glob.glob(f'{safe_dir}/annotation/s1*-iw{swath}*{pol}*')[0]
+        o = glob.glob(f'{safe_dir}/annotation/calibration/calibration-s1*-iw{swath}*{pol}*')[0]
+        p = glob.glob(f'{safe_dir}/annotation/calibration/noise-s1*-iw{swath}*{pol}*')[0]
 
     cmd = (
         f'par_S1_SLC {m} {n} {o} {p} {out_dir}/{acquisition_date}_00{swath}.slc.par '
@@ -37,24 +39,29 @@ def make_cmd(swath, acquisition_date, out_dir, pol=None):
     return cmd
 
 
-def par_s1_slc_single(safe_dir, pol='vv', orbit_file=None):
+def par_s1_slc_single(safe_dir, pol='vv', orbit_file=None, work_dir='.'):
     """Pre-process S1 SLC imagery into GAMMA format SLCs
 
+    The three swaths are ingested concurrently. The GAMMA files are written to an `<acquisition date>` directory in
+    `work_dir`; the current working directory is never changed, so several granules can be ingested at once.
+
     Args:
         safe_dir: Sentinel-1 SAFE directory location
         pol: polarization (e.g., 'vv')
         orbit_file: Orbit file to use (will download a matching orbit file if None)
+        work_dir: Directory in which to create the output directory
     """
-    wrk = os.getcwd()
     pol = pol.lower()
+    safe_dir = os.path.abspath(safe_dir)
+    granule = os.path.basename(safe_dir)
 
     logging.info(f'Procesing directory {safe_dir}')
-    image_type = safe_dir[13:16]
+    image_type = granule[13:16]
     logging.info(f'Found image type {image_type}')
 
-    datelong = safe_dir.split('_')[5]
-    acquisition_date = (safe_dir.split('_')[5].split('T'))[0]
-    path = os.path.join(wrk, acquisition_date)
+    datelong = granule.split('_')[5]
+    acquisition_date = (granule.split('_')[5].split('T'))[0]
+    path = os.path.abspath(os.path.join(work_dir, acquisition_date))
     if not os.path.exists(path):
         os.mkdir(path)
 
@@ -62,37 +69,45 @@ def par_s1_slc_single(safe_dir, pol='vv', orbit_file=None):
     logging.info(f'Long date is {datelong}')
     logging.info(f'Acquisition date is {acquisition_date}')
 
-    os.chdir(safe_dir)
-
-    for swath in range(1, 4):
-        cmd = make_cmd(swath, acquisition_date, path, pol=pol)
-        execute(cmd, uselogging=True)
-
-    os.chdir(path)
-
     # Ingest the precision state vectors
     try:
         if orbit_file is None:
-            logging.info(f'Trying to get orbit file information from file {safe_dir}')
-            orbit_file, _ = downloadSentinelOrbitFile(safe_dir)
-        logging.info('Applying precision orbit information')
-        execute(f'S1_OPOD_vec {acquisition_date}_001.slc.par {orbit_file}', uselogging=True)
-        execute(f'S1_OPOD_vec {acquisition_date}_002.slc.par {orbit_file}', uselogging=True)
-        execute(f'S1_OPOD_vec {acquisition_date}_003.slc.par {orbit_file}', uselogging=True)
+            logging.info(f'Trying to get orbit file information from file {granule}')
+            orbit_file, _ = downloadSentinelOrbitFile(granule, directory=path)
+        orbit_file = os.path.abspath(orbit_file)
     except OrbitDownloadError:
         logging.warning('Unable to fetch precision state vectors... continuing')
+        orbit_file = None
+
+    tasks = TaskRunner()
+    for swath in range(1, 4):
+        slc_par = f'{acquisition_date}_00{swath}.slc.par'
+        tasks.add(
+            slc_par, execute, make_cmd(swath, acquisition_date, path, pol=pol, safe_dir=safe_dir), uselogging=True
+        )
+        if orbit_file is not None:
+            tasks.add(
+                f'{slc_par} state vectors',
+                execute,
+                f'S1_OPOD_vec {slc_par} {orbit_file}',
+                uselogging=True,
+                cwd=path,
+                depends_on=[slc_par],
+            )
+    if orbit_file is not None:
+        logging.info('Applying precision orbit information')
+    tasks.run()
 
-    slc = glob.glob('*_00*.slc')
+    slc = [os.path.basename(f) for f in glob.glob(os.path.join(path, '*_00*.slc'))]
     slc.sort()
-    par = glob.glob('*_00*.slc.par')
+    par = [os.path.basename(f) for f in glob.glob(os.path.join(path, '*_00*.slc.par'))]
     par.sort()
-    top = glob.glob('*_00*.tops_par')
+    top = [os.path.basename(f) for f in glob.glob(os.path.join(path, '*_00*.tops_par'))]
     top.sort()
     with open(os.path.join(path, 'SLC_TAB'), 'w') as f:
         for i in range(len(slc)):
             f.write(f'{slc[i]} {par[i]} {top[i]}\n')
 
     # Make a raster version of swath 3
-    width = get_parameter(f'{acquisition_date}_003.slc.par', 'range_samples')
-    execute(f'rasSLC {acquisition_date}_003.slc {width} 1 0 50 10')
-    os.chdir(wrk)
+    width = get_parameter(os.path.join(path, f'{acquisition_date}_003.slc.par'), 'range_samples')
+    execute(f'rasSLC {acquisition_date}_003.slc {width} 1 0 50 10', cwd=path)
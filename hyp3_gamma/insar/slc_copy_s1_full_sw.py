@@ -4,21 +4,36 @@ import logging
 import os
 import shutil
 
-from hyp3lib.execute import execute
-
+from hyp3_gamma.execute import execute
 from hyp3_gamma.get_parameter import get_parameter
-
-
-def slc_copy_s1_full_sw(path, slcname, tabin, burst_tab, mode=2, dem=None, dempath=None, raml=10, azml=2):
+from hyp3_gamma.par_file import ParFile
+
+
+def slc_copy_s1_full_sw(path, slcname, tabin, burst_tab, mode=2, dem=None, dempath=None, raml=10, azml=2, slc_dir='.'):
+    """Copy the overlapping bursts of an ingested S1 SLC to `path` and mosaic them
+
+    Args:
+        path: Directory to write the burst-trimmed SLCs, mosaic, MLI, `SLC<mode>_tab` and (mode 1) `DEM` to
+        slcname: Name of the SLC mosaic (acquisition date)
+        tabin: SLC tab file of the ingested swaths, in `slc_dir`
+        burst_tab: Burst tab file, in `slc_dir`
+        mode: 1 for the reference SLC (also maps the DEM into radar geometry), 2 for the secondary SLC
+        dem: Name of the DEM, without the .dem/.par extension
+        dempath: Directory containing the DEM
+        raml: Range looks
+        azml: Azimuth looks
+        slc_dir: Directory containing the ingested swaths (written by `par_s1_slc_single`)
+    """
     logging.info('Using range looks {}'.format(raml))
     logging.info('Using azimuth looks {}'.format(azml))
     logging.info('Operating in mode {}'.format(mode))
-    logging.info('In directory {}'.format(os.getcwd()))
+    logging.info('In directory {}'.format(slc_dir))
 
-    if not os.path.isfile(tabin):
-        logging.error("ERROR: Can't find tab file {} in {}".format(tabin, os.getcwd()))
-    f = open(tabin, 'r')
-    g = open('TAB_swFULL', 'w')
+    path = os.path.abspath(path)
+    if not os.path.isfile(os.path.join(slc_dir, tabin)):
+        logging.error("ERROR: Can't find tab file {} in {}".format(tabin, slc_dir))
+    f = open(os.path.join(slc_dir, tabin), 'r')
+    g = open(os.path.join(slc_dir, 'TAB_swFULL'), 'w')
     for line in f:
         s = line.split()
         for i in range(len(s)):
@@ -27,53 +42,49 @@ def slc_copy_s1_full_sw(path, slcname, tabin, burst_tab, mode=2, dem=None, dempa
     f.close()
     g.close()
 
-    wrk = os.getcwd()
-
     cmd = 'SLC_copy_S1_TOPS {} {} {}'.format(tabin, 'TAB_swFULL', burst_tab)
-    execute(cmd, uselogging=True)
+    execute(cmd, uselogging=True, cwd=slc_dir)
 
-    shutil.copy(tabin, path)
-    os.chdir(path)
+    # The tab file is copied straight to its final name so that the reference and secondary SLCs can share `path`
+    mode = int(mode)
+    slc_tab = 'SLC{}_tab'.format(mode)
+    shutil.copy(os.path.join(slc_dir, tabin), os.path.join(path, slc_tab))
 
-    cmd = 'SLC_mosaic_S1_TOPS {TAB} {SLC}.slc {SLC}.slc.par {RL} {AL}'.format(TAB=tabin, SLC=slcname, RL=raml, AL=azml)
-    execute(cmd, uselogging=True)
+    cmd = 'SLC_mosaic_S1_TOPS {TAB} {SLC}.slc {SLC}.slc.par {RL} {AL}'.format(
+        TAB=slc_tab, SLC=slcname, RL=raml, AL=azml
+    )
+    execute(cmd, uselogging=True, cwd=path)
 
-    width = get_parameter('{}.slc.par'.format(slcname), 'range_samples')
+    width = get_parameter(os.path.join(path, '{}.slc.par'.format(slcname)), 'range_samples')
     cmd = 'rasSLC {}.slc {} 1 0 50 10'.format(slcname, width)
-    execute(cmd, uselogging=True)
+    execute(cmd, uselogging=True, cwd=path)
 
-    cmd = 'multi_S1_TOPS {TAB} {SLC}.mli {SLC}.mli.par {RL} {AL}'.format(TAB=tabin, SLC=slcname, RL=raml, AL=azml)
-    execute(cmd, uselogging=True)
+    cmd = 'multi_S1_TOPS {TAB} {SLC}.mli {SLC}.mli.par {RL} {AL}'.format(TAB=slc_tab, SLC=slcname, RL=raml, AL=azml)
+    execute(cmd, uselogging=True, cwd=path)
 
-    mode = int(mode)
     if mode == 1:
-        logging.info('currently in {}'.format(os.getcwd()))
-        logging.info('creating directory DEM')
+        dem_dir = os.path.join(path, 'DEM')
+        logging.info('creating directory {}'.format(dem_dir))
 
-        if not os.path.exists('DEM'):
-            os.mkdir('DEM')
-        os.chdir('DEM')
-        mliwidth = get_parameter('../{}.mli.par'.format(slcname), 'range_samples')
-        mlinline = get_parameter('../{}.mli.par'.format(slcname), 'azimuth_lines')
+        if not os.path.exists(dem_dir):
+            os.mkdir(dem_dir)
+        mli_par = ParFile.read(os.path.join(path, '{}.mli.par'.format(slcname)))
+        mliwidth = mli_par['range_samples']
+        mlinline = mli_par['azimuth_lines']
 
         # FIXME: Convert to an f-string
         cmd = 'GC_map_mod ../{SLC}.mli.par  - {DP}/{DEM}.par {DP}/{DEM}.dem 2 2 demseg.par demseg ../{SLC}.mli  MAP2RDC inc pix ls_map 1 1'.format(  # noqa: E501
             SLC=slcname, DEM=dem, DP=dempath
         )
-        execute(cmd, uselogging=True)
+        execute(cmd, uselogging=True, cwd=dem_dir)
 
-        demwidth = get_parameter('demseg.par', 'width')
+        demwidth = get_parameter(os.path.join(dem_dir, 'demseg.par'), 'width')
 
         cmd = 'geocode MAP2RDC demseg {} HGT_SAR_{}_{} {} {}'.format(demwidth, raml, azml, mliwidth, mlinline)
-        execute(cmd, uselogging=True)
+        execute(cmd, uselogging=True, cwd=dem_dir)
 
         # FIXME: Convert to an f-string
         cmd = 'gc_map ../{SLC}.mli.par - {DP}/{DEM}.par 1 demseg.par demseg map_to_rdc 2 2 pwr_sim_map - - inc_flat'.format(  # noqa: E501
             SLC=slcname, DP=dempath, DEM=dem
         )
-        execute(cmd, uselogging=True)
-
-        os.chdir('..')
-
-    shutil.copy(tabin, 'SLC{}_tab'.format(mode))
-    os.chdir(wrk)
+        execute(cmd, uselogging=True, cwd=dem_dir)
@@ -10,10 +10,12 @@ from tempfile import TemporaryDirectory
 import numpy as np
 import scipy.ndimage
 from PIL import Image
-from hyp3lib.execute import execute
 from osgeo import gdal
 
-from hyp3_gamma.get_parameter import get_parameter
+from hyp3_gamma import gamma_raster
+from hyp3_gamma.execute import execute
+from hyp3_gamma.par_file import ParFile
+from hyp3_gamma.task_runner import TaskRunner
 from hyp3_gamma.water_mask import create_water_mask
 
 
@@ -35,9 +37,7 @@ def get_ref_point_info(log_text: str):
 
 def get_height_at_pixel(in_height_file: str, mlines: int, mwidth: int, ref_azlin: int, ref_rpix: int) -> float:
     """Get the height of the pixel (ref_azlin, ref_rpix)"""
-    height = read_bin(in_height_file, mlines, mwidth)
-
-    return height[ref_azlin, ref_rpix]
+    return gamma_raster.read_pixel(in_height_file, mlines, mwidth, ref_azlin, ref_rpix)
 
 
 def coords_from_sarpix_coord(in_mli_par: str, ref_azlin: int, ref_rpix: int, height: float, in_dem_par: str) -> list:
@@ -96,10 +96,8 @@ def get_coords(
     return coords
 
 
-def read_bin(file, lines: int, samples: int):
-    data = np.fromfile(file, dtype='>f4')
-    values = np.reshape(data, (lines, samples))
-    return values
+def read_bin(file, lines: int, samples: int) -> np.memmap:
+    return gamma_raster.open_raster(file, lines, samples, dtype=gamma_raster.FLOAT)
 
 
 def read_bmp(file):
@@ -108,8 +106,28 @@ def read_bmp(file):
     return data
 
 
+def _exact_window_sums(
+    padded: np.ndarray, rows: np.ndarray, cols: np.ndarray, window_size: tuple[int, int], chunk_size: int = 65536
+) -> np.ndarray:
+    """Sum the windows anchored at (rows, cols) of a padded array exactly as `np.sum` would over a 1-D buffer."""
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window_size)
+    sums = np.empty(rows.size, dtype=np.float64)
+    for start in range(0, rows.size, chunk_size):
+        stop = start + chunk_size
+        values = windows[rows[start:stop], cols[start:stop]].astype(np.float64)
+        sums[start:stop] = values.reshape(values.shape[0], -1).sum(axis=1)
+    return sums
+
+
 def get_reference_pixel(coherence: np.ndarray, window_size=(5, 5), coherence_threshold=0.3) -> tuple[int, int]:
-    """Args:
+    """Find the pixel whose window has the largest sum of coherence values.
+
+    Windows containing a value less than `coherence_threshold` or equal to 1.0 are not considered; pixels outside the
+    array are treated as 0.0. Window sums are computed with vectorized box filters, and only the handful of pixels
+    whose approximate sum is within rounding error of the maximum are summed exactly, so ties are broken the same way
+    as a `scipy.ndimage.generic_filter` over every pixel followed by `np.argmax`.
+
+    Args:
         coherence: array of coherence values
         window_size: window size over which to sum coherence values for each pixel
         coherence_threshold: pixels with values less than the threshold in their window will not be considered
@@ -117,59 +135,85 @@ def get_reference_pixel(coherence: np.ndarray, window_size=(5, 5), coherence_thr
     Returns:
         array indices of the reference pixel
     """
+    coherence = np.asarray(coherence)
+    window_size = tuple(int(size) for size in window_size)
+    weight_type = coherence.dtype if np.issubdtype(coherence.dtype, np.floating) else np.dtype(np.float64)
+
+    window_min = scipy.ndimage.minimum_filter(coherence, size=window_size, mode='constant', cval=0.0)
+    valid = window_min.astype(np.float64) >= coherence_threshold
+    del window_min
+    valid &= ~scipy.ndimage.maximum_filter(coherence == 1.0, size=window_size, mode='constant', cval=False)
+
+    if not valid.any():
+        return 0, 0
 
-    def sum_valid_coherence_values(array: np.ndarray) -> float:
-        if (array < coherence_threshold).any() or (array == np.float64(1.0)).any():
-            return 0.0
-        return array.sum()
-
-    pixel_weights = scipy.ndimage.generic_filter(
-        input=coherence,
-        function=sum_valid_coherence_values,
-        size=window_size,
-        mode='constant',
-        cval=0.0,
+    window_area = window_size[0] * window_size[1]
+    window_sums = scipy.ndimage.uniform_filter(
+        coherence, size=window_size, output=np.float64, mode='constant', cval=0.0
     )
-    x, y = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+    window_sums *= window_area
+
+    peak = np.max(window_sums, where=valid, initial=-np.inf)
+    tolerance = 1e-6 * max(abs(peak), 1.0)
+    rows, cols = np.nonzero(valid & (window_sums >= peak - tolerance))
+    del window_sums
+
+    # generic_filter centers each window on the pixel; pad the way its constant mode does
+    before = (window_size[0] // 2, window_size[1] // 2)
+    after = (window_size[0] - 1 - before[0], window_size[1] - 1 - before[1])
+    padded = np.pad(coherence, ((before[0], after[0]), (before[1], after[1])), mode='constant', constant_values=0.0)
+    weights = _exact_window_sums(padded, rows, cols, window_size).astype(weight_type)
+
+    best = int(np.argmax(weights))
+    best_index = int(np.ravel_multi_index((rows[best], cols[best]), coherence.shape))
+
+    # every invalid pixel has a weight of exactly 0.0
+    if not valid.all() and weights[best] <= 0:
+        first_invalid = int(np.argmin(valid))
+        best_index = first_invalid if weights[best] < 0 else min(first_invalid, best_index)
+
+    x, y = np.unravel_index(best_index, coherence.shape)
     return int(x), int(y)
 
 
-def geocode_back(inname, outname, width, lt, demw, demn, type_):
+def geocode_back(inname, outname, width, lt, demw, demn, type_, work_dir='.'):
     execute(
         f'geocode_back {inname} {width} {lt} {outname} {demw} {demn} 0 {type_}',
         uselogging=True,
+        cwd=work_dir,
     )
 
 
-def geocode(inname, outname, inwidth, lt, outwidth, outlines, type_):
+def geocode(inname, outname, inwidth, lt, outwidth, outlines, type_, work_dir='.'):
     execute(
         f'geocode {lt} {inname} {inwidth} {outname} {outwidth} {outlines} - {type_}',
         uselogging=True,
+        cwd=work_dir,
     )
 
 
-def data2geotiff(inname, outname, dempar, type_):
-    execute(f'data2geotiff {dempar} {inname} {type_} {outname} ', uselogging=True)
+def data2geotiff(inname, outname, dempar, type_, work_dir='.'):
+    execute(f'data2geotiff {dempar} {inname} {type_} {outname} ', uselogging=True, cwd=work_dir)
 
 
-def create_phase_from_complex(incpx, outfloat, width):
-    execute(f'cpx_to_real {incpx} {outfloat} {width} 4', uselogging=True)
+def create_phase_from_complex(incpx, outfloat, width, work_dir='.'):
+    execute(f'cpx_to_real {incpx} {outfloat} {width} 4', uselogging=True, cwd=work_dir)
 
 
-def get_water_mask(cc_file, width, lt, demw, demn, dempar):
-    """Create water_mask geotiff file based on the cc_file (float binary file)"""
+def get_water_mask(cc_file, width, lt, demw, demn, dempar, work_dir='.'):
+    """Create water_mask geotiff file in `work_dir` based on the cc_file (float binary file)"""
     with TemporaryDirectory() as temp_dir:
         # 2--SUN raster/BMP/TIFF, 0--FLOAT (default)
-        geocode_back(cc_file, f'{temp_dir}/tmp_mask_geo', width, lt, demw, demn, 0)
+        geocode_back(cc_file, f'{temp_dir}/tmp_mask_geo', width, lt, demw, demn, 0, work_dir=work_dir)
         # 0--RASTER 8 or 24 bit uncompressed raster image, SUN (*.ras), BMP:(*.bmp), or TIFF: (*.tif)
         # 2--FLOAT (4 bytes/value)
-        data2geotiff(f'{temp_dir}/tmp_mask_geo', f'{temp_dir}/tmpgtiff_mask_geo.tif', dempar, 2)
+        data2geotiff(f'{temp_dir}/tmp_mask_geo', f'{temp_dir}/tmpgtiff_mask_geo.tif', dempar, 2, work_dir=work_dir)
         # create water_mask.tif file
-        create_water_mask(f'{temp_dir}/tmpgtiff_mask_geo.tif', 'water_mask.tif')
+        create_water_mask(f'{temp_dir}/tmpgtiff_mask_geo.tif', os.path.join(work_dir, 'water_mask.tif'))
 
 
-def convert_water_mask_to_sar_bmp(water_mask, mwidth, mlines, lt, demw):
-    """Input file is water_mask.tif file in MAP space, outptut is water_mask_sar.bmp file in SAR space."""
+def convert_water_mask_to_sar_bmp(water_mask, mwidth, mlines, lt, demw, work_dir='.'):
+    """Input file is water_mask.tif file in MAP space, outptut is water_mask_sar.bmp file in SAR space in `work_dir`."""
     ds = gdal.Open(water_mask)
     band = ds.GetRasterBand(1)
     mask = band.ReadAsArray()
@@ -181,18 +225,21 @@ def convert_water_mask_to_sar_bmp(water_mask, mwidth, mlines, lt, demw):
         water_im.save(water_bmp_file)
         # map water_mask.bmp file to SAR coordinators
         water_mask_bmp_sar_file = 'water_mask_sar.bmp'
-        geocode(water_bmp_file, water_mask_bmp_sar_file, demw, lt, mwidth, mlines, 2)
+        geocode(water_bmp_file, water_mask_bmp_sar_file, demw, lt, mwidth, mlines, 2, work_dir=work_dir)
 
 
-def apply_mask(file: str, nlines: int, nsamples: int, mask_file: str):
+def apply_mask(file: str, nlines: int, nsamples: int, mask_file: str, block_lines: int = 1024):
     """Use mask_file (bmp) to mask the file (binary), output the masked file (binary). All three file are in SAR space."""
     data = read_bin(file, nlines, nsamples)
     mask = read_bmp(mask_file)
 
-    data[mask == 0] = 0
-
     outfile = f'{file}_masked'
-    data.tofile(outfile)
+    with open(outfile, 'wb') as f:
+        for start in range(0, nlines, block_lines):
+            block = np.array(data[start : start + block_lines])
+            block[mask[start : start + block_lines] == 0] = 0
+            block.tofile(f)
+    del data
 
     return outfile
 
@@ -225,7 +272,41 @@ def unwrapping_geocoding(
     trimode=0,
     alpha=0.6,
     apply_water_mask=False,
+    include_displacement_maps=True,
+    include_look_vectors=True,
+    include_wrapped_phase=True,
+    include_inc_map=True,
+    include_dem=True,
+    work_dir='.',
 ):
+    """Unwrap an interferogram and geocode its layers to GeoTIFFs.
+
+    The amplitude, coherence, unwrapped phase, and browse image layers are always created. The `include_*` arguments
+    select which optional layers are created; layers that are not selected are never generated or geocoded.
+
+    The inputs are read from, and the outputs written to, `work_dir`. The current working directory is never changed,
+    so several pairs can be processed at once.
+
+    Args:
+        reference: Reference scene identifier
+        secondary: Secondary scene identifier
+        step: Level of interferogram for unwrapping
+        rlooks: Number of range looks
+        alooks: Number of azimuth looks
+        trimode: Triangulation method for mcf unwrapper
+        alpha: adf filter alpha value; the adaptive phase filter is skipped if zero
+        apply_water_mask: Mask water before unwrapping
+        include_displacement_maps: Create line-of-sight and vertical displacement GeoTIFFs
+        include_look_vectors: Create look vector theta and phi GeoTIFFs
+        include_wrapped_phase: Create a wrapped phase GeoTIFF
+        include_inc_map: Create local and ellipsoidal incidence angle GeoTIFFs
+        include_dem: Create a DEM GeoTIFF
+        work_dir: Directory of the interferogram's files
+
+    Returns:
+        coordinates of the reference point and information about the phase at the reference point
+    """
+    work_dir = os.path.abspath(work_dir)
     dem = './DEM/demseg'
     dempar = './DEM/demseg.par'
     lt = './DEM/MAP2RDC'
@@ -234,22 +315,25 @@ def unwrapping_geocoding(
     mmli = reference + '.mli'
     smli = secondary + '.mli'
 
-    if not os.path.isfile(dempar):
+    if not os.path.isfile(os.path.join(work_dir, dempar)):
         log.error(f'ERROR: Unable to find dem par file {dempar}')
 
-    if not os.path.isfile(lt):
+    if not os.path.isfile(os.path.join(work_dir, lt)):
         log.error(f'ERROR: Unable to find look up table file {lt}')
 
-    if not os.path.isfile(offit):
+    if not os.path.isfile(os.path.join(work_dir, offit)):
         log.error(f'ERROR: Unable to find offset file {offit}')
 
-    width = get_parameter(offit, 'interferogram_width')
-    lines = get_parameter(offit, 'interferogram_azimuth_lines')
-    mwidth = get_parameter(mmli + '.par', 'range_samples')
-    mlines = get_parameter(mmli + '.par', 'azimuth_lines')
-    swidth = get_parameter(smli + '.par', 'range_samples')
-    demw = get_parameter(dempar, 'width')
-    demn = get_parameter(dempar, 'nlines')
+    off_par = ParFile.read(os.path.join(work_dir, offit))
+    width = off_par['interferogram_width']
+    lines = off_par['interferogram_azimuth_lines']
+    mli_par = ParFile.read(os.path.join(work_dir, mmli + '.par'))
+    mwidth = mli_par['range_samples']
+    mlines = mli_par['azimuth_lines']
+    swidth = ParFile.read(os.path.join(work_dir, smli + '.par'))['range_samples']
+    dem_par = ParFile.read(os.path.join(work_dir, dempar))
+    demw = dem_par['width']
+    demn = dem_par['nlines']
 
     ifgf = f'{ifgname}.diff0.{step}'
 
@@ -259,44 +343,51 @@ def unwrapping_geocoding(
     log.info('            Start unwrapping')
     log.info('-------------------------------------------------')
 
-    execute(f'cc_wave {ifgf} - - {ifgname}.cc {width}', uselogging=True)
+    execute(f'cc_wave {ifgf} - - {ifgname}.cc {width}', uselogging=True, cwd=work_dir)
 
     if alpha > 0.0:
         execute(
             f'adf {ifgf} {ifgf}.adf {ifgname}.adf.cc {width} {alpha} - 5',
             uselogging=True,
+            cwd=work_dir,
         )
     else:
         log.info('Skipping adaptive phase filter because alpha is zero')
-        shutil.copyfile(ifgf, f'{ifgf}.adf')
-        shutil.copyfile(f'{ifgname}.cc', f'{ifgname}.adf.cc')
+        shutil.copyfile(os.path.join(work_dir, ifgf), os.path.join(work_dir, f'{ifgf}.adf'))
+        shutil.copyfile(os.path.join(work_dir, f'{ifgname}.cc'), os.path.join(work_dir, f'{ifgname}.adf.cc'))
 
-    execute(f'rasmph_pwr {ifgf}.adf {mmli} {width}', uselogging=True)
+    execute(f'rasmph_pwr {ifgf}.adf {mmli} {width}', uselogging=True, cwd=work_dir)
 
     execute(
         f'rascc_mask {ifgname}.adf.cc {mmli} {width} 1 1 0 1 1 0.10 0.0 ',
         uselogging=True,
+        cwd=work_dir,
     )
 
-    get_water_mask(f'{ifgname}.adf.cc', width, lt, demw, demn, dempar)
+    get_water_mask(f'{ifgname}.adf.cc', width, lt, demw, demn, dempar, work_dir=work_dir)
 
     out_file = f'{ifgname}.adf.cc_mask.bmp'
 
-    cc_ref = f'{ifgname}.cc'
+    cc_ref = os.path.join(work_dir, f'{ifgname}.cc')
 
     if apply_water_mask:
+        water_mask_sar = os.path.join(work_dir, 'water_mask_sar.bmp')
         # convert water_mak.tif in MAP to SAR space
-        convert_water_mask_to_sar_bmp('water_mask.tif', mwidth, mlines, lt, demw)
+        convert_water_mask_to_sar_bmp(
+            os.path.join(work_dir, 'water_mask.tif'), mwidth, mlines, lt, demw, work_dir=work_dir
+        )
         # combine the water mask with validity mask in SAR space
-        out_file = combine_water_mask(f'{ifgname}.adf.cc_mask.bmp', 'water_mask_sar.bmp')
+        out_file = combine_water_mask(os.path.join(work_dir, f'{ifgname}.adf.cc_mask.bmp'), water_mask_sar)
         # apply water mask in SAR space to cc
-        cc_ref = apply_mask(f'{ifgname}.cc', int(mlines), int(mwidth), 'water_mask_sar.bmp')
+        cc_ref = apply_mask(cc_ref, int(mlines), int(mwidth), water_mask_sar)
 
     data_cc = read_bin(cc_ref, int(mlines), int(mwidth))
     ref_azlin, ref_rpix = get_reference_pixel(data_cc)
     del data_cc
 
-    height = get_height_at_pixel(f'DEM/HGT_SAR_{rlooks}_{alooks}', int(mlines), int(mwidth), ref_azlin, ref_rpix)
+    height = get_height_at_pixel(
+        os.path.join(work_dir, f'DEM/HGT_SAR_{rlooks}_{alooks}'), int(mlines), int(mwidth), ref_azlin, ref_rpix
+    )
 
     # unwrap very large interferograms in multiple patches to keep memory requirement under 31,600 MB
     # https://github.com/ASFHyP3/hyp3-gamma/issues/316
@@ -309,35 +400,19 @@ def unwrapping_geocoding(
         f'mcf {ifgf}.adf {ifgname}.adf.cc {out_file} {ifgname}.adf.unw {width} {trimode} 0 0'
         f' - - {range_patches} 1 - {ref_rpix} {ref_azlin} 1',
         uselogging=True,
+        cwd=work_dir,
     )
 
     ref_point_info = get_ref_point_info(mcf_log)
 
     coords = get_coords(
-        f'{mmli}.par',
+        os.path.join(work_dir, f'{mmli}.par'),
         ref_azlin=ref_azlin,
         ref_rpix=ref_rpix,
         height=height,
-        in_dem_par=dempar,
-    )
-
-    execute(
-        f'rasdt_pwr {ifgname}.adf.unw {mmli} {width} - - - - - {6 * np.pi} 1 rmg.cm {ifgname}.adf.unw.ras',
-        uselogging=True,
-    )
-
-    execute(
-        f'dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par - {ifgname}.vert.disp 1',
-        uselogging=True,
-    )
-
-    execute(
-        f'dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par - {ifgname}.los.disp 0',
-        uselogging=True,
+        in_dem_par=os.path.join(work_dir, dempar),
     )
 
-    execute(f'gc_map2 {mmli}.par DEM/demseg.par 0 - - - - - - - inc_ell')
-
     log.info('-------------------------------------------------')
     log.info('            End unwrapping')
     log.info('-------------------------------------------------')
@@ -346,9 +421,22 @@ def unwrapping_geocoding(
     log.info('            Start geocoding')
     log.info('-------------------------------------------------')
 
-    geocode_back(mmli, mmli + '.geo', mwidth, lt, demw, demn, 0)
-    geocode_back(smli, smli + '.geo', swidth, lt, demw, demn, 0)
-    geocode_back(
+    # Tasks are named after the file they create, and only wait on the tasks that create their inputs. Optional
+    # layers that were not requested are never added, so their GAMMA programs never run.
+    tasks = TaskRunner()
+
+    tasks.add(
+        f'{ifgname}.adf.unw.ras',
+        execute,
+        f'rasdt_pwr {ifgname}.adf.unw {mmli} {width} - - - - - {6 * np.pi} 1 rmg.cm {ifgname}.adf.unw.ras',
+        uselogging=True,
+        cwd=work_dir,
+    )
+    tasks.add(f'{mmli}.geo', geocode_back, mmli, f'{mmli}.geo', mwidth, lt, demw, demn, 0, work_dir=work_dir)
+    tasks.add(f'{smli}.geo', geocode_back, smli, f'{smli}.geo', swidth, lt, demw, demn, 0, work_dir=work_dir)
+    tasks.add(
+        f'{ifgname}.sim_unw.geo',
+        geocode_back,
         f'{ifgname}.sim_unw',
         f'{ifgname}.sim_unw.geo',
         width,
@@ -356,8 +444,11 @@ def unwrapping_geocoding(
         demw,
         demn,
         0,
+        work_dir=work_dir,
     )
-    geocode_back(
+    tasks.add(
+        f'{ifgname}.adf.unw.geo',
+        geocode_back,
         f'{ifgname}.adf.unw',
         f'{ifgname}.adf.unw.geo',
         width,
@@ -365,9 +456,11 @@ def unwrapping_geocoding(
         demw,
         demn,
         0,
+        work_dir=work_dir,
     )
-    geocode_back(f'{ifgf}.adf', f'{ifgf}.adf.geo', width, lt, demw, demn, 1)
-    geocode_back(
+    tasks.add(
+        f'{ifgname}.adf.unw.geo.bmp',
+        geocode_back,
         f'{ifgname}.adf.unw.ras',
         f'{ifgname}.adf.unw.geo.bmp',
         width,
@@ -375,8 +468,12 @@ def unwrapping_geocoding(
         demw,
         demn,
         2,
+        depends_on=[f'{ifgname}.adf.unw.ras'],
+        work_dir=work_dir,
     )
-    geocode_back(
+    tasks.add(
+        f'{ifgf}.adf.bmp.geo',
+        geocode_back,
         f'{ifgf}.adf.bmp',
         f'{ifgf}.adf.bmp.geo',
         width,
@@ -384,84 +481,219 @@ def unwrapping_geocoding(
         demw,
         demn,
         2,
+        work_dir=work_dir,
     )
-    geocode_back(f'{ifgname}.cc', f'{ifgname}.cc.geo', width, lt, demw, demn, 0)
-    geocode_back(
-        f'{ifgname}.adf.cc',
-        f'{ifgname}.adf.cc.geo',
-        width,
-        lt,
-        demw,
-        demn,
-        0,
-    )
-    geocode_back(
-        f'{ifgname}.vert.disp',
-        f'{ifgname}.vert.disp.geo',
+    tasks.add(
+        f'{ifgname}.cc.geo',
+        geocode_back,
+        f'{ifgname}.cc',
+        f'{ifgname}.cc.geo',
         width,
         lt,
         demw,
         demn,
         0,
+        work_dir=work_dir,
     )
-    geocode_back(
-        f'{ifgname}.los.disp',
-        f'{ifgname}.los.disp.geo',
+    tasks.add(
+        f'{ifgname}.adf.cc.geo',
+        geocode_back,
+        f'{ifgname}.adf.cc',
+        f'{ifgname}.adf.cc.geo',
         width,
         lt,
         demw,
         demn,
         0,
+        work_dir=work_dir,
     )
 
-    create_phase_from_complex(f'{ifgf}.adf.geo', f'{ifgf}.adf.geo.phase', width)
-
-    data2geotiff(mmli + '.geo', mmli + '.geo.tif', dempar, 2)
-    data2geotiff(smli + '.geo', smli + '.geo.tif', dempar, 2)
-    data2geotiff(
+    tasks.add(
+        f'{mmli}.geo.tif',
+        data2geotiff,
+        mmli + '.geo',
+        mmli + '.geo.tif',
+        dempar,
+        2,
+        depends_on=[f'{mmli}.geo'],
+        work_dir=work_dir,
+    )
+    tasks.add(
+        f'{smli}.geo.tif',
+        data2geotiff,
+        smli + '.geo',
+        smli + '.geo.tif',
+        dempar,
+        2,
+        depends_on=[f'{smli}.geo'],
+        work_dir=work_dir,
+    )
+    tasks.add(
+        f'{ifgname}.sim_unw.geo.tif',
+        data2geotiff,
         f'{ifgname}.sim_unw.geo',
         f'{ifgname}.sim_unw.geo.tif',
         dempar,
         2,
+        depends_on=[f'{ifgname}.sim_unw.geo'],
+        work_dir=work_dir,
     )
-    data2geotiff(
+    tasks.add(
+        f'{ifgname}.adf.unw.geo.tif',
+        data2geotiff,
         f'{ifgname}.adf.unw.geo',
         f'{ifgname}.adf.unw.geo.tif',
         dempar,
         2,
+        depends_on=[f'{ifgname}.adf.unw.geo'],
+        work_dir=work_dir,
     )
-    data2geotiff(
+    tasks.add(
+        f'{ifgname}.adf.unw.geo.bmp.tif',
+        data2geotiff,
         f'{ifgname}.adf.unw.geo.bmp',
         f'{ifgname}.adf.unw.geo.bmp.tif',
         dempar,
         0,
+        depends_on=[f'{ifgname}.adf.unw.geo.bmp'],
+        work_dir=work_dir,
     )
-    data2geotiff(f'{ifgf}.adf.geo.phase', f'{ifgf}.adf.geo.tif', dempar, 2)
-    data2geotiff(f'{ifgf}.adf.bmp.geo', f'{ifgf}.adf.bmp.geo.tif', dempar, 0)
-    data2geotiff(f'{ifgname}.cc.geo', f'{ifgname}.cc.geo.tif', dempar, 2)
-    data2geotiff(f'{ifgname}.adf.cc.geo', f'{ifgname}.adf.cc.geo.tif', dempar, 2)
-    data2geotiff('DEM/demseg', f'{ifgname}.dem.tif', dempar, 2)
-    data2geotiff(
-        f'{ifgname}.vert.disp.geo',
-        f'{ifgname}.vert.disp.geo.org.tif',
+    tasks.add(
+        f'{ifgf}.adf.bmp.geo.tif',
+        data2geotiff,
+        f'{ifgf}.adf.bmp.geo',
+        f'{ifgf}.adf.bmp.geo.tif',
         dempar,
-        2,
+        0,
+        depends_on=[f'{ifgf}.adf.bmp.geo'],
+        work_dir=work_dir,
     )
-    data2geotiff(
-        f'{ifgname}.los.disp.geo',
-        f'{ifgname}.los.disp.geo.org.tif',
+    tasks.add(
+        f'{ifgname}.cc.geo.tif',
+        data2geotiff,
+        f'{ifgname}.cc.geo',
+        f'{ifgname}.cc.geo.tif',
         dempar,
         2,
+        depends_on=[f'{ifgname}.cc.geo'],
+        work_dir=work_dir,
     )
-    data2geotiff('DEM/inc', f'{ifgname}.inc.tif', dempar, 2)
-    data2geotiff('inc_ell', f'{ifgname}.inc_ell.tif', dempar, 2)
-    execute(
-        f'look_vector {mmli}.par {offit} {dempar} {dem} lv_theta lv_phi',
-        uselogging=True,
+    tasks.add(
+        f'{ifgname}.adf.cc.geo.tif',
+        data2geotiff,
+        f'{ifgname}.adf.cc.geo',
+        f'{ifgname}.adf.cc.geo.tif',
+        dempar,
+        2,
+        depends_on=[f'{ifgname}.adf.cc.geo'],
+        work_dir=work_dir,
     )
 
-    data2geotiff('lv_theta', f'{ifgname}.lv_theta.tif', dempar, 2)
-    data2geotiff('lv_phi', f'{ifgname}.lv_phi.tif', dempar, 2)
+    if include_wrapped_phase:
+        tasks.add(
+            f'{ifgf}.adf.geo',
+            geocode_back,
+            f'{ifgf}.adf',
+            f'{ifgf}.adf.geo',
+            width,
+            lt,
+            demw,
+            demn,
+            1,
+            work_dir=work_dir,
+        )
+        tasks.add(
+            f'{ifgf}.adf.geo.phase',
+            create_phase_from_complex,
+            f'{ifgf}.adf.geo',
+            f'{ifgf}.adf.geo.phase',
+            width,
+            depends_on=[f'{ifgf}.adf.geo'],
+            work_dir=work_dir,
+        )
+        tasks.add(
+            f'{ifgf}.adf.geo.tif',
+            data2geotiff,
+            f'{ifgf}.adf.geo.phase',
+            f'{ifgf}.adf.geo.tif',
+            dempar,
+            2,
+            depends_on=[f'{ifgf}.adf.geo.phase'],
+            work_dir=work_dir,
+        )
+
+    if include_dem:
+        tasks.add(f'{ifgname}.dem.tif', data2geotiff, 'DEM/demseg', f'{ifgname}.dem.tif', dempar, 2, work_dir=work_dir)
+
+    if include_displacement_maps:
+        for disp, flag in (('vert', 1), ('los', 0)):
+            tasks.add(
+                f'{ifgname}.{disp}.disp',
+                execute,
+                f'dispmap {ifgname}.adf.unw DEM/HGT_SAR_{rlooks}_{alooks} {mmli}.par - {ifgname}.{disp}.disp {flag}',
+                uselogging=True,
+                cwd=work_dir,
+            )
+            tasks.add(
+                f'{ifgname}.{disp}.disp.geo',
+                geocode_back,
+                f'{ifgname}.{disp}.disp',
+                f'{ifgname}.{disp}.disp.geo',
+                width,
+                lt,
+                demw,
+                demn,
+                0,
+                depends_on=[f'{ifgname}.{disp}.disp'],
+                work_dir=work_dir,
+            )
+            tasks.add(
+                f'{ifgname}.{disp}.disp.geo.org.tif',
+                data2geotiff,
+                f'{ifgname}.{disp}.disp.geo',
+                f'{ifgname}.{disp}.disp.geo.org.tif',
+                dempar,
+                2,
+                depends_on=[f'{ifgname}.{disp}.disp.geo'],
+                work_dir=work_dir,
+            )
+
+    if include_inc_map:
+        tasks.add(f'{ifgname}.inc.tif', data2geotiff, 'DEM/inc', f'{ifgname}.inc.tif', dempar, 2, work_dir=work_dir)
+        tasks.add('inc_ell', execute, f'gc_map2 {mmli}.par DEM/demseg.par 0 - - - - - - - inc_ell', cwd=work_dir)
+        tasks.add(
+            f'{ifgname}.inc_ell.tif',
+            data2geotiff,
+            'inc_ell',
+            f'{ifgname}.inc_ell.tif',
+            dempar,
+            2,
+            depends_on=['inc_ell'],
+            work_dir=work_dir,
+        )
+
+    if include_look_vectors:
+        tasks.add(
+            'lv_theta/lv_phi',
+            execute,
+            f'look_vector {mmli}.par {offit} {dempar} {dem} lv_theta lv_phi',
+            uselogging=True,
+            cwd=work_dir,
+        )
+        for look_vector in ('lv_theta', 'lv_phi'):
+            tasks.add(
+                f'{ifgname}.{look_vector}.tif',
+                data2geotiff,
+                look_vector,
+                f'{ifgname}.{look_vector}.tif',
+                dempar,
+                2,
+                depends_on=['lv_theta/lv_phi'],
+                work_dir=work_dir,
+            )
+
+    log.info(f'Running {len(tasks)} geocoding and export tasks with up to {tasks.max_workers} workers')
+    tasks.run()
 
     log.info('-------------------------------------------------')
     log.info('            End geocoding')
@@ -1,20 +1,120 @@
 """Resamples a GeoTIFF file to make a KML and a PNG browse image for ASF"""
 
+import io
 import logging
+import os
+import zipfile
 
-from hyp3lib.resample_geotiff import resample_geotiff
+import lxml.etree as et
+import numpy as np
+from PIL import Image
 from osgeo import gdal
 
 
-def make_asf_browse(geotiff: str, base_name: str, use_nn=False, width: int = 2048):
+gdal.UseExceptions()
+
+
+def _read_browse(geotiff: str, width: int, use_nn: bool) -> gdal.Dataset:
+    """Read a GeoTIFF once, resampled to the browse image width, into an in-memory dataset
+
+    GDAL reads from the GeoTIFF's overviews, if it has any, rather than the full-resolution raster.
+    """
+    source = gdal.Open(geotiff)
+    height = max(round(source.RasterYSize * width / source.RasterXSize), 1)
+    x_scale = source.RasterXSize / width
+    y_scale = source.RasterYSize / height
+    resample_alg = gdal.GRIORA_NearestNeighbour if use_nn else gdal.GRIORA_Cubic
+
+    data_type = source.GetRasterBand(1).DataType
+    browse = gdal.GetDriverByName('MEM').Create('', width, height, source.RasterCount, data_type)
+    x_origin, x_res, x_skew, y_origin, y_skew, y_res = source.GetGeoTransform()
+    browse.SetGeoTransform([x_origin, x_res * x_scale, x_skew * y_scale, y_origin, y_skew * x_scale, y_res * y_scale])
+    browse.SetProjection(source.GetProjection())
+    for band_number in range(1, source.RasterCount + 1):
+        source_band = source.GetRasterBand(band_number)
+        band = browse.GetRasterBand(band_number)
+        band.WriteArray(source_band.ReadAsArray(buf_xsize=width, buf_ysize=height, resample_alg=resample_alg))
+        band.SetNoDataValue(0)
+        if source_band.GetColorTable() is not None:
+            band.SetColorTable(source_band.GetColorTable())
+    return browse
+
+
+def _to_image(dataset: gdal.Dataset) -> Image.Image:
+    array = dataset.ReadAsArray()
+    if array.ndim == 3:
+        return Image.fromarray(np.moveaxis(array, 0, -1))
+
+    image = Image.fromarray(array)
+    color_table = dataset.GetRasterBand(1).GetColorTable()
+    if color_table is not None:
+        image.putpalette([value for i in range(color_table.GetCount()) for value in color_table.GetColorEntry(i)[:3]])
+    return image
+
+
+def _write_kmz(browse: gdal.Dataset, base_name: str):
+    band_count = browse.RasterCount
+    if band_count == 1 and browse.GetRasterBand(1).GetColorTable() is not None:
+        browse = gdal.Translate('', browse, format='MEM', rgbExpand='RGBA')
+
+    # Reproject to geographic coordinates with an alpha band for the no-data pixels
+    warped = gdal.Warp(
+        '',
+        browse,
+        format='MEM',
+        resampleAlg=gdal.GRIORA_Cubic,
+        width=browse.RasterXSize,
+        srcNodata='0 0 0' if band_count == 3 else '0',
+        dstSRS='EPSG:4326',
+        dstAlpha=True,
+    )
+    png = io.BytesIO()
+    _to_image(warped).save(png, format='PNG')
+
+    x_origin, x_res, _, y_origin, _, y_res = warped.GetGeoTransform()
+    west, north = x_origin, y_origin
+    east, south = x_origin + warped.RasterXSize * x_res, y_origin + warped.RasterYSize * y_res
+    coordinates = f'{west:.4f},{south:.4f} {east:.4f},{south:.4f} {east:.4f},{north:.4f} {west:.4f},{north:.4f}'
+
+    name = os.path.basename(base_name)
+    gx = 'http://www.google.com/kml/ext/2.2'
+    nsmap: dict = {None: 'http://www.opengis.net/kml/2.2', 'gx': gx}
+    kml = et.Element('kml', nsmap=nsmap)
+    overlay = et.SubElement(kml, 'GroundOverlay')
+    et.SubElement(overlay, 'name').text = f'{name} overlay'
+    icon = et.SubElement(overlay, 'Icon')
+    et.SubElement(icon, 'href').text = f'{name}.png'
+    et.SubElement(icon, 'viewBoundScale').text = '0.75'
+    lat_lon_quad = et.SubElement(overlay, f'{{{gx}}}LatLonQuad')
+    et.SubElement(lat_lon_quad, 'coordinates').text = coordinates
+
+    with zipfile.ZipFile(f'{base_name}.kmz', 'w', zipfile.ZIP_DEFLATED) as kmz:
+        kmz.writestr(f'{name}.kml', et.tostring(kml, xml_declaration=True, encoding='utf-8', pretty_print=True))
+        kmz.writestr(f'{name}.png', png.getvalue())
+
+
+def _write_thumbnail(browse: gdal.Dataset, base_name: str, size: tuple[int, int]):
+    image = _to_image(browse)
+    image.thumbnail(size)
+    image.save(f'{base_name}_thumb.png', transparency=(0, 0, 0) if image.mode == 'RGB' else 0)
+
+
+def make_asf_browse(
+    geotiff: str, base_name: str, use_nn=False, width: int = 2048, thumbnail_size: tuple[int, int] | None = None
+):
     """
-    Make a KML and PNG browse image for ASF
+    Make a KML and PNG browse image, and optionally a thumbnail of the browse image, for ASF
+
+    The GeoTIFF is read and resampled to the browse image width once, and every output is made from that in-memory
+    browse image.
+
     Args:
         geotiff: name of GeoTIFF file
         base_name: base name of output files
         use_nn: Use GDAL's GRIORA_NearestNeighbour interpolation instead of GRIORA_Cubic
             to resample the GeoTIFF
         width: browse image width
+        thumbnail_size: maximum size of the thumbnail (`<base_name>_thumb.png`), or None to not make one
 
     Returns:
         browse_width: the width of the created browse image
@@ -29,7 +129,10 @@ def make_asf_browse(geotiff: str, base_name: str, use_nn=False, width: int = 204
     else:
         browse_width = width
 
-    resample_geotiff(geotiff, browse_width, 'KML', f'{base_name}.kmz', use_nn)
-    resample_geotiff(geotiff, browse_width, 'PNG', f'{base_name}.png', use_nn)
+    browse = _read_browse(geotiff, browse_width, use_nn)
+    gdal.Translate(f'{base_name}.png', browse, format='PNG')
+    _write_kmz(browse, base_name)
+    if thumbnail_size is not None:
+        _write_thumbnail(browse, base_name, thumbnail_size)
 
     return browse_width
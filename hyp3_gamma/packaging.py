@@ -0,0 +1,102 @@
+"""Package product directories into zip files"""
+
+import logging
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+
+log = logging.getLogger(__name__)
+
+COMPRESSION_CHOICES = ('auto', 'deflate', 'store')
+
+# formats that are always compressed
+COMPRESSED_SUFFIXES = frozenset({'.png', '.kmz', '.zip', '.gz', '.jpg', '.jpeg'})
+
+
+def is_compressed(path: Path, sample_size: int = 65536, threshold: float = 0.9) -> bool:
+    """Whether a file is already compressed, so that deflating it would save little space
+
+    Files with a `COMPRESSED_SUFFIXES` suffix are always compressed. For other files, e.g. GeoTIFFs that may or may not
+    use DEFLATE internally, three samples from the start, middle, and end of the file are deflated at the fastest
+    level; the file counts as compressed if that doesn't shrink the samples to below `threshold` of their size.
+
+    Args:
+        path: File to check
+        sample_size: Size of each sample, in bytes
+        threshold: Compression ratio above which the file counts as compressed
+    """
+    path = Path(path)
+    if path.suffix.lower() in COMPRESSED_SUFFIXES:
+        return True
+
+    size = path.stat().st_size
+    if size <= 3 * sample_size:
+        return False
+
+    raw_size = compressed_size = 0
+    with open(path, 'rb') as f:
+        for offset in (0, (size - sample_size) // 2, size - sample_size):
+            f.seek(offset)
+            sample = f.read(sample_size)
+            raw_size += len(sample)
+            compressed_size += len(zlib.compress(sample, 1))
+    return compressed_size > threshold * raw_size
+
+
+def get_compress_type(path: Path, compression: str = 'auto') -> int:
+    """Get the zip compression method for a file
+
+    Args:
+        path: File to add to a zip file
+        compression: `deflate` or `store` to always use that method, or `auto` to store files that are already
+            compressed (see `is_compressed`) and deflate the rest
+    """
+    if compression == 'deflate':
+        return ZIP_DEFLATED
+    if compression == 'store':
+        return ZIP_STORED
+    if compression == 'auto':
+        return ZIP_STORED if is_compressed(path) else ZIP_DEFLATED
+    raise ValueError(f'Invalid compression {compression}; must be one of {", ".join(COMPRESSION_CHOICES)}')
+
+
+def write_product_zip(
+    fileobj: BinaryIO, product_dir: Path, files: Iterable[Path] | None = None, compression: str = 'auto'
+) -> None:
+    """Write a zip file of a product directory to a file object
+
+    The zip file has the same layout as `shutil.make_archive(base_name=product_dir.name, format='zip',
+    base_dir=product_dir.name)`. `fileobj` only needs to be writable, not seekable, so the zip file can be streamed.
+
+    Args:
+        fileobj: File object to write the zip file to
+        product_dir: Product directory to package
+        files: Files in `product_dir` to include; defaults to all of them
+        compression: How to compress each file; see `get_compress_type`
+    """
+    product_dir = Path(product_dir)
+    if files is None:
+        files = sorted(path for path in product_dir.iterdir() if path.is_file())
+
+    with ZipFile(fileobj, 'w', compression=ZIP_DEFLATED) as z:
+        z.write(product_dir, product_dir.name)
+        for path in files:
+            compress_type = get_compress_type(path, compression)
+            log.debug(f'Adding {path} to zip file ({"stored" if compress_type == ZIP_STORED else "deflated"})')
+            z.write(path, f'{product_dir.name}/{path.name}', compress_type=compress_type)
+
+
+def make_product_zip(product_dir: Path, files: Iterable[Path] | None = None, compression: str = 'auto') -> str:
+    """Write a zip file of a product directory next to it; see `write_product_zip`
+
+    Returns:
+        the path of the zip file
+    """
+    product_dir = Path(product_dir)
+    zip_file = str(product_dir.with_name(f'{product_dir.name}.zip'))
+    log.info(f'Creating {zip_file}')
+    with open(zip_file, 'wb') as f:
+        write_product_zip(f, product_dir, files, compression)
+    return zip_file
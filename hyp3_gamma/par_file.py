@@ -0,0 +1,119 @@
+"""Parse and cache GAMMA parameter (.par) files"""
+
+import os
+import re
+from functools import lru_cache
+
+
+_NUMBER = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+_INTEGER = re.compile(r'[-+]?\d+')
+
+
+def _to_number(token: str) -> int | float | None:
+    if _INTEGER.fullmatch(token):
+        return int(token)
+    if _NUMBER.fullmatch(token):
+        return float(token)
+    return None
+
+
+def parse_value(text: str) -> tuple[int | float | tuple[int | float, ...] | str, str | None]:
+    """Convert the text of a GAMMA parameter to a typed value.
+
+    Leading numeric tokens become an int or float, or a tuple of numbers for multi-value parameters such as state
+    vectors and dates; any trailing tokens are the units. Parameters that do not start with a number are returned as
+    the stripped text.
+
+    Args:
+        text: text following the `key:` of a parameter file line
+
+    Returns:
+        (value, units), where units is None if the parameter has no units
+    """
+    tokens = text.split()
+    numbers = []
+    for token in tokens:
+        number = _to_number(token)
+        if number is None:
+            break
+        numbers.append(number)
+
+    if not numbers:
+        return text.strip(), None
+
+    units = ' '.join(tokens[len(numbers) :]) or None
+    if len(numbers) == 1:
+        return numbers[0], units
+    return tuple(numbers), units
+
+
+class ParFile:
+    """A GAMMA parameter file parsed into a case-insensitive mapping of keys to values.
+
+    Use `ParFile.read` to share parsed files; a file is re-parsed only when its modification time or size changes.
+    """
+
+    def __init__(self, path: str, parameters: dict[str, str]):
+        """Args:
+        path: path of the parameter file
+        parameters: text of each parameter, keyed by parameter name
+        """
+        self.path = path
+        self._text = {key.lower(): value for key, value in parameters.items()}
+        self._values = {key: parse_value(value) for key, value in self._text.items()}
+
+    @classmethod
+    def read(cls, path: str | os.PathLike) -> 'ParFile':
+        """Read and parse a parameter file, reusing a cached parse if the file has not changed"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        return _read_par_file(path, stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def parse(cls, path: str, content: str) -> 'ParFile':
+        """Parse the content of a parameter file; for duplicate keys, the last value wins"""
+        parameters = {}
+        for line in content.splitlines():
+            key, separator, value = line.partition(':')
+            if separator and key.strip():
+                parameters[key.strip()] = value.strip()
+        return cls(path, parameters)
+
+    def __contains__(self, key: str) -> bool:
+        return key.lower() in self._text
+
+    def __getitem__(self, key: str):
+        return self._lookup(key)[0]
+
+    def __iter__(self):
+        return iter(self._text)
+
+    def __len__(self) -> int:
+        return len(self._text)
+
+    def get(self, key: str, default=None):
+        """Get the typed value of a parameter, or `default` if the parameter is not present"""
+        if key not in self:
+            return default
+        return self[key]
+
+    def text(self, key: str) -> str:
+        """Get the unparsed text of a parameter"""
+        self._lookup(key)
+        return self._text[key.lower()]
+
+    def units(self, key: str) -> str | None:
+        """Get the units of a parameter, or None if it has no units"""
+        return self._lookup(key)[1]
+
+    def _lookup(self, key: str):
+        try:
+            return self._values[key.lower()]
+        except KeyError:
+            raise KeyError(f'Unable to find parameter {key} in file {self.path}') from None
+
+
+@lru_cache(maxsize=256)
+def _read_par_file(path: str, mtime_ns: int, size: int) -> ParFile:
+    with open(path) as f:
+        return ParFile.parse(path, f.read())
@@ -0,0 +1,113 @@
+"""Warm the node-local tile cache with the DEM and water mask tiles covering a list of footprints"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+
+from osgeo import ogr
+
+from hyp3_gamma.dem import get_dem_grid, get_dem_tile_paths, get_geometry_from_kml
+from hyp3_gamma.tile_cache import DEFAULT_MAX_BYTES, TileCache
+from hyp3_gamma.water_mask import get_tiles_for_corners
+
+
+log = logging.getLogger(__name__)
+
+
+def read_footprint(footprint: str) -> ogr.Geometry:
+    """Read a footprint from a KML file, such as a SAFE's `preview/map-overlay.kml`, or a WKT polygon in lon/lat"""
+    if os.path.isfile(footprint):
+        return get_geometry_from_kml(footprint)
+    return ogr.CreateGeometryFromWkt(footprint)
+
+
+def get_footprint_tiles(geometry: ogr.Geometry, dem: bool = True, water_mask: bool = True) -> list[str]:
+    """Get the DEM and water mask tiles that processing a footprint reads
+
+    Args:
+        geometry: Footprint in EPSG:4326 (lon/lat) projection
+        dem: Whether to include the Copernicus DEM tiles, which cover the footprint buffered as for the DEM mosaic
+        water_mask: Whether to include the water mask tiles
+    """
+    tiles = []
+    if dem:
+        _, buffer_in_degrees = get_dem_grid(geometry)
+        tiles.extend(get_dem_tile_paths(geometry.Buffer(buffer_in_degrees)))
+    if water_mask:
+        min_lon, max_lon, min_lat, max_lat = geometry.GetEnvelope()
+        corners = [
+            [(lon + 180) % 360 - 180, lat]
+            for lon, lat in ((min_lon, max_lat), (min_lon, min_lat), (max_lon, max_lat), (max_lon, min_lat))
+        ]
+        tiles.extend(get_tiles_for_corners(corners))
+    return tiles
+
+
+def prefetch_tiles(
+    footprints: list[ogr.Geometry],
+    cache: TileCache,
+    dem: bool = True,
+    water_mask: bool = True,
+    max_workers: int = 4,
+) -> list[str]:
+    """Fetch the tiles covering footprints into a tile cache, several at once
+
+    Returns:
+        The paths of the cached tiles
+    """
+    tiles = []
+    for geometry in footprints:
+        for tile in get_footprint_tiles(geometry, dem=dem, water_mask=water_mask):
+            if tile not in tiles:
+                tiles.append(tile)
+
+    log.info(f'Prefetching {len(tiles)} tiles into {cache.directory}')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(cache.get, tiles))
+
+
+def main():
+    """Main entrypoint"""
+    parser = argparse.ArgumentParser(prog='prefetch_tiles', description=__doc__)
+    parser.add_argument(
+        'footprints', nargs='+', help='KML files (e.g. a SAFE preview/map-overlay.kml) or WKT polygons in lon/lat'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=os.environ.get('HYP3_TILE_CACHE'),
+        help='Tile cache directory (default: $HYP3_TILE_CACHE)',
+    )
+    parser.add_argument(
+        '--max-bytes',
+        type=int,
+        default=int(os.environ.get('HYP3_TILE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+        help='Size above which least recently used tiles are evicted (default: $HYP3_TILE_CACHE_MAX_BYTES or 50 GiB)',
+    )
+    parser.add_argument('--no-dem', action='store_true', help='Do not fetch Copernicus DEM tiles')
+    parser.add_argument('--no-water-mask', action='store_true', help='Do not fetch water mask tiles')
+    parser.add_argument('--max-workers', type=int, default=4, help='Number of tiles to fetch at once (def=4)')
+    args = parser.parse_args()
+
+    if not args.cache_dir:
+        parser.error('--cache-dir is required when HYP3_TILE_CACHE is not set')
+
+    logging.basicConfig(
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p',
+        level=logging.INFO,
+    )
+
+    cache = TileCache(args.cache_dir, args.max_bytes)
+    footprints = [read_footprint(footprint) for footprint in args.footprints]
+    prefetch_tiles(
+        footprints,
+        cache,
+        dem=not args.no_dem,
+        water_mask=not args.no_water_mask,
+        max_workers=args.max_workers,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Extract members of a zip file served over HTTP without downloading the whole archive"""
+
+import io
+import logging
+from dataclasses import dataclass
+from typing import Callable
+from zipfile import ZipFile
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+log = logging.getLogger(__name__)
+
+
+class RangeRequestsNotSupportedError(Exception):
+    """Raised when a server does not support HTTP range requests"""
+
+
+def get_session(retries: int = 2, backoff_factor: float = 1) -> requests.Session:
+    """Get a requests session that retries failed and throttled requests, as `hyp3lib.fetch.download_file` does"""
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    session.mount('https://', HTTPAdapter(max_retries=retry_strategy))
+    session.mount('http://', HTTPAdapter(max_retries=retry_strategy))
+    return session
+
+
+@dataclass(frozen=True)
+class ExtractionSummary:
+    """Which members of a zip file are (or would be) extracted, and how many bytes are skipped"""
+
+    names: tuple[str, ...]
+    members: int
+    size: int
+    compressed_size: int
+    selected_size: int
+    selected_compressed_size: int
+
+    @property
+    def skipped_size(self) -> int:
+        return self.size - self.selected_size
+
+    @property
+    def skipped_compressed_size(self) -> int:
+        return self.compressed_size - self.selected_compressed_size
+
+    def __str__(self) -> str:
+        return (
+            f'{len(self.names)} of {self.members} members selected; skipping {self.skipped_size} of {self.size} bytes '
+            f'({self.skipped_compressed_size} of {self.compressed_size} compressed bytes)'
+        )
+
+
+def select_members(zip_file: ZipFile, members: Callable[[str], bool] | None = None) -> ExtractionSummary:
+    """Select members of a zip file to extract
+
+    Args:
+        zip_file: open zip file
+        members: function called with each member name that returns whether to extract it; defaults to all members
+
+    Returns:
+        the selected member names and a summary of the bytes they account for
+    """
+    infos = zip_file.infolist()
+    selected = [info for info in infos if members is None or members(info.filename)]
+    return ExtractionSummary(
+        names=tuple(info.filename for info in selected),
+        members=len(infos),
+        size=sum(info.file_size for info in infos),
+        compressed_size=sum(info.compress_size for info in infos),
+        selected_size=sum(info.file_size for info in selected),
+        selected_compressed_size=sum(info.compress_size for info in selected),
+    )
+
+
+class HttpRangeReader(io.RawIOBase):
+    """Seekable, read-only file-like object backed by HTTP range requests.
+
+    Sequential reads are served from a single streaming response; a new range request is only made after a seek to a
+    different position. Any redirects (e.g. Earthdata Login) are followed once, and later requests go straight to the
+    final URL. That URL may be presigned and expire, so if a request to it fails, `url` is requested again to get a
+    fresh one.
+    """
+
+    def __init__(self, url: str, session: requests.Session | None = None, retries: int = 2):
+        """Args:
+        url: URL of the file
+        session: requests session to use; defaults to `get_session(retries)`
+        retries: number of times to reopen the response if the connection fails mid-read
+        """
+        self._session = session or get_session(retries)
+        self._retries = retries
+        self._position = 0
+        self._response: requests.Response | None = None
+        self._response_position = -1
+
+        self.url = url
+        with self._get_range(url, 'bytes=0-0') as response:
+            self._redirected_url = response.url
+            self.size = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+        if self._position < 0:
+            raise ValueError(f'Negative seek position {self._position}')
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.size - self._position)
+        if size <= 0:
+            return 0
+
+        for attempt in range(self._retries + 1):
+            try:
+                if self._response is None or self._response_position != self._position:
+                    self._open_response()
+                assert self._response is not None
+                data = self._response.raw.read(size)
+                if not data:
+                    raise IOError(f'Unexpected end of response from {self.url} at byte {self._position}')
+                break
+            except (IOError, requests.RequestException) as e:
+                self._close_response()
+                if attempt == self._retries:
+                    raise
+                log.warning(f'Retrying read of {self.url} at byte {self._position}: {e}')
+
+        buffer[: len(data)] = data
+        self._position += len(data)
+        self._response_position = self._position
+        return len(data)
+
+    def close(self):
+        self._close_response()
+        super().close()
+
+    def _open_response(self):
+        self._close_response()
+        byte_range = f'bytes={self._position}-'
+        try:
+            response = self._get_range(self._redirected_url, byte_range)
+        except requests.RequestException as e:
+            if self._redirected_url == self.url:
+                raise
+            log.warning(f'Request to the redirect target of {self.url} failed; requesting it again: {e}')
+            response = self._get_range(self.url, byte_range)
+            self._redirected_url = response.url
+        self._response = response
+        self._response_position = self._position
+
+    def _get_range(self, url: str, byte_range: str) -> requests.Response:
+        response = self._session.get(url, headers={'Range': byte_range}, stream=True)
+        try:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RangeRequestsNotSupportedError(f'{self.url} does not support range requests')
+        except BaseException:
+            response.close()
+            raise
+        return response
+
+    def _close_response(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+            self._response_position = -1
+
+
+def extract_remote_zip(
+    url: str,
+    directory: str = '.',
+    members: Callable[[str], bool] | None = None,
+    session: requests.Session | None = None,
+    buffer_size: int = 10485760,
+    dry_run: bool = False,
+) -> ExtractionSummary:
+    """Extract members of a remote zip file without downloading the rest of it.
+
+    The zip file's central directory is read with HTTP range requests, and then each selected member is streamed
+    straight into `directory`, so the archive itself is never written to disk.
+
+    Args:
+        url: URL of the zip file; the server must support range requests
+        directory: directory to extract into
+        members: function called with each member name that returns whether to extract it; defaults to all members
+        session: requests session to use; defaults to `get_session()`
+        buffer_size: size of the read buffer, in bytes
+        dry_run: only read the central directory and report what would be extracted
+
+    Returns:
+        the extracted member names and a summary of the bytes skipped
+    """
+    log.info(f'Extracting {url}')
+    with io.BufferedReader(HttpRangeReader(url, session=session), buffer_size=buffer_size) as f:
+        with ZipFile(f) as z:
+            summary = select_members(z, members)
+            log.info(f'{"Dry run: " if dry_run else ""}{summary}')
+            if not dry_run:
+                for name in summary.names:
+                    z.extract(name, path=directory)
+    return summary
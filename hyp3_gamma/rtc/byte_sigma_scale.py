@@ -2,36 +2,41 @@ import numpy as np
 from osgeo import gdal
 
 from hyp3_gamma.rtc import gdal_file
+from hyp3_gamma.stats import QuantileSketch
 
 
 def get_sigma_cutoffs(fi):
     file_handle = gdal.Open(fi)
-    (x, y, trans, proj, data) = gdal_file.read(file_handle)
-    data = data.astype(float)
-    data[data == 0] = np.nan
-    top = np.nanpercentile(data, 99)
-    data[data > top] = top
-    stddev = np.nanstd(data)
-    mean = np.nanmean(data)
+    sketch = QuantileSketch()
+    for _, data in gdal_file.read_windows(file_handle):
+        sketch.add(data[data != 0])
+    top = sketch.percentile(99)
+    mean, stddev = sketch.moments(upper=top)
     lo = mean - 2 * stddev
     hi = mean + 2 * stddev
     return lo, hi
 
 
 def byte_sigma_scale(infile, outfile):
+    """Scale a raster's 2-sigma range to 1-255 in a byte GeoTIFF, with zero and non-finite values as no-data (0)
+
+    The raster is read twice, one window at a time: once for the statistics and once to scale and write it.
+    """
     lo, hi = get_sigma_cutoffs(infile)
     print('2-sigma cutoffs are {} {}'.format(lo, hi))
-    gdal.Translate(
-        outfile, infile, outputType=gdal.GDT_Byte, scaleParams=[[lo, hi, 1, 255]], resampleAlg='average', noData='0'
-    )
+    if hi == lo:
+        hi += 0.1  # as gdal_translate does for an empty scale range
+    scale = 254 / (hi - lo)
 
-    # For some reason, I'm still getting zeros in my byte images eventhough I'm using 1,255 scaling!
-    # The following in an attempt to fix that!
-    input_file_handle, output_file_handle = gdal.Open(infile), gdal.Open(outfile)
-    (x, y, trans, proj, data) = gdal_file.read(input_file_handle)
-    mask = (data > 0).astype(bool)
-    (x, y, trans, proj, data) = gdal_file.read(output_file_handle)
-    mask2 = (data > 0).astype(bool)
-    mask3 = mask ^ mask2
-    data[mask3 is True] = 1
-    gdal_file.write_byte(outfile, trans, proj, data, nodata=0)
+    input_file_handle = gdal.Open(infile)
+    output_file_handle = gdal_file.create_like(outfile, input_file_handle, gdal.GDT_Byte, nodata=0)
+    output_band = output_file_handle.GetRasterBand(1)
+    for yoff, data in gdal_file.read_windows(input_file_handle, buf_type=gdal.GDT_Float32):
+        nodata = ~np.isfinite(data) | (data == 0)
+        data -= lo
+        data *= scale
+        data += 1.5  # 1 for the bottom of the range, and 0.5 to round to the nearest integer
+        np.clip(data, 1, 255, out=data)
+        data[nodata] = 0
+        output_band.WriteArray(data.astype(np.uint8), 0, yoff)
+    output_file_handle = None  # How to close with gdal
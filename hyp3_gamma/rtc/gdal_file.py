@@ -52,3 +52,49 @@ def write_byte(filename, geotransform, geoproj, data, nodata=None):
     if nodata is not None:
         dst_ds.GetRasterBand(1).SetNoDataValue(nodata)
     dst_ds.SetProjection(geoproj)
+
+
+def read_windows(filehandle, band=1, max_pixels=2**24, buf_type=None):
+    """Read a band one window of whole lines at a time, so memory use doesn't grow with the raster size
+
+    Windows are aligned to the band's block height and hold at most `max_pixels` pixels (or one block row).
+
+    Yields:
+        the first line and the data of each window
+    """
+    banddata = filehandle.GetRasterBand(band)
+    block_lines = banddata.GetBlockSize()[1]
+    lines = max(max_pixels // (filehandle.RasterXSize * block_lines), 1) * block_lines
+    for yoff in range(0, filehandle.RasterYSize, lines):
+        win_ysize = min(lines, filehandle.RasterYSize - yoff)
+        yield yoff, banddata.ReadAsArray(0, yoff, filehandle.RasterXSize, win_ysize, buf_type=buf_type)
+
+
+def create_like(filename, filehandle, datatype, nodata=None):
+    """Create a single-band GeoTIFF with the size, geotransform, and projection of an open dataset"""
+    driver = gdal.GetDriverByName('GTiff')
+    dst_ds = driver.Create(filename, filehandle.RasterXSize, filehandle.RasterYSize, 1, datatype)
+    dst_ds.SetGeoTransform(filehandle.GetGeoTransform())
+    dst_ds.SetProjection(filehandle.GetProjection())
+    if nodata is not None:
+        dst_ds.GetRasterBand(1).SetNoDataValue(nodata)
+    return dst_ds
+
+
+def transform(infile, outfile, function, nodata=None, datatype=gdal.GDT_Float32, max_pixels=2**24):
+    """Apply a function to a raster one window at a time, writing the result to a new single-band GeoTIFF
+
+    Args:
+        infile: input raster
+        outfile: output GeoTIFF
+        function: called with each float32 window, which it may modify in place, and returns the output window
+        nodata: no-data value of the output
+        datatype: GDAL data type of the output
+        max_pixels: maximum number of pixels in each window; see `read_windows`
+    """
+    in_handle = gdal.Open(infile)
+    out_handle = create_like(outfile, in_handle, datatype, nodata=nodata)
+    out_band = out_handle.GetRasterBand(1)
+    for yoff, data in read_windows(in_handle, max_pixels=max_pixels, buf_type=gdal.GDT_Float32):
+        out_band.WriteArray(function(data), 0, yoff)
+    out_handle = None  # How to close with gdal
@@ -1,24 +1,105 @@
+import concurrent.futures
 import logging
 import os
-import shutil
+import time
 from glob import glob
-from tempfile import NamedTemporaryFile
+from tempfile import mkstemp
 
-from hyp3lib.execute import execute
 from osgeo import gdal
 
+from hyp3_gamma.util import GDALConfigManager
 
-def cogify_dir(directory: str, file_pattern: str = '*.tif'):
+
+COG_CREATION_OPTIONS = ['COMPRESS=DEFLATE', 'BLOCKSIZE=256', 'RESAMPLING=AVERAGE']
+
+
+def get_thread_budget() -> int:
+    """Number of threads GDAL may use in total: `GDAL_NUM_THREADS` if it's a number, otherwise the CPU count"""
+    num_threads = gdal.GetConfigOption('GDAL_NUM_THREADS')
+    if num_threads is not None and num_threads.isdigit() and int(num_threads) > 0:
+        return int(num_threads)
+    return os.cpu_count() or 1
+
+
+def write_cog(
+    source, filename: str, area_or_point: str | None = None, num_threads: int | str = 'ALL_CPUS', **translate_options
+):
+    """Write a raster straight to a Cloud Optimized GeoTIFF with GDAL's COG driver
+
+    The overviews are built in memory (`/vsimem`) rather than in a temporary file next to `filename`.
+
+    Args:
+        source: raster file name or open GDAL dataset
+        filename: name of the COG to write
+        area_or_point: `Area` or `Point`, to set the COG's `AREA_OR_POINT` metadata; defaults to that of `source`
+        num_threads: number of threads to compress with
+        **translate_options: additional `gdal.Translate` options, e.g. `outputType`
+    """
+    logging.info(f'Writing {filename} as a COG')
+    metadata_options = [f'AREA_OR_POINT={area_or_point}'] if area_or_point else None
+    with GDALConfigManager(CPL_TMPDIR='/vsimem'):
+        gdal.Translate(
+            filename,
+            source,
+            format='COG',
+            creationOptions=[*COG_CREATION_OPTIONS, f'NUM_THREADS={num_threads}'],
+            metadataOptions=metadata_options,
+            **translate_options,
+        )
+
+
+def cogify_dir(directory: str, file_pattern: str = '*.tif', max_workers: int | None = None) -> dict[str, float]:
+    """Convert GeoTIFFs to COGs in place, several at once
+
+    Each file is converted in its own process. The thread budget (see `get_thread_budget`) is split between the
+    processes so GDAL doesn't oversubscribe the CPUs.
+
+    Args:
+        directory: directory containing the GeoTIFFs
+        file_pattern: glob pattern of the GeoTIFFs to convert
+        max_workers: maximum number of files to convert at once; defaults to the thread budget, and 1 converts the
+            files one at a time in this process
+
+    Returns:
+        the number of seconds each file took to convert
+    """
     path_expression = os.path.join(directory, file_pattern)
-    logging.info(f'Converting files to COGs for {path_expression}')
-    for filename in glob(path_expression):
-        cogify_file(filename)
+    filenames = sorted(glob(path_expression))
+    logging.info(f'Converting {len(filenames)} files to COGs for {path_expression}')
+    if not filenames:
+        return {}
+
+    thread_budget = get_thread_budget()
+    workers = max(min(max_workers or thread_budget, len(filenames)), 1)
+    num_threads = max(thread_budget // workers, 1)
+
+    if workers == 1:
+        timings = {filename: _timed_cogify_file(filename, num_threads) for filename in filenames}
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {filename: executor.submit(_timed_cogify_file, filename, num_threads) for filename in filenames}
+            timings = {filename: future.result() for filename, future in futures.items()}
+
+    for filename, seconds in timings.items():
+        logging.info(f'Converted {filename} to COG in {seconds:.1f} s')
+    return timings
+
+
+def _timed_cogify_file(filename: str, num_threads: int | str) -> float:
+    start = time.perf_counter()
+    cogify_file(filename, num_threads)
+    return time.perf_counter() - start
 
 
-def cogify_file(filename: str):
+def cogify_file(filename: str, num_threads: int | str = 'ALL_CPUS'):
     logging.info(f'Converting {filename} to COG')
-    execute(f'gdaladdo -r average {filename} 2 4 8 16', uselogging=True)
-    creation_options = ['TILED=YES', 'COMPRESS=DEFLATE', 'NUM_THREADS=ALL_CPUS', 'COPY_SRC_OVERVIEWS=YES']
-    with NamedTemporaryFile() as temp_file:
-        shutil.copy(filename, temp_file.name)
-        gdal.Translate(filename, temp_file.name, format='GTiff', creationOptions=creation_options)
+    fd, temp_file = mkstemp(dir=os.path.dirname(filename) or '.', suffix='.tif')
+    os.close(fd)
+    # move rather than copy the original out of the way; it's restored if the conversion fails
+    os.replace(filename, temp_file)
+    try:
+        write_cog(temp_file, filename, num_threads=num_threads)
+    except Exception:
+        os.replace(temp_file, filename)
+        raise
+    os.remove(temp_file)
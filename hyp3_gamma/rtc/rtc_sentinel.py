@@ -6,6 +6,7 @@ import shutil
 import zipfile
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from datetime import datetime, timezone
+from fnmatch import fnmatch
 from glob import glob
 from math import isclose
 from pathlib import Path
@@ -14,27 +15,34 @@ from tempfile import NamedTemporaryFile, TemporaryDirectory
 
 import numpy as np
 from hyp3lib import DemError, ExecuteError, GranuleError
-from hyp3lib.execute import execute
 from hyp3lib.rtc2color import rtc2color
 from osgeo import gdal, gdalconst, ogr
 from s1_orbits import OrbitNotFoundError, fetch_for_scene
 
 import hyp3_gamma
 from hyp3_gamma.dem import get_geometry_from_kml, prepare_dem_geotiff
+from hyp3_gamma.dem_cache import get_or_create_dem
+from hyp3_gamma.execute import execute
 from hyp3_gamma.get_gamma_version import get_gamma_version
 from hyp3_gamma.get_parameter import get_parameter
 from hyp3_gamma.make_asf_browse import make_asf_browse
 from hyp3_gamma.metadata import create_metadata_file_set_rtc
+from hyp3_gamma.par_file import ParFile
 from hyp3_gamma.rtc import gdal_file
 from hyp3_gamma.rtc.byte_sigma_scale import byte_sigma_scale
 from hyp3_gamma.rtc.coregistration import CoregistrationError, check_coregistration
 from hyp3_gamma.rtc.create_amp import create_amp
-from hyp3_gamma.rtc.make_cogs import cogify_dir
+from hyp3_gamma.rtc.make_cogs import write_cog
 from hyp3_gamma.rtc.raster_boundary_to_shape import raster_boundary_to_shape
-from hyp3_gamma.util import set_pixel_as_point, unzip_granule
+from hyp3_gamma.task_runner import TaskRunner, get_max_workers
+from hyp3_gamma.util import unzip_granule
 
 
 log = logging.getLogger()
+
+# mk_geo_radcal2 mode 3 only reads these outputs of modes 0-2 (the lookup tables, and the layover/shadow and incidence
+# angle maps), so they can be shared between polarizations; the other `corrected*` files may be rewritten
+_LOOKUP_TABLE_FILES = ('*.map_to_rdc', '*.lt', '*.lt_fine', '*.ls_map', '*.inc_map')
 gdal.UseExceptions()
 ogr.UseExceptions()
 
@@ -42,14 +50,22 @@ ogr.UseExceptions()
 def create_decibel_tif(fi, nodata=None):
     f = gdal.Open(fi)
     in_nodata = f.GetRasterBand(1).GetNoDataValue()
-    _, _, trans, proj, data = gdal_file.read(f)
-    data = np.ma.masked_less_equal(np.ma.masked_values(data, in_nodata), 0.0)
-    powerdb = 10 * np.ma.log10(data)
+    del f
     if not nodata:
-        nodata = np.finfo(data.dtype).min.astype(float)
+        nodata = np.finfo(np.float32).min.astype(float)
+
+    def to_decibels(data):
+        invalid = data <= 0.0
+        if in_nodata is not None:
+            invalid |= np.isclose(data, in_nodata)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.log10(data, out=data)
+        data *= 10
+        data[invalid] = nodata
+        return data
+
     outfile = fi.replace('.tif', '-db.tif')
-    gdal_file.write_float(outfile, trans, proj, powerdb.filled(nodata), nodata=nodata)
-    del f
+    gdal_file.transform(fi, outfile, to_decibels, nodata=nodata)
     return outfile
 
 
@@ -159,8 +175,8 @@ def get_polarizations(safe_dir, skip_cross_pol=True):
     return polarizations
 
 
-def run(cmd):
-    execute(cmd, uselogging=True)
+def run(cmd, cwd=None, env=None):
+    execute(cmd, uselogging=True, cwd=cwd, env=env)
 
 
 def prepare_dem(
@@ -192,11 +208,14 @@ def prepare_dem(
         else:
             geometry = get_geometry_from_kml(f'{safe_dir}/preview/map-overlay.kml')
 
-        prepare_dem_geotiff(dem_tif, geometry, pixel_size)
-        run(
-            f'dem_import {dem_tif} {dem_image} {dem_par} - - $DIFF_HOME/scripts/egm2008-5.dem '
-            f'$DIFF_HOME/scripts/egm2008-5.dem_par - - - 1'
-        )
+        def create_dem():
+            prepare_dem_geotiff(dem_tif, geometry, pixel_size)
+            run(
+                f'dem_import {dem_tif} {dem_image} {dem_par} - - $DIFF_HOME/scripts/egm2008-5.dem '
+                f'$DIFF_HOME/scripts/egm2008-5.dem_par - - - 1'
+            )
+
+        get_or_create_dem(geometry, pixel_size, dem_tif, dem_image, dem_par, create_dem)
 
     else:
         raise DemError(f'DEM name "{dem_name}" is invalid; supported options are "copernicus".')
@@ -204,12 +223,15 @@ def prepare_dem(
     return dem_image, dem_par, dem_type
 
 
-def prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks):
+def prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks, speckle_filter=False):
     log.info(f'Generating multi-looked {pol.upper()} image')
     if granule_type == 'GRDH':
-        return _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks)
+        mli_image, mli_par = _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks)
     elif granule_type == 'SLC':
-        return _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks)
+        mli_image, mli_par = _prepare_mli_image_from_slc(safe_dir, pol, orbit_file, looks)
+    if speckle_filter:
+        apply_speckle_filter(mli_image, mli_par, looks * 30)
+    return mli_image, mli_par
 
 
 def _prepare_mli_image_from_grd(safe_dir, pol, orbit_file, looks):
@@ -267,14 +289,92 @@ def apply_speckle_filter(mli_image, mli_par, looks):
         shutil.copy(temp_file.name, mli_image)
 
 
+def create_lookup_table(mli_image, mli_par, dem_image, dem_par, resolution, dem_matching=False):
+    """Generate the geocoding lookup table (`corrected*` files) from one polarization's MLI image
+
+    Runs `mk_geo_radcal2` modes 0-2 (modes 1-2 only for DEM matching) once; every polarization is then geocoded with
+    the same lookup table by `geocode_image`.
+    """
+    log.info('Generating initial geocoding lookup table and simulating SAR image from the DEM')
+    run(f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected {resolution} 0 -q')
+
+    if dem_matching:
+        log.info('Determining co-registration offsets (DEM matching)')
+        try:
+            run(
+                f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
+                f'corrected {resolution} 1 -q'
+            )
+            run(
+                f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
+                f'corrected {resolution} 2 -q'
+            )
+            check_coregistration(
+                'mk_geo_radcal_2.log',
+                'corrected.diff_par',
+                pixel_size=resolution,
+            )
+        except (ExecuteError, CoregistrationError):
+            log.warning('Co-registration offsets are too large; defaulting to dead reckoning')
+            if os.path.isfile('corrected.diff_par'):
+                os.remove('corrected.diff_par')
+
+
+def geocode_image(pol, mli_image, mli_par, dem_image, dem_par, resolution, radiometry, omp_num_threads=None):
+    """Terrain geocode a polarization's MLI image and correct it for pixel area (`mk_geo_radcal2` mode 3)
+
+    The lookup table files are linked into a `geo_<pol>` directory and `mk_geo_radcal2` runs there, so polarizations
+    can be geocoded at once without overwriting each other's `corrected*` files and `mk_geo_radcal_3.log`.
+
+    Args:
+        omp_num_threads: Number of threads `mk_geo_radcal2` may use; defaults to `OMP_NUM_THREADS`
+
+    Returns:
+        power_tif: the geocoded power GeoTIFF, `<pol>-power.tif`
+    """
+    log.info(f'Generating terrain geocoded {pol.upper()} image and performing pixel area correction')
+    geo_dir = f'geo_{pol}'
+    os.mkdir(geo_dir)
+    for geo_file in glob('corrected*'):
+        if any(fnmatch(geo_file, pattern) for pattern in _LOOKUP_TABLE_FILES):
+            _link_or_copy(geo_file, os.path.join(geo_dir, geo_file))
+        else:
+            shutil.copy(geo_file, geo_dir)
+
+    inputs = ' '.join(os.path.abspath(f) for f in (mli_image, mli_par, dem_image, dem_par, 'dem_seg', 'dem_seg.par'))
+    radiometry_flag = int(radiometry == 'gamma0')
+    env = {'OMP_NUM_THREADS': omp_num_threads} if omp_num_threads else None
+    run(f'mk_geo_radcal2 {inputs} . corrected {resolution} 3 -q -c {radiometry_flag}', cwd=geo_dir, env=env)
+    shutil.move(f'{geo_dir}/mk_geo_radcal_3.log', f'mk_geo_radcal_3_{pol}.log')
+
+    power_tif = f'{pol}-power.tif'
+    shutil.move(f'{geo_dir}/corrected_cal_map.mli.tif', power_tif)
+    return power_tif
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
+def data2cog(par_file, data_file, data_type, output_name, **translate_options):
+    """Write a GAMMA raster to a product COG with pixel-is-point georeferencing, via a temporary GeoTIFF"""
+    with NamedTemporaryFile(suffix='.tif') as temp_file:
+        run(f'data2geotiff {par_file} {data_file} {data_type} {temp_file.name}')
+        write_cog(temp_file.name, output_name, area_or_point='Point', **translate_options)
+
+
 def create_area_geotiff(data_in, lookup_table, mli_par, dem_par, output_name):
     width_in = get_parameter(mli_par, 'range_samples')
-    width_out = get_parameter(dem_par, 'width')
-    nlines_out = get_parameter(dem_par, 'nlines')
+    dem_parameters = ParFile.read(dem_par)
+    width_out = dem_parameters['width']
+    nlines_out = dem_parameters['nlines']
 
     with NamedTemporaryFile() as temp_file:
         run(f'geocode_back {data_in} {width_in} {lookup_table} {temp_file.name} {width_out} {nlines_out} 2')
-        run(f'data2geotiff {dem_par} {temp_file.name} 2 {output_name}')
+        data2cog(dem_par, temp_file.name, 2, output_name)
 
 
 def create_browse_images(out_dir, out_name, pol):
@@ -282,7 +382,7 @@ def create_browse_images(out_dir, out_name, pol):
     outfile = f'{out_dir}/{out_name}'
     with NamedTemporaryFile() as rescaled_tif:
         byte_sigma_scale(pol_amp_tif, rescaled_tif.name)
-        make_asf_browse(rescaled_tif.name, outfile)
+        make_asf_browse(rescaled_tif.name, outfile, thumbnail_size=(100, 100))
 
     for file_type in ['inc_map', 'dem', 'area']:
         tif = f'{out_dir}/{out_name}_{file_type}.tif'
@@ -290,7 +390,7 @@ def create_browse_images(out_dir, out_name, pol):
             outfile = f'{out_dir}/{out_name}_{file_type}'
             with NamedTemporaryFile() as rescaled_tif:
                 byte_sigma_scale(tif, rescaled_tif.name)
-                make_asf_browse(rescaled_tif.name, outfile)
+                make_asf_browse(rescaled_tif.name, outfile, thumbnail_size=(100, 100))
 
     shapefile = f'{out_dir}/{out_name}_shape.shp'
     raster_boundary_to_shape(
@@ -394,79 +494,60 @@ def rtc_sentinel_gamma(
         dem_name,
     )
 
-    log.info('Preparing DEM')
-    dem_image, dem_par, dem_type = prepare_dem(safe_dir, dem_name, bbox, dem, resolution)
-
+    log.info('Preparing DEM and multi-looked images')
+    tasks = TaskRunner()
+    tasks.add('dem', prepare_dem, safe_dir, dem_name, bbox, dem, resolution)
     for pol in polarizations:
-        mli_image, mli_par = prepare_mli_image(safe_dir, granule_type, pol, orbit_file, looks)
-        if speckle_filter:
-            apply_speckle_filter(mli_image, mli_par, looks * 30)
+        tasks.add(pol, prepare_mli_image, safe_dir, granule_type, pol, orbit_file, looks, speckle_filter)
+    results = tasks.run()
+    dem_image, dem_par, dem_type = results['dem']
 
-        if pol == polarizations[0]:
-            log.info('Generating initial geocoding lookup table and simulating SAR image from the DEM')
-            run(
-                f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
-                f'{resolution} 0 -q'
-            )
+    mli_image, mli_par = results[polarizations[0]]
+    create_lookup_table(mli_image, mli_par, dem_image, dem_par, resolution, dem_matching)
 
-            if dem_matching:
-                log.info('Determining co-registration offsets (DEM matching)')
-                try:
-                    run(
-                        f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
-                        f'corrected {resolution} 1 -q'
-                    )
-                    run(
-                        f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . '
-                        f'corrected {resolution} 2 -q'
-                    )
-                    check_coregistration(
-                        'mk_geo_radcal_2.log',
-                        'corrected.diff_par',
-                        pixel_size=resolution,
-                    )
-                except (ExecuteError, CoregistrationError):
-                    log.warning('Co-registration offsets are too large; defaulting to dead reckoning')
-                    if os.path.isfile('corrected.diff_par'):
-                        os.remove('corrected.diff_par')
-
-        log.info(f'Generating terrain geocoded {pol.upper()} image and performing pixel area correction')
-        radiometry_flag = int(radiometry == 'gamma0')
-        run(
-            f'mk_geo_radcal2 {mli_image} {mli_par} {dem_image} {dem_par} dem_seg dem_seg.par . corrected '
-            f'{resolution} 3 -q -c {radiometry_flag}'
+    # mk_geo_radcal2 is multithreaded, so the threads are shared out between the polarizations geocoded at once
+    tasks = TaskRunner(max_workers=len(polarizations))
+    omp_num_threads = max(get_max_workers() // len(polarizations), 1)
+    for pol in polarizations:
+        mli_image, mli_par = results[pol]
+        tasks.add(
+            pol, geocode_image, pol, mli_image, mli_par, dem_image, dem_par, resolution, radiometry, omp_num_threads
         )
-        shutil.move('mk_geo_radcal_3.log', f'mk_geo_radcal_3_{pol}.log')
+    tasks.run()
+    # the remaining outputs of the last polarization's geocoding are used below, as when they were processed in turn
+    for geo_file in glob(f'geo_{polarizations[-1]}/corrected*'):
+        shutil.move(geo_file, os.path.basename(geo_file))
+    for pol in polarizations:
+        shutil.rmtree(f'geo_{pol}')
 
+    for pol in polarizations:
         power_tif = f'{pol}-power.tif'
-        shutil.move('corrected_cal_map.mli.tif', power_tif)
-
         tmp_tif = create_amp(power_tif, nodata=0)
         amp_tif = f'{pol}-amp.tif'
         shutil.move(tmp_tif, amp_tif)
 
         output_tif = f'{product_name}/{product_name}_{pol.upper()}.tif'
         if scale == 'power':
-            shutil.copy(power_tif, output_tif)
+            write_cog(power_tif, output_tif, area_or_point='Point')
         elif scale == 'decibel':
             decibel_tif = create_decibel_tif(power_tif)
-            shutil.copy(decibel_tif, output_tif)
+            write_cog(decibel_tif, output_tif, area_or_point='Point')
         else:
-            shutil.copy(amp_tif, output_tif)
+            write_cog(amp_tif, output_tif, area_or_point='Point')
 
     log.info('Collecting output GeoTIFFs')
-    run(f'data2geotiff dem_seg.par corrected.ls_map 5 {product_name}/{product_name}_ls_map.tif')
+    data2cog('dem_seg.par', 'corrected.ls_map', 5, f'{product_name}/{product_name}_ls_map.tif')
     if include_dem:
-        with NamedTemporaryFile() as temp_file:
-            run(f'data2geotiff dem_seg.par dem_seg 2 {temp_file.name}')
-            gdal.Translate(
-                f'{product_name}/{product_name}_dem.tif',
-                temp_file.name,
-                noData='none',
-                outputType=gdalconst.GDT_Int16,
-            )
+        data2cog(
+            'dem_seg.par',
+            'dem_seg',
+            2,
+            f'{product_name}/{product_name}_dem.tif',
+            noData='none',
+            outputType=gdalconst.GDT_Int16,
+        )
     if include_inc_map:
-        run(f'data2geotiff dem_seg.par corrected.inc_map 2 {product_name}/{product_name}_inc_map.tif')
+        data2cog('dem_seg.par', 'corrected.inc_map', 2, f'{product_name}/{product_name}_inc_map.tif')
     if include_scattering_area:
         create_area_geotiff(
             'corrected_gamma0.pix',
@@ -478,15 +559,11 @@ def rtc_sentinel_gamma(
     if len(polarizations) == 2:
         pol_power_tif = f'{polarizations[0]}-power.tif'
         cpol_power_tif = f'{polarizations[1]}-power.tif'
-        rgb_tif = f'{product_name}/{product_name}_rgb.tif'
+        rgb_tif = 'rgb.tif'
         rtc2color(pol_power_tif, cpol_power_tif, -24, rgb_tif, cleanup=True)
-        make_asf_browse(rgb_tif, f'{product_name}/{product_name}_rgb')
-        if not include_rgb:
-            os.remove(rgb_tif)
-
-    for tif_file in glob(f'{product_name}/*.tif'):
-        set_pixel_as_point(tif_file, shift_origin=False)
-    cogify_dir(directory=product_name)
+        make_asf_browse(rgb_tif, f'{product_name}/{product_name}_rgb', thumbnail_size=(100, 100))
+        if include_rgb:
+            write_cog(rgb_tif, f'{product_name}/{product_name}_rgb.tif', area_or_point='Point')
 
     log.info('Generating browse images and metadata files')
     create_browse_images(product_name, product_name, polarizations[0])
@@ -619,7 +696,8 @@ def main():
     log.info('===================================================================')
 
     if zipfile.is_zipfile(args.safe_dir):
-        args.safe_dir = unzip_granule(args.safe_dir)
+        granule = os.path.splitext(os.path.basename(args.safe_dir))[0]
+        args.safe_dir = unzip_granule(args.safe_dir, polarizations=get_polarizations(granule, args.skip_cross_pol))
 
     rtc_sentinel_gamma(
         safe_dir=args.safe_dir,
@@ -0,0 +1,116 @@
+"""Approximate statistics of rasters too large to hold in memory, accumulated one block at a time"""
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Approximate percentiles and exact moments of values added one block at a time
+
+    Values are counted in log-spaced bins, separately for negative and positive values, along with the sum and sum of
+    squares of the values in each bin. A percentile is estimated as the mean of the bin holding the value at that
+    rank, so it is within `relative_accuracy` of that value. Magnitudes outside the range of normal float32 values are
+    counted in the smallest or largest bin, which weakens that guarantee for them.
+
+    The mean and standard deviation are exact. Sketches with the same `relative_accuracy` can be merged, e.g. to
+    combine sketches of blocks processed in other processes, and pickled.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        """Args:
+        relative_accuracy: Relative error bound of the percentile estimates
+        """
+        self.relative_accuracy = relative_accuracy
+        self._log_base = np.log1p(relative_accuracy)
+        self._min_key = int(np.floor(np.log(np.finfo(np.float32).tiny) / self._log_base))
+        self._keys = int(np.ceil(np.log(np.finfo(np.float32).max) / self._log_base)) - self._min_key + 1
+
+        # negative bins in descending order of magnitude, then the zero bin, then the positive bins
+        bins = 2 * self._keys + 1
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.sums = np.zeros(bins)
+        self.sums_of_squares = np.zeros(bins)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def mean(self) -> float:
+        return self.moments()[0]
+
+    @property
+    def std(self) -> float:
+        return self.moments()[1]
+
+    def add(self, values: np.ndarray) -> 'QuantileSketch':
+        """Add values to the sketch, ignoring NaNs and infinities"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return self
+
+        with np.errstate(divide='ignore'):
+            keys = np.ceil(np.log(np.abs(values)) / self._log_base)
+        np.clip(keys, self._min_key, self._min_key + self._keys - 1, out=keys)
+        offsets = keys.astype(np.int64) - self._min_key
+        bins = np.where(values > 0, self._keys + 1 + offsets, self._keys - 1 - offsets)
+        bins[values == 0] = self._keys
+
+        self.counts += np.bincount(bins, minlength=self.counts.size)
+        self.sums += np.bincount(bins, weights=values, minlength=self.counts.size)
+        self.sums_of_squares += np.bincount(bins, weights=values * values, minlength=self.counts.size)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Add the values of another sketch to this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                f'Cannot merge a sketch with relative accuracy {other.relative_accuracy} '
+                f'into one with relative accuracy {self.relative_accuracy}'
+            )
+        self.counts += other.counts
+        self.sums += other.sums
+        self.sums_of_squares += other.sums_of_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q: float) -> float:
+        """Estimate the `q`th percentile, i.e. the value at rank `q / 100 * (count - 1)` in sorted order"""
+        count = self.count
+        if count == 0:
+            raise ValueError('Cannot compute a percentile of an empty sketch')
+        if q <= 0:
+            return float(self.min)
+        if q >= 100:
+            return float(self.max)
+
+        rank = q / 100 * (count - 1)
+        index = np.searchsorted(np.cumsum(self.counts), rank, side='right')
+        return float(self.sums[index] / self.counts[index])
+
+    def moments(self, lower: float | None = None, upper: float | None = None) -> tuple[float, float]:
+        """Mean and standard deviation of the values, with values below `lower` or above `upper` clipped to them
+
+        Clipping is applied per bin, so it is approximate for values in the same bin as `lower` or `upper`.
+        """
+        count = self.count
+        if count == 0:
+            raise ValueError('Cannot compute the moments of an empty sketch')
+
+        counts, sums, sums_of_squares = self.counts, self.sums.copy(), self.sums_of_squares.copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        for limit, outside in ((lower, np.less), (upper, np.greater)):
+            if limit is not None:
+                clipped = outside(means, limit)
+                sums[clipped] = counts[clipped] * limit
+                sums_of_squares[clipped] = counts[clipped] * limit**2
+
+        mean = sums.sum() / count
+        variance = max(sums_of_squares.sum() / count - mean**2, 0.0)
+        return float(mean), float(np.sqrt(variance))
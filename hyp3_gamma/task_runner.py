@@ -0,0 +1,115 @@
+"""Run independent processing steps concurrently while respecting their dependencies"""
+
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+log = logging.getLogger(__name__)
+
+
+def get_max_workers() -> int:
+    """Get the number of concurrent workers to use.
+
+    This is the `OMP_NUM_THREADS` environment variable (set by `hyp3_gamma ++omp-num-threads`) if it is set, otherwise
+    the number of CPUs.
+    """
+    omp_num_threads = os.environ.get('OMP_NUM_THREADS', '')
+    if omp_num_threads.isdigit() and int(omp_num_threads) > 0:
+        return int(omp_num_threads)
+    return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class _Task:
+    name: str
+    function: Callable
+    args: tuple
+    kwargs: dict
+    depends_on: tuple[str, ...]
+
+
+class TaskRunner:
+    """Run tasks on a bounded thread pool, starting each task once all the tasks it depends on have finished.
+
+    Tasks are intended to be I/O- or subprocess-bound (e.g. GAMMA programs run via `execute`), so threads are used
+    rather than processes. A task may only depend on tasks that were added before it, so the tasks always form a
+    directed acyclic graph.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        """Args:
+        max_workers: maximum number of tasks to run at once; defaults to `get_max_workers()`
+        """
+        self.max_workers = max_workers or get_max_workers()
+        self._tasks: dict[str, _Task] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def add(self, name: str, function: Callable, /, *args, depends_on=(), **kwargs) -> str:
+        """Add a task that calls `function(*args, **kwargs)`.
+
+        Args:
+            name: unique name of the task, e.g. the name of the file it creates
+            function: function to call
+            *args: positional arguments for `function`
+            depends_on: names of tasks that must finish before this task starts
+            **kwargs: keyword arguments for `function`
+
+        Returns:
+            name of the task
+        """
+        if name in self._tasks:
+            raise ValueError(f'Task {name} has already been added')
+        unknown = [dependency for dependency in depends_on if dependency not in self._tasks]
+        if unknown:
+            raise ValueError(f'Task {name} depends on unknown task(s): {", ".join(unknown)}')
+        self._tasks[name] = _Task(name, function, args, kwargs, tuple(depends_on))
+        return name
+
+    def run(self) -> dict[str, Any]:
+        """Run all tasks.
+
+        If a task raises an exception, no further tasks are started; tasks that are already running are allowed to
+        finish and then the first exception is re-raised.
+
+        Returns:
+            return value of each task, keyed by task name
+        """
+        results: dict[str, Any] = {}
+        pending = dict(self._tasks)
+        running: dict[Future, str] = {}
+        error: BaseException | None = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [task for task in pending.values() if all(dep in results for dep in task.depends_on)]
+                    # only as many tasks as there are workers are submitted, so none are left queued in the executor
+                    # (and run regardless) if a task fails
+                    for task in ready[: self.max_workers - len(running)]:
+                        del pending[task.name]
+                        running[executor.submit(task.function, *task.args, **task.kwargs)] = task.name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        log.error(f'Task {name} failed: {e}')
+                        if error is None:
+                            error = e
+
+        if error is not None:
+            raise error
+        return results
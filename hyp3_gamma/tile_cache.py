@@ -0,0 +1,225 @@
+"""Node-local cache of remote raster tiles, e.g. Copernicus DEM and water mask tiles, shared by the jobs on a node"""
+
+import hashlib
+import logging
+import os
+import re
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from tempfile import mkstemp
+
+import requests
+
+from hyp3_gamma.remote_zip import get_session
+from hyp3_gamma.util import file_lock
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 2**30
+VSICURL_PREFIX = '/vsicurl/'
+
+_MD5_ETAG = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class ChecksumError(Exception):
+    """Raised when a fetched tile doesn't match the checksum its server reported"""
+
+
+class TileCache:
+    """A size-bounded, least-recently-used cache of tiles in a directory
+
+    Each tile is fetched once, from an HTTP(S) URL (optionally with GDAL's `/vsicurl/` prefix) or a local path, and
+    stored with the SHA-256 checksum of its content. A cached tile is verified against that checksum whenever it's
+    used, and fetched again if it doesn't match. When the server reports an MD5 ETag, as S3 does for objects that
+    weren't uploaded in parts, the download is verified against it too.
+
+    A lock file per tile makes concurrent jobs that need the same tile fetch it only once. Jobs hold a shared lock on
+    each tile they're reading (see `use`), and eviction skips tiles that are locked.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Args:
+        directory: Directory to store the cache in; created if it doesn't exist
+        max_bytes: Total size of the cached tiles above which the least recently used tiles are evicted
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._session: requests.Session | None = None
+
+    @classmethod
+    def from_environment(cls) -> 'TileCache | None':
+        """Get the cache configured by `HYP3_TILE_CACHE` and `HYP3_TILE_CACHE_MAX_BYTES`, or None if it's not set"""
+        directory = os.environ.get('HYP3_TILE_CACHE')
+        if not directory:
+            return None
+        max_bytes = int(os.environ.get('HYP3_TILE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        return cls(directory, max_bytes)
+
+    @contextmanager
+    def use(self, tile: str) -> Iterator[str]:
+        """Context manager yielding the path of a tile's local copy, fetching it if it isn't cached
+
+        A shared lock on the tile is held until the context exits, so that it isn't evicted while it's read.
+
+        Args:
+            tile: URL or local path of the tile, e.g. `/vsicurl/https://example.com/tiles/n00e000.tif`
+        """
+        source = tile.removeprefix(VSICURL_PREFIX)
+        name = get_tile_name(source)
+        path = self.directory / name
+        lock_file = self.directory / f'.{name}.lock'
+
+        fetched = False
+        while True:
+            with file_lock(lock_file, shared=True):
+                if self._is_cached(name):
+                    os.utime(path)
+                    if fetched:
+                        self._evict_after_fetch()
+                    yield str(path)
+                    return
+
+            # the tile may have been fetched by another job, or evicted again, before the exclusive lock is taken
+            with file_lock(lock_file):
+                if not self._is_cached(name):
+                    if path.exists():
+                        log.warning(f'Cached tile {path} is incomplete or corrupt; fetching {source} again')
+                        path.unlink()
+                    log.info(f'Caching {source} in {path}')
+                    checksum = self._fetch(source, path)
+                    (self.directory / f'.{name}.sha256').write_text(checksum)
+                    fetched = True
+
+    def get(self, tile: str) -> str:
+        """Get the path of a tile's local copy, fetching it if it isn't cached
+
+        The tile isn't locked once this returns, so it may be evicted by then; use `use` to read it.
+
+        Args:
+            tile: URL or local path of the tile, e.g. `/vsicurl/https://example.com/tiles/n00e000.tif`
+
+        Returns:
+            The path of the cached tile
+        """
+        with self.use(tile) as path:
+            return path
+
+    def evict(self) -> list[str]:
+        """Remove least recently used tiles until the cache fits in `max_bytes`, skipping tiles that are in use
+
+        Returns:
+            The names of the removed tiles
+        """
+        stats = {}
+        for tile in self.directory.iterdir():
+            if tile.name.startswith('.') or not tile.is_file():
+                continue
+            try:
+                stats[tile] = tile.stat()
+            except FileNotFoundError:
+                # evicted by another job while the cache was scanned
+                continue
+        tiles = sorted(stats, key=lambda tile: stats[tile].st_mtime)
+        sizes = {tile: stats[tile].st_size for tile in tiles}
+        total = sum(sizes.values())
+
+        evicted = []
+        for tile in tiles:
+            if total <= self.max_bytes:
+                break
+            with file_lock(self.directory / f'.{tile.name}.lock', blocking=False) as locked:
+                if not locked or not tile.exists():
+                    continue
+                tile.unlink()
+                (self.directory / f'.{tile.name}.sha256').unlink(missing_ok=True)
+            log.info(f'Evicted cached tile {tile}')
+            total -= sizes[tile]
+            evicted.append(tile.name)
+        return evicted
+
+    def _is_cached(self, name: str) -> bool:
+        path = self.directory / name
+        checksum_file = self.directory / f'.{name}.sha256'
+        return path.exists() and checksum_file.exists() and _sha256(path) == checksum_file.read_text()
+
+    def _evict_after_fetch(self) -> None:
+        try:
+            self.evict()
+        except OSError as e:
+            log.warning(f'Failed to evict cached tiles from {self.directory}: {e}')
+
+    def _fetch(self, source: str, path: Path) -> str:
+        """Fetch a tile to `path` through a temporary file, returning its SHA-256 checksum"""
+        fd, temp_file = mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if source.startswith(('http://', 'https://')):
+                    checksum = self._download(source, f)
+                else:
+                    with open(source, 'rb') as src:
+                        checksum = _copy_and_hash(iter(lambda: src.read(2**20), b''), f)
+            os.replace(temp_file, path)
+        except BaseException:
+            Path(temp_file).unlink(missing_ok=True)
+            raise
+        return checksum
+
+    def _download(self, url: str, f) -> str:
+        if self._session is None:
+            self._session = get_session()
+        with self._session.get(url, stream=True) as response:
+            response.raise_for_status()
+            md5 = hashlib.md5()
+            chunks = response.iter_content(chunk_size=2**20)
+            checksum = _copy_and_hash(chunks, f, md5)
+            verify_etag(url, response.headers.get('ETag'), md5.hexdigest())
+        return checksum
+
+
+def verify_etag(url: str, etag: str | None, md5: str) -> None:
+    """Raise a `ChecksumError` if `etag` is an MD5 checksum that doesn't match `md5`; other ETags aren't checked"""
+    match = _MD5_ETAG.match(etag or '')
+    if match and match.group(1) != md5:
+        raise ChecksumError(f'{url} has MD5 {md5}, but its ETag is {etag}')
+
+
+def get_tile_name(source: str) -> str:
+    """Get the name a tile is cached as: its file name, prefixed by a hash of its source so names don't collide"""
+    digest = hashlib.sha256(source.encode()).hexdigest()[:16]
+    return f'{digest}-{os.path.basename(source.rstrip("/"))}'
+
+
+@contextmanager
+def tile_paths(tiles: Iterable[str]) -> Iterator[list[str]]:
+    """Context manager yielding the paths of tiles in the cache configured by the environment
+
+    The tiles are kept in the cache until the context exits (see `TileCache.use`). If no cache is configured (see
+    `TileCache.from_environment`), the tiles themselves are yielded.
+    """
+    cache = TileCache.from_environment()
+    if cache is None:
+        yield list(tiles)
+        return
+    with ExitStack() as stack:
+        yield [stack.enter_context(cache.use(tile)) for tile in tiles]
+
+
+def _copy_and_hash(chunks, f, *other_hashes) -> str:
+    sha256 = hashlib.sha256()
+    for chunk in chunks:
+        f.write(chunk)
+        sha256.update(chunk)
+        for other_hash in other_hashes:
+            other_hash.update(chunk)
+    return sha256.hexdigest()
+
+
+def _sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -1,16 +1,27 @@
+import concurrent.futures
+import fcntl
 import logging
 import os
+import re
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 from zipfile import ZipFile
 
 from hyp3lib.fetch import download_file
+from hyp3lib.image import create_thumbnail
 from hyp3lib.scene import get_download_url
 from osgeo import gdal
 
+from hyp3_gamma.remote_zip import RangeRequestsNotSupportedError, extract_remote_zip, select_members
+
 
 log = logging.getLogger(__name__)
 gdal.UseExceptions()
 
+# e.g. s1a-iw1-slc-vv-..., calibration-s1a-iw1-slc-vv-..., s1b-iw-grd-vh-...
+_SAFE_MEMBER_PATTERN = re.compile(r's1[a-d]-[a-z]{2}(?P<swath>\d?)-[a-z]{3}-(?P<polarization>[hv]{2})-')
+
 
 class GDALConfigManager:
     """Context manager for setting GDAL config options temporarily"""
@@ -34,17 +45,141 @@ class GDALConfigManager:
             gdal.SetConfigOption(key, value)
 
 
-def get_granule(granule):
+@contextmanager
+def file_lock(path: str | Path, blocking: bool = True, shared: bool = False) -> Iterator[bool]:
+    """Context manager holding an exclusive or shared `flock` on a lock file, shared by the processes on a node
+
+    Args:
+        path: Path of the lock file; created if it doesn't exist
+        blocking: Whether to wait for the lock; if False, the lock is only taken if it's free
+        shared: Take a shared lock, which other shared locks can be held alongside, instead of an exclusive one
+
+    Yields:
+        Whether the lock was taken
+    """
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    with open(path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, operation if blocking else operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_required_safe_member(name: str) -> bool:
+    """Whether a member of a Sentinel-1 SAFE zip file is used by the RTC or InSAR processing
+
+    The measurement TIFFs, annotation and calibration XMLs, manifest, and map overlay KML are required; the schemas in
+    `support/`, quick-look and preview images, and PDF report are not.
+    """
+    parts = name.rstrip('/').split('/')
+    if len(parts) < 2:
+        return True
+    path = '/'.join(parts[1:])
+    return path in ('manifest.safe', 'preview', 'preview/map-overlay.kml') or path.startswith(
+        ('annotation', 'measurement')
+    )
+
+
+def get_safe_member_filter(
+    polarizations: Iterable[str] | None = None, swaths: Iterable[int] | None = None, required_only: bool = False
+) -> Callable[[str], bool]:
+    """Get a function that returns whether a member of a Sentinel-1 SAFE zip file is needed for the given
+    polarizations and swaths
+
+    The measurement TIFFs and the annotation, calibration, and noise XMLs of other polarizations and swaths are not
+    needed; all other members are, unless `required_only` is set.
+
+    Args:
+        polarizations: Polarizations to keep (e.g. `['vv']`); defaults to all
+        swaths: Swath numbers to keep (e.g. `[1, 2, 3]`); defaults to all. Ignored for GRD products.
+        required_only: Also skip the members that aren't used by processing; see `is_required_safe_member`
+    """
+    keep_polarizations = {polarization.lower() for polarization in polarizations} if polarizations else None
+    keep_swaths = {str(swath) for swath in swaths} if swaths else None
+
+    def is_needed(name: str) -> bool:
+        if required_only and not is_required_safe_member(name):
+            return False
+        match = _SAFE_MEMBER_PATTERN.search(os.path.basename(name.rstrip('/')))
+        if match is None:
+            return True
+        if keep_polarizations is not None and match['polarization'] not in keep_polarizations:
+            return False
+        if keep_swaths is not None and match['swath'] and match['swath'] not in keep_swaths:
+            return False
+        return True
+
+    return is_needed
+
+
+def get_granule(granule, stream=True, polarizations=None, swaths=None, dry_run=False):
+    """Download and extract a Sentinel-1 granule
+
+    Args:
+        granule: Name of the granule
+        stream: Extract the members of the SAFE zip file directly from the download URL, without writing the zip file
+            to disk. Falls back to downloading the whole zip file if the server does not support HTTP range requests.
+        polarizations: Only extract the measurement and annotation files of these polarizations; defaults to all
+        swaths: Only extract the measurement and annotation files of these swath numbers; defaults to all
+        dry_run: Log which members would be extracted and how many bytes would be skipped, without extracting them.
+            Nothing is downloaded; if the server does not support range requests, only that is logged.
+
+    Returns:
+        The name of the extracted SAFE directory
+    """
     download_url = get_download_url(granule)
+    if stream:
+        try:
+            is_needed = get_safe_member_filter(polarizations, swaths, required_only=True)
+            extract_remote_zip(download_url, members=is_needed, dry_run=dry_run)
+            return f'{granule}.SAFE'
+        except RangeRequestsNotSupportedError as e:
+            if dry_run:
+                log.warning(f'Dry run: {e}; the whole zip file would be downloaded')
+                return f'{granule}.SAFE'
+            log.warning(f'{e}; downloading the whole zip file instead')
+    elif dry_run:
+        log.warning('Dry run: the whole zip file would be downloaded')
+        return f'{granule}.SAFE'
     zip_file = download_file(download_url, chunk_size=10485760)
-    safe_dir = unzip_granule(zip_file, remove=True)
+    safe_dir = unzip_granule(zip_file, remove=True, polarizations=polarizations, swaths=swaths, required_only=True)
     return safe_dir
 
 
-def unzip_granule(zip_file: str, remove: bool = False) -> str:
+def unzip_granule(
+    zip_file: str,
+    remove: bool = False,
+    polarizations: Iterable[str] | None = None,
+    swaths: Iterable[int] | None = None,
+    dry_run: bool = False,
+    required_only: bool = False,
+) -> str:
+    """Extract a Sentinel-1 SAFE zip file
+
+    Args:
+        zip_file: SAFE zip file
+        remove: Remove the zip file after extracting it
+        polarizations: Only extract the measurement and annotation files of these polarizations; defaults to all
+        swaths: Only extract the measurement and annotation files of these swath numbers; defaults to all
+        dry_run: Log which members would be extracted and how many bytes would be skipped, without extracting them or
+            removing the zip file
+        required_only: Only extract the members that are used by processing; see `is_required_safe_member`
+
+    Returns:
+        The name of the extracted SAFE directory
+    """
     log.info(f'Unzipping {zip_file}')
     with ZipFile(zip_file) as z:
-        z.extractall()
+        summary = select_members(z, get_safe_member_filter(polarizations, swaths, required_only))
+        log.info(f'{"Dry run: " if dry_run else ""}{summary}')
+        if dry_run:
+            return Path(zip_file).with_suffix('.SAFE').name
+        z.extractall(members=summary.names)
     if remove:
         os.remove(zip_file)
     return Path(zip_file).with_suffix('.SAFE').name
@@ -65,3 +200,26 @@ def set_pixel_as_point(tif_file, shift_origin=False):
         transform[3] += transform[5] / 2
         ds.SetGeoTransform(transform)
     del ds
+
+
+def create_thumbnails(product_dir: Path, max_workers: int | None = None) -> list[Path]:
+    """Create a thumbnail of every browse PNG in a product directory that doesn't have one yet, one process per image
+
+    `make_asf_browse` usually makes the thumbnails with the browse images, so this is only a fallback for the rest.
+
+    Args:
+        product_dir: Product directory; the thumbnails are written alongside the browse images
+        max_workers: Maximum number of processes; defaults to the CPU count
+
+    Returns:
+        the created thumbnails
+    """
+    product_dir = Path(product_dir)
+    browse_images = sorted(
+        path
+        for path in product_dir.glob('*.png')
+        if not path.stem.endswith('_thumb') and not path.with_name(f'{path.stem}_thumb.png').exists()
+    )
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(create_thumbnail, browse, output_dir=product_dir) for browse in browse_images]
+        return [future.result() for future in futures]
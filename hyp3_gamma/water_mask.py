@@ -1,60 +1,42 @@
 """Create and apply a water body mask"""
 
-import subprocess
 from pathlib import Path
 
 import numpy as np
 from osgeo import gdal
 from pyproj import CRS
 
+from hyp3_gamma.footprint import get_bounds
+from hyp3_gamma.rtc import gdal_file
+from hyp3_gamma.tile_cache import tile_paths
+
 
 gdal.UseExceptions()
 
 TILE_PATH = '/vsicurl/https://asf-dem-west.s3.amazonaws.com/WATER_MASK/TILES/'
 
 
-def get_extent(filename, tmp_path: Path | None, epsg='EPSG:4326'):
+def get_extent(filename, tmp_path: Path | None = None, epsg='EPSG:4326'):
     """Get the extent of the image [min x, min y, max x, max y].
 
+    The extent is computed from the image's edges with `footprint.get_bounds`, without reprojecting the image.
+
     Args:
-        filename: The path to the input image.
-        tmp_path: An optional path to a temporary directory for temp files.
-        epsg: The EPSG code to open the image in.
+        filename: The path to the input image, or an open GDAL dataset.
+        tmp_path: Unused; no temporary files are written.
+        epsg: The EPSG code to get the extent in.
     """
-    tmp_file = 'tmp.tif' if not tmp_path else str(tmp_path / Path('tmp.tif'))
-    ds = gdal.Warp(
-        tmp_file,
-        filename,
-        dstSRS=epsg,
-        creationOptions=['COMPRESS=LZW', 'TILED=YES', 'NUM_THREADS=all_cpus'],
-    )
-    geotransform = ds.GetGeoTransform()
-    x_min = geotransform[0]
-    x_max = x_min + geotransform[1] * ds.RasterXSize
-    y_max = geotransform[3]
-    y_min = y_max + geotransform[5] * ds.RasterYSize
-    return [x_min, y_min, x_max, y_max]
-
-
-def get_corners(filename, tmp_path: Path | None):
-    """Get all four corners of the given image: [upper_left, bottom_left, upper_right, bottom_right].
+    return get_bounds(filename, epsg)
+
+
+def get_corners(filename, tmp_path: Path | None = None):
+    """Get all four corners of the given image's lon/lat extent: [upper_left, bottom_left, upper_right, bottom_right].
 
     Args:
-        filename: The path to the input image.
-        tmp_path: An optional path to a temporary directory for temp files.
+        filename: The path to the input image, or an open GDAL dataset.
+        tmp_path: Unused; no temporary files are written.
     """
-    tmp_file = 'tmp.tif' if not tmp_path else str(tmp_path / Path('tmp.tif'))
-    ds = gdal.Warp(
-        tmp_file,
-        filename,
-        dstSRS='EPSG:4326',
-        creationOptions=['COMPRESS=LZW', 'TILED=YES', 'NUM_THREADS=all_cpus'],
-    )
-    geotransform = ds.GetGeoTransform()
-    x_min = geotransform[0]
-    x_max = x_min + geotransform[1] * ds.RasterXSize
-    y_max = geotransform[3]
-    y_min = y_max + geotransform[5] * ds.RasterYSize
+    x_min, y_min, x_max, y_max = get_extent(filename, epsg='EPSG:4326')
     upper_left = [x_min, y_max]
     bottom_left = [x_min, y_min]
     upper_right = [x_max, y_max]
@@ -81,15 +63,24 @@ def coord_to_tile(coord: tuple[float, float]) -> str:
     return lat_part + lon_part + '.tif'
 
 
-def get_tiles(filename: str, tmp_path: Path | None) -> list:
+def get_tiles(filename, tmp_path: Path | None = None) -> list:
     """Get the AWS vsicurl path's to the tiles necessary to cover the inputted file.
 
     Args:
-        filename: The path to the input file.
-        tmp_path: An optional path to a temporary directory for temp files.
+        filename: The path to the input file, or an open GDAL dataset.
+        tmp_path: Unused; no temporary files are written.
     """
-    tiles = []
     corners = get_corners(filename, tmp_path=tmp_path)
+    return get_tiles_for_corners(corners)
+
+
+def get_tiles_for_corners(corners: list) -> list:
+    """Get the AWS vsicurl path's to the tiles enclosing the given (lon, lat) corners.
+
+    Args:
+        corners: The (lon, lat) corners of the area to cover.
+    """
+    tiles = []
     for corner in corners:
         tile = TILE_PATH + coord_to_tile(corner)
         if tile not in tiles:
@@ -101,7 +92,7 @@ def create_water_mask(
     input_image: str,
     output_image: str,
     gdal_format='GTiff',
-    tmp_path: Path = Path(),
+    tmp_path: Path | None = None,
 ):
     """Create a water mask GeoTIFF with the same geometry as a given input GeoTIFF
 
@@ -110,68 +101,63 @@ def create_water_mask(
     Shoreline data is unbuffered and pixel values of 1 indicate land touches the pixel and 0 indicates there is no
     land in the pixel.
 
+    The tiles are mosaicked and warped to the input image's grid through in-memory VRTs, and the warped mask is
+    inverted one block at a time as it's written, so the output image is the only file written.
+
     Args:
         input_image: Path for the input GDAL-compatible image
         output_image: Path for the output image
         gdal_format: GDAL format name to create output image as
-        tmp_path: An optional path to a temporary directory for temp files.
+        tmp_path: Unused; no temporary files are written.
     """
     # Ensures that the input image is not using Ground Control Points.
-    input_image_tmp = 'input.tif'
-    ds = gdal.Warp(input_image_tmp, input_image)
-    input_image = input_image_tmp
+    ds = gdal.Warp('', input_image, format='VRT')
 
     pixel_size = ds.GetGeoTransform()[1]
     proj = CRS.from_wkt(ds.GetProjection())
     epsg = f'EPSG:{proj.to_epsg()}'
 
-    tiles = get_tiles(input_image, tmp_path=tmp_path)
+    tiles = get_tiles(ds)
 
     if len(tiles) < 1:
         raise ValueError(f'No water mask tiles found for {tiles}.')
 
-    merged_tif_path = str(tmp_path / 'merged.tif')
-    merged_vrt_path = str(tmp_path / 'merged.vrt')
-    merged_warped_path = str(tmp_path / 'merged_warped.tif')
-    shape_path = str(tmp_path / 'tmp.shp')
-
-    # This is WAY faster than using gdal_merge, because of course it is.
-    if len(tiles) > 1:
-        build_vrt_command = ['gdalbuildvrt', merged_vrt_path] + tiles
-        subprocess.run(build_vrt_command, check=True)
-        translate_command = [
-            'gdal_translate',
-            '-co',
-            'COMPRESS=LZW',
-            '-co',
-            'NUM_THREADS=all_cpus',
-            merged_vrt_path,
-            merged_tif_path,
-        ]
-        subprocess.run(translate_command, check=True)
-
-    shapefile_command = ['gdaltindex', shape_path, input_image]
-    subprocess.run(shapefile_command, check=True)
-
-    warp_filename = merged_tif_path if len(tiles) > 1 else tiles[0]
-    corners = get_extent(input_image, tmp_path=tmp_path, epsg=epsg)
-    gdal.Warp(
-        merged_warped_path,
-        warp_filename,
-        outputBounds=corners,
-        xRes=pixel_size,
-        yRes=pixel_size,
-        dstSRS=epsg,
-        format='GTiff',
-        creationOptions=['COMPRESS=LZW', 'NUM_THREADS=all_cpus'],
-    )
-
-    flip_values_command = [
-        'gdal_calc.py',
-        '-A',
-        merged_warped_path,
-        f'--outfile={output_image}',
-        '--calc="numpy.abs((A.astype(numpy.int16) + 1) - 2)"',  # Change 1's to 0's and 0's to 1's.
-        f'--format={gdal_format}',
-    ]
-    subprocess.run(flip_values_command, check=True)
+    # the VRTs read the tiles lazily, so they're kept in the tile cache until the mask is written
+    with tile_paths(tiles) as tile_files:
+        merged = gdal.BuildVRT('', tile_files) if len(tile_files) > 1 else gdal.Open(tile_files[0])
+        corners = get_extent(ds, epsg=epsg)
+        warped = gdal.Warp(
+            '',
+            merged,
+            outputBounds=corners,
+            xRes=pixel_size,
+            yRes=pixel_size,
+            dstSRS=epsg,
+            format='VRT',
+        )
+        _write_inverted_mask(warped, output_image, gdal_format)
+
+
+def _write_inverted_mask(warped: gdal.Dataset, output_image: str, gdal_format: str):
+    """Write a mask with its 1's changed to 0's and 0's to 1's, as a byte image with a no-data value of 255
+
+    This matches `gdal_calc.py --calc="numpy.abs((A.astype(numpy.int16) + 1) - 2)"` with its default output type and
+    no-data value: pixels with the input's no-data value, if it has one, are written as no-data.
+    """
+    input_band = warped.GetRasterBand(1)
+    input_nodata = input_band.GetNoDataValue()
+    output_nodata = 255
+
+    driver = gdal.GetDriverByName(gdal_format)
+    output = driver.Create(output_image, warped.RasterXSize, warped.RasterYSize, 1, gdal.GDT_Byte)
+    output.SetGeoTransform(warped.GetGeoTransform())
+    output.SetProjection(warped.GetProjection())
+    output_band = output.GetRasterBand(1)
+    output_band.SetNoDataValue(output_nodata)
+
+    for yoff, data in gdal_file.read_windows(warped):
+        inverted = np.abs(data.astype(np.int16) - 1)
+        if input_nodata is not None:
+            inverted[data == input_nodata] = output_nodata
+        output_band.WriteArray(inverted.astype(np.uint8), 0, yoff)
+    output = None  # How to close with gdal
@@ -1,5 +1,7 @@
 import os
 import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 import pytest
@@ -19,3 +21,83 @@ def geotiff(tmp_path):
     geotiff_file = str(tmp_path / 'test_geotiff.tif')
     shutil.copy(os.path.join(_HERE, 'data', 'test_geotiff.tif'), geotiff_file)
     return geotiff_file
+
+
+@pytest.fixture()
+def write_geotiff(tmp_path):
+    """Write a float32 array to a tiled GeoTIFF in `tmp_path`; returns the GeoTIFF's path"""
+    from osgeo import gdal
+
+    def write(name, data, nodata=None):
+        filename = str(tmp_path / name)
+        driver = gdal.GetDriverByName('GTiff')
+        ds = driver.Create(filename, data.shape[1], data.shape[0], 1, gdal.GDT_Float32, ['TILED=YES'])
+        ds.SetGeoTransform([440720.0, 60.0, 0.0, 3751320.0, 0.0, -60.0])
+        ds.GetRasterBand(1).WriteArray(data)
+        if nodata is not None:
+            ds.GetRasterBand(1).SetNoDataValue(nodata)
+        ds = None  # How to close with gdal
+        return filename
+
+    return write
+
+
+@pytest.fixture()
+def http_server():
+    """Serve `content[path]` over HTTP with support for range requests, except for `/no-ranges.zip`
+
+    `/redirect.zip` redirects to `/granule.zip`, and `/signed.zip` to `/granule.zip?token=<n>`, where only the most
+    recently issued token is accepted, like a presigned URL that expires.
+
+    Yields the server URL, the `content` dict, and a list of the Range header of each request.
+    """
+    content: dict[str, bytes] = {}
+    requests: list[str | None] = []
+    tokens: list[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.headers.get('Range'))
+            if self.path in ('/redirect.zip', '/signed.zip'):
+                location = '/granule.zip'
+                if self.path == '/signed.zip':
+                    tokens.append(str(len(tokens)))
+                    location += f'?token={tokens[-1]}'
+                self.send_response(302)
+                self.send_header('Location', location)
+                self.end_headers()
+                return
+            path, _, query = self.path.partition('?')
+            if query and query != f'token={tokens[-1]}':
+                self.send_response(403)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            data = content[path]
+            range_header = self.headers.get('Range')
+            if range_header is None or path == '/no-ranges.zip':
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            start, end = range_header.removeprefix('bytes=').split('-')
+            first, last = int(start), int(end) if end else len(data) - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(data)}')
+            self.send_header('Content-Length', str(last - first + 1))
+            self.end_headers()
+            try:
+                self.wfile.write(data[first : last + 1])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}', content, requests
+    server.shutdown()
+    server.server_close()
@@ -1,10 +1,12 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from re import match
 
 import pytest
 from hyp3lib import GranuleError
 
-from hyp3_gamma.insar import ifm_sentinel
+from hyp3_gamma.insar import ifm_sentinel, par_s1_slc_single, slc_copy_s1_full_sw
 
 
 def test_get_copol():
@@ -83,3 +85,147 @@ def test_get_product_name():
     }
     name = ifm_sentinel.get_product_name(**payload)
     assert match(r'S1AB_20150101T230038_20200924T005722_VVO2092_INT40_G_ueF_[0-9A-F]{4}$', name)
+
+
+def _make_safe(directory, granule, first_burst_time):
+    safe_dir = directory / granule
+    start = granule[17:32].lower()
+    for swath in range(1, 4):
+        name = f's1a-iw{swath}-slc-vv-{start}-{start}-031091-03929b-00{swath}'
+        for subdir, prefix in (
+            ('measurement', ''),
+            ('annotation', ''),
+            ('annotation/calibration', 'calibration-'),
+            ('annotation/calibration', 'noise-'),
+        ):
+            (safe_dir / subdir).mkdir(parents=True, exist_ok=True)
+            (safe_dir / subdir / f'{prefix}{name}.xml').touch()
+        bursts = ''.join(
+            f'<burst><azimuthAnxTime>{first_burst_time + 2.75 * burst}</azimuthAnxTime></burst>' for burst in range(9)
+        )
+        (safe_dir / 'annotation' / f'{name}.xml').write_text(
+            f'<product><adsHeader><productFirstLineUtcTime>{granule[17:21]}-{granule[21:23]}-{granule[23:25]}T17:21:'
+            f'03.5</productFirstLineUtcTime></adsHeader><burstList count="9">{bursts}</burstList></product>'
+        )
+
+
+def _fake_gamma(cmd, uselogging=False, cwd=None):
+    tokens = cmd.split()
+    cwd = cwd or '.'
+    if tokens[0] == 'par_S1_SLC':
+        with open(tokens[5], 'w') as f:
+            f.write('range_samples:   21000\n')
+        for file in tokens[6:8]:
+            open(file, 'w').close()
+    elif tokens[0] == 'SLC_mosaic_S1_TOPS':
+        with open(os.path.join(cwd, tokens[3]), 'w') as f:
+            f.write('range_samples:   60000\n')
+    elif tokens[0] == 'multi_S1_TOPS':
+        with open(os.path.join(cwd, tokens[3]), 'w') as f:
+            f.write(
+                'range_samples:   3000\nazimuth_lines:   2500\nheading:   -13.5   degrees\n'
+                'earth_radius_below_sensor:   6370000.0   m\nsar_to_earth_center:   7070000.0   m\n'
+                'near_range_slc:   800000.0   m\ncenter_range_slc:   850000.0   m\nfar_range_slc:   900000.0   m\n'
+            )
+    elif tokens[0] == 'GC_map_mod':
+        with open(os.path.join(cwd, 'demseg.par'), 'w') as f:
+            f.write('width:   1000\n')
+    return ''
+
+
+def _run_pipeline(pair_dir, reference, secondary):
+    reference_date, secondary_date = reference[17:25], secondary[17:25]
+    for granule in (reference, secondary):
+        par_s1_slc_single.par_s1_slc_single(
+            str(pair_dir / granule), 'vv', orbit_file=str(pair_dir / 'orbit.EOF'), work_dir=str(pair_dir)
+        )
+
+    burst_tab1, burst_tab2 = ifm_sentinel.get_burst_overlaps(
+        str(pair_dir / reference), str(pair_dir / secondary), work_dir=str(pair_dir)
+    )
+    os.replace(pair_dir / burst_tab1, pair_dir / reference_date / burst_tab1)
+    os.replace(pair_dir / burst_tab2, pair_dir / secondary_date / burst_tab2)
+
+    slc_copy_s1_full_sw.slc_copy_s1_full_sw(
+        str(pair_dir),
+        reference_date,
+        'SLC_TAB',
+        burst_tab1,
+        mode=1,
+        dem='big',
+        dempath=str(pair_dir),
+        slc_dir=str(pair_dir / reference_date),
+    )
+    slc_copy_s1_full_sw.slc_copy_s1_full_sw(
+        str(pair_dir), secondary_date, 'SLC_TAB', burst_tab2, mode=2, slc_dir=str(pair_dir / secondary_date)
+    )
+
+    (pair_dir / 'baseline.log').write_text('estimated baseline perpendicular component (m):   42.0 \n')
+    ifm_sentinel.make_parameter_file(
+        f'{reference[17:32]}_{secondary[17:32]}',
+        'parameters.txt',
+        4,
+        20,
+        'GLO-30',
+        {'row_s': 1, 'col_s': 2, 'y': 3, 'x': 4, 'lat': 5, 'lon': 6},
+        {'refoffset': 0.0},
+        0.6,
+        work_dir=str(pair_dir),
+    )
+    return (pair_dir / 'parameters.txt').read_text()
+
+
+def test_concurrent_pipelines(tmp_path, monkeypatch):
+    monkeypatch.setattr(par_s1_slc_single, 'execute', _fake_gamma)
+    monkeypatch.setattr(slc_copy_s1_full_sw, 'execute', _fake_gamma)
+
+    pairs = [
+        (
+            'S1A_IW_SLC__1SDV_20200203T172103_20200203T172122_031091_03929B_3048.SAFE',
+            'S1A_IW_SLC__1SDV_20200215T172103_20200215T172122_031266_039898_1A2B.SAFE',
+            0.0,
+        ),
+        (
+            'S1A_IW_SLC__1SDV_20210101T010203_20210101T010230_035950_0436C1_AAAA.SAFE',
+            'S1A_IW_SLC__1SDV_20210113T010203_20210113T010230_036125_043CE0_BBBB.SAFE',
+            2.75,
+        ),
+    ]
+    pair_dirs = []
+    for index, (reference, secondary, offset) in enumerate(pairs):
+        pair_dir = tmp_path / f'pair{index}'
+        _make_safe(pair_dir, reference, 0.0)
+        _make_safe(pair_dir, secondary, offset)
+        pair_dirs.append(pair_dir)
+
+    cwd = os.getcwd()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(_run_pipeline, pair_dir, reference, secondary)
+            for pair_dir, (reference, secondary, _) in zip(pair_dirs, pairs)
+        ]
+        parameters = [future.result() for future in futures]
+    assert os.getcwd() == cwd
+
+    for pair_dir, (reference, secondary, _), parameter_text in zip(pair_dirs, pairs, parameters):
+        assert f'Reference Granule: {reference[:-5]}\n' in parameter_text
+        assert f'Secondary Granule: {secondary[:-5]}\n' in parameter_text
+        assert 'Baseline: 42.0\n' in parameter_text
+        assert 'Heading: -13.5\n' in parameter_text
+        assert 'Spacecraft height: 700000.0\n' in parameter_text
+        assert 'UTC time: 62463.5\n' in parameter_text
+
+        reference_date, secondary_date = reference[17:25], secondary[17:25]
+        assert (pair_dir / 'SLC1_tab').read_text() == (pair_dir / reference_date / 'SLC_TAB').read_text()
+        assert (pair_dir / 'SLC2_tab').read_text() == (pair_dir / secondary_date / 'SLC_TAB').read_text()
+        assert not (pair_dir / 'TAB_swFULL').exists()
+        assert (
+            (pair_dir / reference_date / 'TAB_swFULL').read_text().startswith(f'{pair_dir}/{reference_date}_001.slc ')
+        )
+        assert (pair_dir / 'DEM').is_dir()
+
+    burst_tabs = [
+        (pair_dir / pair[0][17:25] / f'{pair[0][17:25]}_burst_tab').read_text()
+        for pair_dir, pair in zip(pair_dirs, pairs)
+    ]
+    assert burst_tabs == ['1 9\n1 9\n1 9\n', '2 9\n2 9\n2 9\n']
@@ -0,0 +1,63 @@
+import os
+import threading
+
+from hyp3_gamma.insar import par_s1_slc_single
+
+
+GRANULE = 'S1A_IW_SLC__1SDV_20200203T172103_20200203T172122_031091_03929B_3048.SAFE'
+
+
+def _make_safe(directory):
+    safe_dir = directory / GRANULE
+    for swath in range(1, 4):
+        for pol in ('vv', 'vh'):
+            name = f's1a-iw{swath}-slc-{pol}-20200203t172103-20200203t172122-031091-03929b-00{swath}'
+            for subdir, prefix, ext in (
+                ('measurement', '', 'tiff'),
+                ('annotation', '', 'xml'),
+                ('annotation/calibration', 'calibration-', 'xml'),
+                ('annotation/calibration', 'noise-', 'xml'),
+            ):
+                (safe_dir / subdir).mkdir(parents=True, exist_ok=True)
+                (safe_dir / subdir / f'{prefix}{name}.{ext}').touch()
+    return safe_dir
+
+
+def test_par_s1_slc_single(tmp_path, monkeypatch):
+    safe_dir = _make_safe(tmp_path)
+    work_dir = tmp_path / 'work'
+    work_dir.mkdir()
+    cwd = os.getcwd()
+    commands = []
+    threads = set()
+
+    def fake_execute(cmd, uselogging=False, cwd=None):
+        commands.append((cmd, cwd))
+        threads.add(threading.get_ident())
+        if cmd.startswith('par_S1_SLC'):
+            slc_par, slc, tops_par = cmd.split()[-3:]
+            with open(slc_par, 'w') as f:
+                f.write('range_samples:    21000\n')
+            for file in (slc, tops_par):
+                open(file, 'w').close()
+
+    monkeypatch.setattr(par_s1_slc_single, 'execute', fake_execute)
+    par_s1_slc_single.par_s1_slc_single(str(safe_dir), 'VV', orbit_file='orbit.EOF', work_dir=str(work_dir))
+
+    assert os.getcwd() == cwd
+    out_dir = work_dir / '20200203'
+    assert (out_dir / 'SLC_TAB').read_text() == ''.join(
+        f'20200203_00{swath}.slc 20200203_00{swath}.slc.par 20200203_00{swath}.tops_par\n' for swath in range(1, 4)
+    )
+
+    ingest = sorted(cmd for cmd, _ in commands if cmd.startswith('par_S1_SLC'))
+    assert len(ingest) == 3
+    for swath, cmd in enumerate(ingest, start=1):
+        assert f'{safe_dir}/measurement/s1a-iw{swath}-slc-vv-' in cmd
+        assert cmd.endswith(f'{out_dir}/20200203_00{swath}.tops_par')
+
+    orbit_file = os.path.abspath('orbit.EOF')
+    assert sorted((cmd, cwd) for cmd, cwd in commands if cmd.startswith('S1_OPOD_vec')) == [
+        (f'S1_OPOD_vec 20200203_00{swath}.slc.par {orbit_file}', str(out_dir)) for swath in range(1, 4)
+    ]
+    assert commands[-1] == ('rasSLC 20200203_003.slc 21000 1 0 50 10', str(out_dir))
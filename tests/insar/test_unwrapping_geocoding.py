@@ -1,6 +1,10 @@
 import numpy as np
+import pytest
+import scipy.ndimage
+from PIL import Image
 
-from hyp3_gamma.insar.unwrapping_geocoding import get_reference_pixel
+from hyp3_gamma.insar import unwrapping_geocoding
+from hyp3_gamma.insar.unwrapping_geocoding import apply_mask, get_height_at_pixel, get_reference_pixel
 
 
 def test_get_reference_pixel():
@@ -82,3 +86,141 @@ def test_get_reference_pixel():
     array[4][3] = 1.0
     assert get_reference_pixel(array, window_size=(3, 3)) == (6, 4)
     assert get_reference_pixel(array, window_size=(5, 5)) == (0, 0)
+
+
+def _generic_filter_reference_pixel(coherence, window_size=(5, 5), coherence_threshold=0.3):
+    def sum_valid_coherence_values(array):
+        if (array < coherence_threshold).any() or (array == np.float64(1.0)).any():
+            return 0.0
+        return array.sum()
+
+    pixel_weights = scipy.ndimage.generic_filter(
+        input=coherence,
+        function=sum_valid_coherence_values,
+        size=window_size,
+        mode='constant',
+        cval=0.0,
+    )
+    x, y = np.unravel_index(np.argmax(pixel_weights), pixel_weights.shape)
+    return int(x), int(y)
+
+
+@pytest.mark.parametrize('dtype', ['>f4', np.float32, np.float64])
+def test_get_reference_pixel_matches_generic_filter(dtype):
+    rng = np.random.default_rng(42)
+    for _ in range(50):
+        shape = tuple(rng.integers(1, 40, size=2))
+        array = np.round(rng.random(shape), 1)
+        array[rng.random(shape) < 0.05] = 1.0
+        array = array.astype(dtype)
+        window_size = tuple(int(size) for size in rng.integers(1, 7, size=2))
+        for coherence_threshold in (0.0, 0.2, 0.3):
+            assert get_reference_pixel(
+                array, window_size=window_size, coherence_threshold=coherence_threshold
+            ) == _generic_filter_reference_pixel(
+                array, window_size=window_size, coherence_threshold=coherence_threshold
+            )
+
+
+def test_apply_mask(tmp_path):
+    data = np.arange(1, 21, dtype='>f4').reshape(4, 5)
+    data_file = str(tmp_path / 'data.cc')
+    data.tofile(data_file)
+
+    mask = np.ones((4, 5), dtype=np.uint8)
+    mask[1, 2] = 0
+    mask[3, :] = 0
+    mask_file = str(tmp_path / 'mask.bmp')
+    Image.fromarray(mask).save(mask_file)
+
+    masked_file = apply_mask(data_file, 4, 5, mask_file, block_lines=3)
+    assert masked_file == f'{data_file}_masked'
+
+    expected = data.copy()
+    expected[mask == 0] = 0
+    assert np.array_equal(np.fromfile(masked_file, dtype='>f4').reshape(4, 5), expected)
+    assert np.array_equal(np.fromfile(data_file, dtype='>f4').reshape(4, 5), data)
+
+
+def test_get_height_at_pixel(tmp_path):
+    height = np.arange(20, dtype='>f4').reshape(4, 5)
+    height_file = str(tmp_path / 'HGT_SAR_10_2')
+    height.tofile(height_file)
+    assert get_height_at_pixel(height_file, 4, 5, 2, 3) == 13.0
+
+
+@pytest.fixture
+def stub_gamma(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'DEM').mkdir()
+    (tmp_path / 'DEM' / 'demseg.par').write_text('width:  10\nnlines:  8\n')
+    (tmp_path / 'DEM' / 'MAP2RDC').touch()
+    (tmp_path / 'ref_sec.off.it').write_text('interferogram_width:  5\ninterferogram_azimuth_lines:  4\n')
+    for scene in ('ref', 'sec'):
+        (tmp_path / f'{scene}.mli.par').write_text('range_samples:  5\nazimuth_lines:  4\n')
+    np.full((4, 5), 0.5, dtype='>f4').tofile(tmp_path / 'ref_sec.cc')
+    np.zeros((4, 5), dtype='>f4').tofile(tmp_path / 'DEM' / 'HGT_SAR_10_2')
+
+    commands = []
+
+    def execute(cmd, uselogging=False, cwd=None):
+        commands.append(cmd)
+        if cmd.startswith('mcf '):
+            return 'phase at reference point: 1.5 radians\nphase initialization flag: 1 - - 0.0 radians\n'
+        return ''
+
+    monkeypatch.setattr(unwrapping_geocoding, 'execute', execute)
+    monkeypatch.setattr(unwrapping_geocoding, 'get_water_mask', lambda *args, **kwargs: None)
+    monkeypatch.setattr(unwrapping_geocoding, 'get_coords', lambda *args, **kwargs: {})
+    return commands
+
+
+def test_unwrapping_geocoding_skips_unrequested_layers(stub_gamma):
+    unwrapping_geocoding.unwrapping_geocoding(
+        'ref',
+        'sec',
+        include_displacement_maps=False,
+        include_look_vectors=False,
+        include_wrapped_phase=False,
+        include_inc_map=False,
+        include_dem=False,
+    )
+    programs = [cmd.split()[0] for cmd in stub_gamma]
+    outputs = [cmd.split()[4] for cmd in stub_gamma if cmd.startswith('data2geotiff ')]
+
+    for program in ('dispmap', 'look_vector', 'gc_map2', 'cpx_to_real'):
+        assert program not in programs
+    assert sorted(outputs) == [
+        'ref.mli.geo.tif',
+        'ref_sec.adf.cc.geo.tif',
+        'ref_sec.adf.unw.geo.bmp.tif',
+        'ref_sec.adf.unw.geo.tif',
+        'ref_sec.cc.geo.tif',
+        'ref_sec.diff0.man.adf.bmp.geo.tif',
+        'ref_sec.sim_unw.geo.tif',
+        'sec.mli.geo.tif',
+    ]
+
+
+def test_unwrapping_geocoding_all_layers(stub_gamma):
+    unwrapping_geocoding.unwrapping_geocoding('ref', 'sec')
+    programs = [cmd.split()[0] for cmd in stub_gamma]
+    outputs = [cmd.split()[4] for cmd in stub_gamma if cmd.startswith('data2geotiff ')]
+
+    assert programs.count('dispmap') == 2
+    assert programs.count('geocode_back') == 11
+    assert programs.count('data2geotiff') == 16
+    for output in (
+        'ref_sec.diff0.man.adf.geo.tif',
+        'ref_sec.dem.tif',
+        'ref_sec.vert.disp.geo.org.tif',
+        'ref_sec.los.disp.geo.org.tif',
+        'ref_sec.inc.tif',
+        'ref_sec.inc_ell.tif',
+        'ref_sec.lv_theta.tif',
+        'ref_sec.lv_phi.tif',
+    ):
+        assert output in outputs
+    assert programs.index('cpx_to_real') > stub_gamma.index(
+        'geocode_back ref_sec.diff0.man.adf 5 ./DEM/MAP2RDC ref_sec.diff0.man.adf.geo 10 8 0 1'
+    )
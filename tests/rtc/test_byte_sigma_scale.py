@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from osgeo import gdal
+
+from hyp3_gamma.rtc import gdal_file
+from hyp3_gamma.rtc.byte_sigma_scale import byte_sigma_scale, get_sigma_cutoffs
+
+
+def _nanpercentile_cutoffs(data):
+    data = data.astype(float)
+    data[data == 0] = np.nan
+    top = np.nanpercentile(data, 99)
+    data[data > top] = top
+    stddev = np.nanstd(data)
+    mean = np.nanmean(data)
+    return mean - 2 * stddev, mean + 2 * stddev
+
+
+@pytest.fixture()
+def amplitude_tif(write_geotiff):
+    data = np.random.default_rng(0).lognormal(-2, 1, (1000, 700)).astype(np.float32)
+    data[:50] = 0
+    data[60, :10] = np.nan
+    return write_geotiff('amp.tif', data), data
+
+
+def test_get_sigma_cutoffs(amplitude_tif):
+    filename, data = amplitude_tif
+    assert get_sigma_cutoffs(filename) == pytest.approx(_nanpercentile_cutoffs(data), rel=0.01)
+
+
+def test_byte_sigma_scale(amplitude_tif, tmp_path):
+    filename, data = amplitude_tif
+    outfile = str(tmp_path / 'byte.tif')
+    byte_sigma_scale(filename, outfile)
+
+    ds = gdal.Open(outfile)
+    assert ds.GetRasterBand(1).DataType == gdal.GDT_Byte
+    assert ds.GetRasterBand(1).GetNoDataValue() == 0
+    assert ds.GetGeoTransform() == (440720.0, 60.0, 0.0, 3751320.0, 0.0, -60.0)
+
+    scaled = ds.ReadAsArray()
+    nodata = (data == 0) | np.isnan(data)
+    assert (scaled[nodata] == 0).all()
+    assert (scaled[~nodata] >= 1).all()
+
+    lo, hi = get_sigma_cutoffs(filename)
+    expected = np.clip(np.floor((data[~nodata] - lo) * 254 / (hi - lo) + 1.5), 1, 255)
+    assert np.abs(scaled[~nodata].astype(int) - expected).max() <= 1
+
+
+def test_read_windows(amplitude_tif):
+    filename, data = amplitude_tif
+    file_handle = gdal.Open(filename)
+    windows = list(gdal_file.read_windows(file_handle, max_pixels=256 * 700))
+    assert [yoff for yoff, _ in windows] == [0, 256, 512, 768]
+    np.testing.assert_array_equal(np.concatenate([window for _, window in windows]), data)
+
+
+def test_transform(amplitude_tif, tmp_path):
+    filename, data = amplitude_tif
+    outfile = str(tmp_path / 'doubled.tif')
+
+    def double(window):
+        assert window.dtype == np.float32
+        assert window.shape[0] <= 256
+        window *= 2
+        return window
+
+    gdal_file.transform(filename, outfile, double, nodata=-1, max_pixels=256 * 700)
+    ds = gdal.Open(outfile)
+    assert ds.GetRasterBand(1).GetNoDataValue() == -1
+    np.testing.assert_array_equal(ds.ReadAsArray(), data * 2)
@@ -0,0 +1,19 @@
+import numpy as np
+from osgeo import gdal
+
+from hyp3_gamma.rtc.create_amp import create_amp
+
+
+def test_create_amp(write_geotiff):
+    power = np.random.default_rng(0).random((600, 300), dtype=np.float32)
+    power[:10] = 0
+    power_tif = write_geotiff('VV-power.tif', power, nodata=0)
+
+    amp_tif = create_amp(power_tif, nodata=0)
+    assert amp_tif.endswith('VV-power_amp.tif')
+
+    ds = gdal.Open(amp_tif)
+    assert ds.GetRasterBand(1).DataType == gdal.GDT_Float32
+    assert ds.GetRasterBand(1).GetNoDataValue() == 0
+    assert ds.GetGeoTransform() == (440720.0, 60.0, 0.0, 3751320.0, 0.0, -60.0)
+    np.testing.assert_allclose(ds.ReadAsArray(), np.sqrt(power), rtol=1e-6)
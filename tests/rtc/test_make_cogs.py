@@ -1,9 +1,12 @@
 import os
 import shutil
 
+import pytest
+from osgeo import gdal
 from osgeo_utils.samples.validate_cloud_optimized_geotiff import validate
 
-from hyp3_gamma.rtc.make_cogs import cogify_dir, cogify_file
+from hyp3_gamma.rtc.make_cogs import cogify_dir, cogify_file, get_thread_budget, write_cog
+from hyp3_gamma.util import GDALConfigManager
 
 
 def _is_cog(filename):
@@ -25,9 +28,48 @@ def test_cogify_dir(geotiff):
         shutil.copy(geotiff, name)
 
     # Only cogify our copied files
-    cogify_dir(base_dir, file_pattern='?.tif')
+    timings = cogify_dir(base_dir, file_pattern='?.tif')
+    assert sorted(timings) == copy_names
+    assert all(seconds > 0 for seconds in timings.values())
 
     for name in copy_names:
         assert _is_cog(name)
 
     assert not _is_cog(geotiff)
+
+
+def test_cogify_file_failure(tmp_path):
+    not_a_tif = tmp_path / 'not_a.tif'
+    not_a_tif.write_text('foo')
+    with pytest.raises(RuntimeError):
+        cogify_file(str(not_a_tif))
+    assert not_a_tif.read_text() == 'foo'
+    assert os.listdir(tmp_path) == ['not_a.tif']
+
+
+def test_write_cog(geotiff, tmp_path):
+    cog = str(tmp_path / 'cog.tif')
+    write_cog(geotiff, cog, area_or_point='Point', outputType=gdal.GDT_Int16)
+    assert _is_cog(cog)
+
+    ds = gdal.Open(cog)
+    assert ds.GetMetadataItem('AREA_OR_POINT') == 'Point'
+    assert ds.GetRasterBand(1).DataType == gdal.GDT_Int16
+    assert ds.GetGeoTransform() == gdal.Open(geotiff).GetGeoTransform()
+    assert not _is_cog(geotiff)
+    assert [f for f in os.listdir(tmp_path) if f not in ('cog.tif', 'test_geotiff.tif')] == []
+
+
+def test_cogify_dir_one_worker(geotiff):
+    base_dir = os.path.dirname(geotiff)
+    assert cogify_dir(base_dir, max_workers=1) == {geotiff: pytest.approx(0, abs=60)}
+    assert _is_cog(geotiff)
+    assert cogify_dir(base_dir, file_pattern='missing*.tif') == {}
+
+
+def test_get_thread_budget():
+    assert get_thread_budget() == os.cpu_count()
+    with GDALConfigManager(GDAL_NUM_THREADS='3'):
+        assert get_thread_budget() == 3
+    with GDALConfigManager(GDAL_NUM_THREADS='ALL_CPUS'):
+        assert get_thread_budget() == os.cpu_count()
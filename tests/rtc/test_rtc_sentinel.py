@@ -1,10 +1,13 @@
 from os import chdir
 from re import match
 
+import numpy as np
 import pytest
 from hyp3lib import GranuleError
+from osgeo import gdal
 
 from hyp3_gamma.rtc import rtc_sentinel
+from hyp3_gamma.task_runner import TaskRunner
 
 
 def test_get_product_name():
@@ -122,3 +125,52 @@ def test_append_additional_log_files(tmp_path):
         '==============================================\n',
         'bar\n',
     ]
+
+
+def test_create_decibel_tif(write_geotiff):
+    power = np.random.default_rng(0).random((600, 300), dtype=np.float32)
+    power[:10] = 0
+    power[20, :5] = -1
+    power_tif = write_geotiff('VV-power.tif', power, nodata=0)
+
+    decibel_tif = rtc_sentinel.create_decibel_tif(power_tif)
+    assert decibel_tif.endswith('VV-power-db.tif')
+
+    nodata = np.finfo(np.float32).min
+    ds = gdal.Open(decibel_tif)
+    assert ds.GetRasterBand(1).GetNoDataValue() == nodata
+    decibels = ds.ReadAsArray()
+
+    invalid = power <= 0
+    assert (decibels[invalid] == nodata).all()
+    np.testing.assert_allclose(decibels[~invalid], 10 * np.log10(power[~invalid]), rtol=1e-5)
+
+
+def test_geocode_image(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ('corrected.lt_fine', 'corrected.pix'):
+        (tmp_path / name).write_text(name)
+
+    def fake_execute(cmd, uselogging=False, cwd=None, env=None):
+        args = cmd.split()
+        mli_image = args[1]
+        assert env == {'OMP_NUM_THREADS': 3}
+        # the lookup table is shared by the polarizations, and the other files are copied
+        assert (tmp_path / cwd / 'corrected.lt_fine').samefile(tmp_path / 'corrected.lt_fine')
+        assert (tmp_path / cwd / 'corrected.pix').read_text() == 'corrected.pix'
+        assert not (tmp_path / cwd / 'corrected.pix').samefile(tmp_path / 'corrected.pix')
+        (tmp_path / cwd / 'mk_geo_radcal_3.log').write_text(mli_image)
+        (tmp_path / cwd / 'corrected_cal_map.mli.tif').write_text(mli_image)
+
+    monkeypatch.setattr(rtc_sentinel, 'execute', fake_execute)
+    runner = TaskRunner(max_workers=2)
+    for pol in ('vv', 'vh'):
+        runner.add(
+            pol, rtc_sentinel.geocode_image, pol, f'{pol}.mli', f'{pol}.mli.par', 'dem', 'dem.par', 30, 'gamma0', 3
+        )
+    assert runner.run() == {'vv': 'vv-power.tif', 'vh': 'vh-power.tif'}
+
+    for pol in ('vv', 'vh'):
+        assert (tmp_path / f'{pol}-power.tif').read_text() == str(tmp_path / f'{pol}.mli')
+        assert (tmp_path / f'mk_geo_radcal_3_{pol}.log').read_text() == str(tmp_path / f'{pol}.mli')
+    assert (tmp_path / 'corrected.pix').read_text() == 'corrected.pix'
@@ -0,0 +1,172 @@
+import io
+import os
+import shutil
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import boto3
+import pytest
+from boto3.exceptions import S3UploadFailedError
+from moto import mock_aws
+
+from hyp3_gamma import aws
+
+
+@pytest.fixture()
+def s3_bucket(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        s3_client = boto3.client('s3')
+        s3_client.create_bucket(Bucket='myBucket')
+        yield s3_client
+
+
+def _make_product(product_dir: Path):
+    product_dir.mkdir()
+    files = {
+        'product.zip': b'zip' * 1000,
+        'product_VV.tif': b'\x00' * (9 * 1024 * 1024),  # larger than the multipart threshold
+        'product.png': b'png',
+        'product_thumb.png': b'thumb',
+        'product_rgb.png': b'rgb',
+        'product.png.xml': b'<xml/>',
+        'product.README.md.txt': b'readme',
+    }
+    for name, data in files.items():
+        (product_dir / name).write_bytes(data)
+    return files
+
+
+def test_upload_files(s3_bucket, tmp_path):
+    files = _make_product(tmp_path / 'product')
+    paths = sorted((tmp_path / 'product').iterdir())
+
+    uploader = aws.S3Uploader(max_workers=3)
+    keys = uploader.upload_files(paths, 'myBucket', 'myPrefix')
+    assert keys == [f'myPrefix/{path.name}' for path in paths]
+
+    expected = {
+        'product.zip': ('application/zip', 'product'),
+        'product_VV.tif': ('image/tiff', 'product'),
+        'product.png': ('image/png', 'amp-browse'),
+        'product_thumb.png': ('image/png', 'amp-thumbnail'),
+        'product_rgb.png': ('image/png', 'rgb-browse'),
+        'product.png.xml': ('application/xml', 'product'),
+        'product.README.md.txt': ('text/plain', 'product'),
+    }
+    for name, (content_type, file_type) in expected.items():
+        s3_object = s3_bucket.get_object(Bucket='myBucket', Key=f'myPrefix/{name}')
+        assert s3_object['Body'].read() == files[name]
+        assert s3_object['ContentType'] == content_type
+        tags = s3_bucket.get_object_tagging(Bucket='myBucket', Key=f'myPrefix/{name}')
+        assert tags['TagSet'] == [{'Key': 'file_type', 'Value': file_type}]
+
+
+def test_upload_files_no_prefix(s3_bucket, tmp_path):
+    (tmp_path / 'foo.txt').write_text('foo')
+    assert aws.upload_files_to_s3([tmp_path / 'foo.txt'], 'myBucket') == ['foo.txt']
+    assert s3_bucket.get_object(Bucket='myBucket', Key='foo.txt')['Body'].read() == b'foo'
+
+
+def test_upload_file_retries(s3_bucket, tmp_path, monkeypatch):
+    (tmp_path / 'foo.txt').write_text('foo')
+    monkeypatch.setattr(aws.time, 'sleep', lambda _: None)
+    uploader = aws.S3Uploader(s3_client=s3_bucket, retries=3)
+
+    calls = []
+    upload_file = s3_bucket.upload_file
+
+    def flaky_upload_file(*args, **kwargs):
+        calls.append(args)
+        if len(calls) < 3:
+            raise S3UploadFailedError('connection reset')
+        return upload_file(*args, **kwargs)
+
+    monkeypatch.setattr(s3_bucket, 'upload_file', flaky_upload_file)
+    assert uploader.upload_file(tmp_path / 'foo.txt', 'myBucket', 'myPrefix') == 'myPrefix/foo.txt'
+    assert len(calls) == 3
+
+
+def test_upload_file_gives_up(s3_bucket, tmp_path, monkeypatch):
+    (tmp_path / 'foo.txt').write_text('foo')
+    monkeypatch.setattr(aws.time, 'sleep', lambda _: None)
+    uploader = aws.S3Uploader(s3_client=s3_bucket, retries=2)
+
+    calls = []
+
+    def failing_upload_file(*args, **kwargs):
+        calls.append(args)
+        raise S3UploadFailedError('connection reset')
+
+    monkeypatch.setattr(s3_bucket, 'upload_file', failing_upload_file)
+    with pytest.raises(S3UploadFailedError, match='connection reset'):
+        uploader.upload_files([tmp_path / 'foo.txt'], 'myBucket')
+    assert len(calls) == 2
+
+
+def test_s3_multipart_writer(s3_bucket):
+    data = os.urandom(12 * 1024 * 1024)
+    with aws.S3MultipartWriter(
+        s3_bucket, 'myBucket', 'foo.bin', {'ContentType': 'application/octet-stream'}, part_size=5 * 1024 * 1024
+    ) as writer:
+        for start in range(0, len(data), 1000000):
+            writer.write(data[start : start + 1000000])
+
+    s3_object = s3_bucket.get_object(Bucket='myBucket', Key='foo.bin')
+    assert s3_object['Body'].read() == data
+    assert s3_object['ContentType'] == 'application/octet-stream'
+    assert s3_bucket.head_object(Bucket='myBucket', Key='foo.bin', PartNumber=1)['PartsCount'] == 3
+
+    with aws.S3MultipartWriter(s3_bucket, 'myBucket', 'empty.bin'):
+        pass
+    assert s3_bucket.get_object(Bucket='myBucket', Key='empty.bin')['Body'].read() == b''
+
+
+def test_s3_multipart_writer_abort(s3_bucket):
+    with pytest.raises(ValueError, match='oops'):
+        with aws.S3MultipartWriter(s3_bucket, 'myBucket', 'foo.bin', part_size=5 * 1024 * 1024) as writer:
+            writer.write(os.urandom(6 * 1024 * 1024))
+            raise ValueError('oops')
+
+    assert 'Contents' not in s3_bucket.list_objects_v2(Bucket='myBucket')
+    assert 'Uploads' not in s3_bucket.list_multipart_uploads(Bucket='myBucket')
+
+
+def test_upload_product(s3_bucket, tmp_path, monkeypatch):
+    files = _make_product(tmp_path / 'product')
+    (tmp_path / 'product' / 'product.zip').unlink()
+    del files['product.zip']
+    zip_files = sorted((tmp_path / 'product').glob('*.tif'))
+
+    keys = aws.S3Uploader().upload_product(tmp_path / 'product', 'myBucket', 'myPrefix', zip_files=zip_files)
+    assert keys == ['myPrefix/product.zip', *(f'myPrefix/{name}' for name in sorted(files))]
+    assert sorted(os.listdir(tmp_path)) == ['product']
+
+    for name, data in files.items():
+        assert s3_bucket.get_object(Bucket='myBucket', Key=f'myPrefix/{name}')['Body'].read() == data
+
+    s3_object = s3_bucket.get_object(Bucket='myBucket', Key='myPrefix/product.zip')
+    assert s3_object['ContentType'] == 'application/zip'
+    tags = s3_bucket.get_object_tagging(Bucket='myBucket', Key='myPrefix/product.zip')
+    assert tags['TagSet'] == [{'Key': 'file_type', 'Value': 'product'}]
+    with ZipFile(io.BytesIO(s3_object['Body'].read())) as z:
+        assert z.namelist() == ['product/', 'product/product_VV.tif']
+        assert z.read('product/product_VV.tif') == files['product_VV.tif']
+
+
+def test_upload_product_zip_matches_make_archive(s3_bucket, tmp_path, monkeypatch):
+    _make_product(tmp_path / 'product')
+    monkeypatch.chdir(tmp_path)
+
+    key = aws.S3Uploader().upload_product_zip(Path('product'), 'myBucket')
+    assert key == 'product.zip'
+    streamed = ZipFile(io.BytesIO(s3_bucket.get_object(Bucket='myBucket', Key=key)['Body'].read()))
+
+    archived = ZipFile(shutil.make_archive(base_name='archive', format='zip', base_dir='product'))
+    assert sorted(streamed.namelist()) == sorted(archived.namelist())
+    for info in archived.infolist():
+        assert streamed.read(info.filename) == archived.read(info.filename)
+    assert streamed.getinfo('product/product.png').compress_type == ZIP_STORED
+    assert streamed.getinfo('product/product_VV.tif').compress_type == ZIP_DEFLATED
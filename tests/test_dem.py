@@ -81,6 +81,19 @@ def test_get_geometry_from_kml(test_data_dir):
     assert json.loads(geometry.ExportToJson()) == expected
 
 
+def test_get_footprint_from_kml(test_data_dir, tmp_path):
+    footprint = dem.get_footprint_from_kml(test_data_dir / 'antimeridian.kml')
+    assert footprint == {
+        'type': 'Polygon',
+        'coordinates': [[[181.0, 50.0], [176.0, 51.0], [177.0, 52.0], [181.0, 52.0], [181.0, 50.0]]],
+    }
+
+    kml = tmp_path / 'no-footprint.kml'
+    kml.write_text('<kml><Document><name>Sentinel-1 Map Overlay</name></Document></kml>')
+    with pytest.raises(ValueError, match='LatLonQuad'):
+        dem.get_footprint_from_kml(kml)
+
+
 def test_utm_from_lon_lat():
     assert dem.utm_from_lon_lat(0, 0) == 32631
     assert dem.utm_from_lon_lat(-179, -1) == 32701
@@ -91,6 +104,16 @@ def test_utm_from_lon_lat():
     assert dem.utm_from_lon_lat(-360, -1) == 32731
 
 
+def test_get_dem_bounds():
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((0.4 10.16, 0.4 10.86, 0.6 10.86, 0.6 10.16, 0.4 10.16))')
+    # the grid of the DEM mosaic in test_prepare_dem_geotiff
+    assert dem.get_dem_bounds(geometry, 60) == (32631, [189600.0, 1098960.0, 262980.0, 1226820.0])
+
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((179.5 51.4, 179.5 51.6, 180.5 51.6, 180.5 51.4, 179.5 51.4))')
+    # the grid of the DEM mosaic in test_prepare_dem_geotiff_antimeridian
+    assert dem.get_dem_bounds(geometry, 30) == (32601, [229410.0, 5661360.0, 352980.0, 5758770.0])
+
+
 def test_prepare_dem_geotiff_no_coverage():
     geojson = {
         'type': 'Point',
@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from osgeo import ogr
+
+from hyp3_gamma import dem_cache
+from hyp3_gamma.dem_cache import DemCache
+from hyp3_gamma.util import file_lock
+
+
+def _creator(directory, content, calls):
+    def create():
+        calls.append(content)
+        for name in ('dem.tif', 'dem.image', 'dem.par'):
+            (directory / name).write_text(f'{name} {content}')
+
+    return create
+
+
+def _files(directory):
+    return {name: directory / name for name in ('dem.tif', 'dem.image', 'dem.par')}
+
+
+def test_get_or_create(tmp_path):
+    cache = DemCache(tmp_path / 'cache')
+    calls: list = []
+
+    first = tmp_path / 'first'
+    first.mkdir()
+    assert not cache.get_or_create('abc', _files(first), _creator(first, 'first', calls))
+    assert (tmp_path / 'cache' / 'abc' / 'dem.par').read_text() == 'dem.par first'
+
+    second = tmp_path / 'second'
+    second.mkdir()
+    assert cache.get_or_create('abc', _files(second), _creator(second, 'second', calls))
+    assert calls == ['first']
+    assert (second / 'dem.image').read_text() == 'dem.image first'
+
+
+def test_get_or_create_failure(tmp_path):
+    cache = DemCache(tmp_path / 'cache')
+
+    def create():
+        raise RuntimeError('no DEM')
+
+    with pytest.raises(RuntimeError, match='no DEM'):
+        cache.get_or_create('abc', _files(tmp_path), create)
+    assert [path.name for path in (tmp_path / 'cache').iterdir() if path.is_dir()] == []
+
+
+def test_get_or_create_concurrently(tmp_path):
+    cache = DemCache(tmp_path / 'cache')
+    calls: list = []
+    directories = [tmp_path / str(i) for i in range(4)]
+    for directory in directories:
+        directory.mkdir()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        hits = list(
+            executor.map(
+                lambda directory: cache.get_or_create('abc', _files(directory), _creator(directory, 'dem', calls)),
+                directories,
+            )
+        )
+    assert calls == ['dem']
+    assert sorted(hits) == [False, True, True, True]
+
+
+def test_evict(tmp_path):
+    cache = DemCache(tmp_path / 'cache', max_bytes=100)
+    for i, key in enumerate(['old', 'used', 'new']):
+        entry = tmp_path / 'cache' / key
+        entry.mkdir()
+        (entry / 'dem.tif').write_bytes(bytes(40))
+        os.utime(entry, (i, i))
+
+    # reading an entry makes it the most recently used
+    cache.get_or_create('old', {'dem.tif': tmp_path / 'dem.tif'}, lambda: None)
+    assert cache.evict() == ['used']
+    assert sorted(path.name for path in (tmp_path / 'cache').iterdir() if path.is_dir()) == ['new', 'old']
+
+    with file_lock(tmp_path / 'cache' / '.new.lock'):
+        cache.max_bytes = 0
+        assert cache.evict() == ['old']
+    assert cache.evict() == ['new']
+
+
+def test_evict_vanished_entry(tmp_path):
+    cache = DemCache(tmp_path / 'cache', max_bytes=0)
+    entry = tmp_path / 'cache' / 'abc'
+    entry.mkdir()
+    (entry / 'dem.tif').write_bytes(bytes(40))
+    # a file that's gone by the time it's stat'ed, as when another job evicts the entry during the scan
+    (entry / 'dem.par').symlink_to(tmp_path / 'missing')
+
+    assert cache.evict() == []
+    assert entry.is_dir()
+
+
+def test_get_or_create_eviction_failure(tmp_path, monkeypatch):
+    cache = DemCache(tmp_path / 'cache')
+
+    def evict():
+        raise PermissionError('read-only cache')
+
+    monkeypatch.setattr(cache, 'evict', evict)
+    assert not cache.get_or_create('abc', _files(tmp_path), _creator(tmp_path, 'dem', []))
+    assert (tmp_path / 'cache' / 'abc' / 'dem.par').read_text() == 'dem.par dem'
+
+
+def test_from_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv('HYP3_DEM_CACHE', raising=False)
+    assert DemCache.from_environment() is None
+
+    monkeypatch.setenv('HYP3_DEM_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setenv('HYP3_DEM_CACHE_MAX_BYTES', '1000')
+    cache = DemCache.from_environment()
+    assert cache is not None
+    assert cache.directory == tmp_path / 'cache'
+    assert cache.max_bytes == 1000
+
+
+def test_get_or_create_dem_without_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv('HYP3_DEM_CACHE', raising=False)
+    calls: list = []
+    dem_cache.get_or_create_dem(None, 30, 'dem.tif', 'dem.image', 'dem.par', lambda: calls.append(True))
+    assert calls == [True]
+
+
+def test_get_key():
+    geometry = ogr.CreateGeometryFromWkt('POLYGON ((-154 71, -147 71, -146 70, -153 69, -154 71))')
+    key = DemCache.get_key(geometry, 30)
+    assert len(key) == 64
+    assert DemCache.get_key(geometry.Clone(), 30.0) == key
+    # the same frame on another date, whose footprint differs slightly but gives the same DEM grid
+    shifted = ogr.CreateGeometryFromWkt('POLYGON ((-154 71, -147.001 70.999, -146 70, -153.001 69.001, -154 71))')
+    assert DemCache.get_key(shifted, 30) == key
+    assert DemCache.get_key(geometry, 10) != key
+    assert DemCache.get_key(ogr.CreateGeometryFromWkt('POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))'), 30) != key
@@ -45,3 +45,8 @@ def test_interf_pwr_s1_lt_tops_proc(script_runner):
 def test_unwrapping_geocoding(script_runner):
     ret = script_runner.run(['unwrapping_geocoding.py', '-h'])
     assert ret.success
+
+
+def test_prefetch_tiles(script_runner):
+    ret = script_runner.run(['prefetch_tiles', '-h'])
+    assert ret.success
@@ -0,0 +1,41 @@
+import pytest
+from hyp3lib import ExecuteError
+
+from hyp3_gamma.execute import execute
+
+
+def test_execute(tmp_path):
+    assert execute('echo hello') == 'hello\n'
+
+    output = execute('pwd', cwd=tmp_path)
+    assert output.strip() == str(tmp_path)
+
+
+def test_execute_env(tmp_path):
+    assert execute('echo "$FOO $BAR"', env={'FOO': 'a b', 'BAR': 2}) == 'a b 2\n'
+    assert execute('echo "$FOO" && pwd', cwd=tmp_path, env={'FOO': 'foo'}) == f'foo\n{tmp_path}\n'
+
+    with pytest.raises(ExecuteError, match='exit: $'):
+        execute('exit 2', env={'FOO': 'foo'})
+
+
+def test_execute_expected(tmp_path):
+    execute('touch foo.txt', expected='foo.txt', cwd=tmp_path)
+    assert (tmp_path / 'foo.txt').exists()
+
+    with pytest.raises(ExecuteError, match='Expected output file not found'):
+        execute('true', expected='bar.txt', cwd=tmp_path)
+
+
+def test_execute_error(tmp_path):
+    with pytest.raises(ExecuteError, match='echo: ERROR: bad things'):
+        execute('echo "ERROR: bad things" && exit 1', cwd=tmp_path)
+
+    with pytest.raises(ExecuteError, match='exit: $'):
+        execute('exit 2', cwd=tmp_path)
+
+
+def test_execute_logfile(tmp_path):
+    with open(tmp_path / 'log.txt', 'w') as f:
+        execute('echo hello', logfile=f)
+    assert (tmp_path / 'log.txt').read_text() == 'hello\n'
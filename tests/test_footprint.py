@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from osgeo import gdal
+from pyproj import CRS, Transformer
+
+from hyp3_gamma import footprint
+
+
+class _Dataset:
+    """The parts of a GDAL dataset with a geotransform that `footprint` reads"""
+
+    def __init__(self, width, height, geotransform, projection):
+        self.RasterXSize = width
+        self.RasterYSize = height
+        self._geotransform = geotransform
+        self._projection = projection
+
+    def GetGeoTransform(self):
+        return self._geotransform
+
+    def GetProjection(self):
+        return self._projection
+
+    def GetGCPCount(self):
+        return 0
+
+
+UTM_15N = _Dataset(1000, 800, (200360.0, 80.0, 0.0, 1756920.0, 0.0, -80.0), CRS.from_epsg(32615).to_wkt())
+
+
+def test_get_edge_pixels():
+    x, y = footprint.get_edge_pixels(4, 2, densify_points=1)
+    assert list(zip(x, y)) == [(0, 0), (2, 0), (4, 0), (4, 1), (4, 2), (2, 2), (0, 2), (0, 1)]
+
+    x, y = footprint.get_edge_pixels(1000, 800)
+    assert x.size == y.size == 4 * 22
+
+
+def test_get_bounds_same_crs():
+    assert footprint.get_bounds(UTM_15N, 'EPSG:32615') == [200360.0, 1692920.0, 280360.0, 1756920.0]
+
+
+def test_get_bounds_lon_lat():
+    # straddles the zone's central meridian, so the top edge bulges north between the corners
+    dataset = _Dataset(1500, 800, (440000.0, 80.0, 0.0, 1756920.0, 0.0, -80.0), CRS.from_epsg(32615).to_wkt())
+    bounds = footprint.get_bounds(dataset)
+
+    # the exact bounds of the raster's edges, sampled every pixel
+    transformer = Transformer.from_crs('EPSG:32615', 'EPSG:4326', always_xy=True)
+    x, y = footprint.get_edge_pixels(1500, 800, densify_points=1499)
+    lon, lat = transformer.transform(440000.0 + 80.0 * x, 1756920.0 - 80.0 * y)
+    expected = [lon.min(), lat.min(), lon.max(), lat.max()]
+    assert bounds == pytest.approx(expected, abs=1e-6)
+
+    corners = footprint.get_bounds(dataset, densify_points=0)
+    assert corners[3] < expected[3] - 1e-4
+
+
+def test_get_bounds_gcps(tmp_path):
+    filename = str(tmp_path / 'gcps.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(filename, 100, 50, 1, gdal.GDT_Byte)
+    gcps = [
+        gdal.GCP(-95.8, 15.9, 0, 0, 0),
+        gdal.GCP(-95.7, 15.9, 0, 100, 0),
+        gdal.GCP(-95.8, 15.85, 0, 0, 50),
+        gdal.GCP(-95.7, 15.85, 0, 100, 50),
+    ]
+    ds.SetGCPs(gcps, 'EPSG:4326')
+    ds = None
+
+    np.testing.assert_allclose(footprint.get_bounds(filename), [-95.8, 15.85, -95.7, 15.9])
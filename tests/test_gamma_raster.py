@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from hyp3_gamma import gamma_raster
+
+
+def test_open_raster(tmp_path):
+    expected = np.arange(24, dtype='>f4').reshape(4, 6)
+    raster = str(tmp_path / 'raster')
+    expected.tofile(raster)
+
+    data = gamma_raster.open_raster(raster, 4, 6)
+    assert isinstance(data, np.memmap)
+    assert data.dtype == np.dtype('>f4')
+    assert np.array_equal(data, expected)
+    with pytest.raises(ValueError):
+        data[0, 0] = 1.0
+
+
+def test_open_raster_complex_and_byte(tmp_path):
+    expected = (np.arange(6) + 1j * np.arange(6)[::-1]).astype('>c8').reshape(2, 3)
+    raster = str(tmp_path / 'complex')
+    expected.tofile(raster)
+    assert np.array_equal(gamma_raster.open_raster(raster, 2, 3, dtype=gamma_raster.FCOMPLEX), expected)
+
+    expected = np.arange(6, dtype='u1').reshape(3, 2)
+    raster = str(tmp_path / 'byte')
+    expected.tofile(raster)
+    assert np.array_equal(gamma_raster.open_raster(raster, 3, 2, dtype=gamma_raster.BYTE), expected)
+
+
+def test_read_pixel_and_window(tmp_path):
+    expected = np.arange(24, dtype='>f4').reshape(4, 6)
+    raster = str(tmp_path / 'raster')
+    expected.tofile(raster)
+
+    assert gamma_raster.read_pixel(raster, 4, 6, 2, 3) == 15.0
+
+    window = gamma_raster.read_window(raster, 4, 6, slice(1, 3), slice(2, 5))
+    assert not isinstance(window, np.memmap)
+    assert window.dtype == np.dtype('f4')
+    assert window.dtype.isnative
+    assert np.array_equal(window, expected[1:3, 2:5])
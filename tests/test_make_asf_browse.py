@@ -1,7 +1,10 @@
+import io
 import logging
 import os
+from zipfile import ZipFile
 
 from PIL import Image
+from lxml import etree
 from osgeo import gdal
 
 from hyp3_gamma.make_asf_browse import make_asf_browse
@@ -33,3 +36,37 @@ def test_width_larger(geotiff, caplog):
         assert 'Using GeoTIFF width' in caplog.text
         with Image.open(f'{geotiff_base}.png') as png:
             assert png.size[0] == tiff_width
+
+
+def test_outputs(geotiff):
+    geotiff_base = geotiff.replace('.tif', '')
+    make_asf_browse(geotiff, geotiff_base, width=10, thumbnail_size=(100, 100))
+
+    with Image.open(f'{geotiff_base}_thumb.png') as thumbnail:
+        assert thumbnail.size == (10, 10)
+
+    with ZipFile(f'{geotiff_base}.kmz') as kmz:
+        assert sorted(kmz.namelist()) == ['test_geotiff.kml', 'test_geotiff.png']
+        kml = etree.fromstring(kmz.read('test_geotiff.kml'))
+        assert kml.findtext('.//{*}href') == 'test_geotiff.png'
+        with Image.open(io.BytesIO(kmz.read('test_geotiff.png'))) as png:
+            assert png.mode == 'LA'
+
+
+def test_no_thumbnail(geotiff):
+    geotiff_base = geotiff.replace('.tif', '')
+    make_asf_browse(geotiff, geotiff_base, width=10)
+
+    assert os.path.exists(f'{geotiff_base}.png')
+    assert not os.path.exists(f'{geotiff_base}_thumb.png')
+
+
+def test_overviews(geotiff):
+    tiff = gdal.Open(geotiff, gdal.GA_Update)
+    tiff.BuildOverviews('AVERAGE', [2, 4])
+    tiff = None  # How to close with gdal
+
+    geotiff_base = geotiff.replace('.tif', '')
+    assert make_asf_browse(geotiff, geotiff_base, width=5) == 5
+    with Image.open(f'{geotiff_base}.png') as png:
+        assert png.size == (5, 5)
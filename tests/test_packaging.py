@@ -0,0 +1,100 @@
+import io
+import os
+import shutil
+import zlib
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+
+from hyp3_gamma import packaging
+
+
+class _Unseekable(io.BytesIO):
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation('seek')
+
+
+def test_write_product_zip(tmp_path):
+    product_dir = tmp_path / 'product'
+    product_dir.mkdir()
+    for name in ('b.txt', 'a.tif', 'c.png'):
+        (product_dir / name).write_text(name * 100)
+
+    stream = _Unseekable()
+    packaging.write_product_zip(stream, product_dir)
+    with ZipFile(io.BytesIO(stream.getvalue())) as z:
+        assert z.namelist() == ['product/', 'product/a.tif', 'product/b.txt', 'product/c.png']
+        assert z.read('product/b.txt') == b'b.txt' * 100
+        assert z.testzip() is None
+
+    stream = _Unseekable()
+    packaging.write_product_zip(stream, product_dir, files=[product_dir / 'c.png'])
+    with ZipFile(io.BytesIO(stream.getvalue())) as z:
+        assert z.namelist() == ['product/', 'product/c.png']
+
+
+def _make_product(product_dir):
+    product_dir.mkdir()
+    (product_dir / 'product_VV.tif').write_bytes(zlib.compress(os.urandom(300_000)))
+    (product_dir / 'product_dem.tif').write_bytes(bytes(300_000))
+    (product_dir / 'product.png').write_bytes(b'png' * 100)
+    (product_dir / 'product.README.md.txt').write_text('readme ' * 100)
+
+
+def test_is_compressed(tmp_path):
+    _make_product(tmp_path / 'product')
+    assert packaging.is_compressed(tmp_path / 'product' / 'product_VV.tif')
+    assert not packaging.is_compressed(tmp_path / 'product' / 'product_dem.tif')
+    assert packaging.is_compressed(tmp_path / 'product' / 'product.png')
+    assert not packaging.is_compressed(tmp_path / 'product' / 'product.README.md.txt')
+
+    small = tmp_path / 'small.tif'
+    small.write_bytes(os.urandom(1000))
+    assert not packaging.is_compressed(small)
+
+
+def test_get_compress_type(tmp_path):
+    _make_product(tmp_path / 'product')
+    tif = tmp_path / 'product' / 'product_VV.tif'
+    assert packaging.get_compress_type(tif) == ZIP_STORED
+    assert packaging.get_compress_type(tif, 'deflate') == ZIP_DEFLATED
+    assert packaging.get_compress_type(tmp_path / 'product' / 'product_dem.tif', 'store') == ZIP_STORED
+    with pytest.raises(ValueError, match='Invalid compression foo'):
+        packaging.get_compress_type(tif, 'foo')
+
+
+def test_make_product_zip(tmp_path, monkeypatch):
+    _make_product(tmp_path / 'product')
+    monkeypatch.chdir(tmp_path)
+
+    assert packaging.make_product_zip(Path('product')) == 'product.zip'
+    archived = ZipFile(shutil.make_archive(base_name='archive', format='zip', base_dir='product'))
+    with ZipFile('product.zip') as z:
+        assert sorted(z.namelist()) == sorted(archived.namelist())
+        for info in archived.infolist():
+            assert z.read(info.filename) == archived.read(info.filename)
+        assert {info.filename: info.compress_type for info in z.infolist() if not info.is_dir()} == {
+            'product/product.README.md.txt': ZIP_DEFLATED,
+            'product/product.png': ZIP_STORED,
+            'product/product_VV.tif': ZIP_STORED,
+            'product/product_dem.tif': ZIP_DEFLATED,
+        }
+
+    packaging.make_product_zip(Path('product'), compression='deflate')
+    with ZipFile('product.zip') as z:
+        for info in archived.infolist():
+            assert z.getinfo(info.filename).compress_type == info.compress_type
+
+
+def test_make_product_zip_files(tmp_path):
+    _make_product(tmp_path / 'product')
+    (tmp_path / 'product' / 'product_thumb.png').write_bytes(b'thumb')
+
+    zip_file = packaging.make_product_zip(tmp_path / 'product', files=[tmp_path / 'product' / 'product.png'])
+    assert zip_file == str(tmp_path / 'product.zip')
+    with ZipFile(zip_file) as z:
+        assert z.namelist() == ['product/', 'product/product.png']
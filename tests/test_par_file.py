@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from hyp3_gamma.get_parameter import get_parameter
+from hyp3_gamma.par_file import ParFile, parse_value
+
+
+MLI_PAR = """Gamma Interferometric SAR Processor (ISP) - Image Parameter File
+
+title:     S1A-IW-IW1-VV-20170525T025145
+sensor:    S1A IW IW1 VV
+date:      2017 05 25 02 51 45.1234
+range_samples:                 6829
+azimuth_lines:                 1495
+image_format:               FLOAT
+heading:                    -12.3456   degrees
+earth_radius_below_sensor:   6.3641e+06   m
+state_vector_position_1:  -2061744.1203   5279836.0425   4049151.0371   m   m   m
+"""
+
+OFF_PAR = """Gamma Interferometric SAR Processor (ISP) - Offset Parameters
+
+interferogram_width:             2341
+interferogram_azimuth_lines:     1472
+offset_estimation_range_samples:   64
+"""
+
+
+@pytest.fixture
+def mli_par(tmp_path):
+    path = tmp_path / 'reference.mli.par'
+    path.write_text(MLI_PAR)
+    return str(path)
+
+
+def test_parse_value():
+    assert parse_value('6829') == (6829, None)
+    assert parse_value('  -12.3456   degrees') == (-12.3456, 'degrees')
+    assert parse_value('6.3641e+06   m') == (6364100.0, 'm')
+    assert parse_value('FLOAT') == ('FLOAT', None)
+    assert parse_value('S1A IW IW1 VV') == ('S1A IW IW1 VV', None)
+    assert parse_value('1.0 2 -3.5e-1   m m m') == ((1.0, 2, -0.35), 'm m m')
+    assert parse_value('2017 05 25') == ((2017, 5, 25), None)
+    assert parse_value('') == ('', None)
+
+
+def test_par_file(mli_par):
+    par = ParFile.read(mli_par)
+    assert par['range_samples'] == 6829
+    assert par['azimuth_lines'] == 1495
+    assert par['image_format'] == 'FLOAT'
+    assert par['heading'] == -12.3456
+    assert par.units('heading') == 'degrees'
+    assert par.units('range_samples') is None
+    assert par['state_vector_position_1'] == (-2061744.1203, 5279836.0425, 4049151.0371)
+    assert par.units('state_vector_position_1') == 'm m m'
+    assert par['date'] == (2017, 5, 25, 2, 51, 45.1234)
+    assert par.text('heading') == '-12.3456   degrees'
+
+    assert 'RANGE_SAMPLES' in par
+    assert par['RANGE_SAMPLES'] == 6829
+    assert 'width' not in par
+    assert par.get('width') is None
+    assert par.get('width', 0) == 0
+    assert len(par) == 9
+    assert 'title' in list(par)
+
+    with pytest.raises(KeyError, match='Unable to find parameter width'):
+        par['width']
+
+
+def test_par_file_is_cached(mli_par):
+    par = ParFile.read(mli_par)
+    assert ParFile.read(mli_par) is par
+
+    with open(mli_par, 'a') as f:
+        f.write('range_samples:   100\n')
+    stat = os.stat(mli_par)
+    os.utime(mli_par, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    updated = ParFile.read(mli_par)
+    assert updated is not par
+    assert updated['range_samples'] == 100
+
+
+def test_get_parameter(mli_par, tmp_path):
+    assert get_parameter(mli_par, 'range_samples') == '6829'
+    assert get_parameter(mli_par, 'heading') == '-12.3456   degrees'
+    assert get_parameter(mli_par, 'IMAGE_FORMAT') == 'FLOAT'
+
+    with pytest.raises(Exception, match='Unable to find parameter width'):
+        get_parameter(mli_par, 'width')
+
+    with pytest.raises(Exception, match='Unable to find file'):
+        get_parameter(str(tmp_path / 'missing.par'), 'width')
+
+
+def test_get_parameter_matches_whole_keys(tmp_path):
+    off_par = tmp_path / 'ifg.off'
+    off_par.write_text(OFF_PAR)
+
+    assert get_parameter(str(off_par), 'interferogram_width') == '2341'
+    with pytest.raises(Exception, match='Unable to find parameter width'):
+        get_parameter(str(off_par), 'width')
+    with pytest.raises(Exception, match='Unable to find parameter range_samples'):
+        get_parameter(str(off_par), 'range_samples')
@@ -0,0 +1,122 @@
+import os
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+import requests
+
+from hyp3_gamma.remote_zip import HttpRangeReader, RangeRequestsNotSupportedError, extract_remote_zip, select_members
+
+
+SAFE = 'S1A_IW_SLC__1SDV_20200203T172103_20200203T172122_031091_03929B_3048.SAFE'
+
+
+def make_safe_zip(zip_file):
+    members = {
+        f'{SAFE}/manifest.safe': b'<manifest/>',
+        f'{SAFE}/annotation/s1a-iw1-slc-vv-001.xml': b'<product/>' * 1000,
+        f'{SAFE}/measurement/s1a-iw1-slc-vv-001.tiff': os.urandom(300_000),
+        f'{SAFE}/measurement/s1a-iw1-slc-vh-001.tiff': os.urandom(300_000),
+        f'{SAFE}/preview/quick-look.png': os.urandom(50_000),
+        f'{SAFE}/support/s1-object-types.xsd': b'<schema/>' * 1000,
+    }
+    with ZipFile(zip_file, 'w') as z:
+        for name, data in members.items():
+            z.writestr(name, data, compress_type=ZIP_STORED if name.endswith('.tiff') else ZIP_DEFLATED)
+    return members
+
+
+def test_http_range_reader(http_server):
+    url, content, _ = http_server
+    content['/granule.zip'] = bytes(range(256)) * 100
+
+    with HttpRangeReader(f'{url}/granule.zip') as f:
+        assert f.size == 25600
+        assert f.read(4) == bytes([0, 1, 2, 3])
+        f.seek(-2, os.SEEK_END)
+        assert f.read() == bytes([254, 255])
+        f.seek(256)
+        assert f.tell() == 256
+        assert f.read(3) == bytes([0, 1, 2])
+        assert f.read(2) == bytes([3, 4])
+        f.seek(25600)
+        assert f.read(10) == b''
+
+
+def test_http_range_reader_expired_redirect(http_server):
+    url, content, _ = http_server
+    content['/granule.zip'] = bytes(range(256)) * 100
+
+    with HttpRangeReader(f'{url}/signed.zip') as f:
+        assert f.url == f'{url}/signed.zip'
+        assert f.read(4) == bytes([0, 1, 2, 3])
+
+        # another client following the redirect expires the redirect target this reader was given
+        assert requests.get(f'{url}/signed.zip').ok
+        f.seek(256)
+        assert f.read(3) == bytes([0, 1, 2])
+
+
+def test_http_range_reader_not_supported(http_server):
+    url, content, _ = http_server
+    content['/no-ranges.zip'] = b'foo'
+    with pytest.raises(RangeRequestsNotSupportedError):
+        HttpRangeReader(f'{url}/no-ranges.zip')
+
+
+def test_extract_remote_zip(http_server, tmp_path):
+    url, content, requests = http_server
+    members = make_safe_zip(tmp_path / 'granule.zip')
+    content['/granule.zip'] = (tmp_path / 'granule.zip').read_bytes()
+
+    extract_dir = tmp_path / 'all'
+    summary = extract_remote_zip(f'{url}/redirect.zip', directory=str(extract_dir), buffer_size=4096)
+    assert sorted(summary.names) == sorted(members)
+    assert summary.skipped_size == 0
+    for name, data in members.items():
+        assert (extract_dir / name).read_bytes() == data
+
+    requests.clear()
+    extract_dir = tmp_path / 'some'
+    summary = extract_remote_zip(
+        f'{url}/granule.zip', directory=str(extract_dir), members=lambda name: '-vv-' in name, buffer_size=4096
+    )
+    assert sorted(summary.names) == sorted(name for name in members if '-vv-' in name)
+    assert summary.members == 6
+    assert summary.selected_size == 310_000
+    assert summary.skipped_size == sum(len(data) for data in members.values()) - 310_000
+    for name in summary.names:
+        assert (extract_dir / name).read_bytes() == members[name]
+    assert not (extract_dir / SAFE / 'measurement' / 's1a-iw1-slc-vh-001.tiff').exists()
+    assert len(requests) < 10
+
+
+def test_extract_remote_zip_dry_run(http_server, tmp_path):
+    url, content, requests = http_server
+    make_safe_zip(tmp_path / 'granule.zip')
+    content['/granule.zip'] = (tmp_path / 'granule.zip').read_bytes()
+
+    summary = extract_remote_zip(
+        f'{url}/granule.zip', directory=str(tmp_path / 'extract'), members=lambda name: '-vh-' not in name, dry_run=True
+    )
+    assert len(summary.names) == 5
+    assert summary.skipped_size == 300_000
+    assert summary.skipped_compressed_size == 300_000
+    assert not (tmp_path / 'extract').exists()
+    assert all(request != 'bytes=0-' for request in requests)
+
+
+def test_select_members(tmp_path):
+    members = make_safe_zip(tmp_path / 'granule.zip')
+    with ZipFile(tmp_path / 'granule.zip') as z:
+        summary = select_members(z)
+        assert summary.names == tuple(members)
+        assert summary.size == summary.selected_size == sum(len(data) for data in members.values())
+        assert summary.skipped_size == summary.skipped_compressed_size == 0
+
+        summary = select_members(z, lambda name: name.endswith('.tiff'))
+        assert len(summary.names) == 2
+        assert summary.selected_size == summary.selected_compressed_size == 600_000
+        assert str(summary) == (
+            f'2 of 6 members selected; skipping {summary.skipped_size} of {summary.size} bytes '
+            f'({summary.skipped_compressed_size} of {summary.compressed_size} compressed bytes)'
+        )
@@ -0,0 +1,81 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from hyp3_gamma.stats import QuantileSketch
+
+
+@pytest.fixture(params=['lognormal', 'normal'])
+def values(request):
+    rng = np.random.default_rng(0)
+    if request.param == 'lognormal':
+        return rng.lognormal(-2, 1, 100_000).astype(np.float32)
+    return rng.normal(100, 300, 100_000).astype(np.float32)
+
+
+def _value_at_rank(values, q):
+    return np.sort(values)[int(q / 100 * (values.size - 1))]
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.001])
+def test_percentile(values, relative_accuracy):
+    sketch = QuantileSketch(relative_accuracy)
+    for block in np.array_split(values, 7):
+        sketch.add(block)
+
+    assert sketch.count == values.size
+    for q in (1, 5, 25, 50, 75, 95, 99, 99.9):
+        expected = _value_at_rank(values, q)
+        assert sketch.percentile(q) == pytest.approx(expected, rel=relative_accuracy)
+    assert sketch.percentile(0) == values.min()
+    assert sketch.percentile(100) == values.max()
+
+
+def test_moments(values):
+    sketch = QuantileSketch().add(values)
+    assert sketch.mean == pytest.approx(values.mean(dtype=np.float64), rel=1e-9)
+    assert sketch.std == pytest.approx(values.std(dtype=np.float64), rel=1e-9)
+
+    top = np.percentile(values, 99)
+    clipped = np.clip(values.astype(np.float64), None, top)
+    mean, std = sketch.moments(upper=top)
+    assert mean == pytest.approx(clipped.mean(), rel=0.001)
+    assert std == pytest.approx(clipped.std(), rel=0.001)
+
+    bottom = np.percentile(values, 1)
+    clipped = np.clip(values.astype(np.float64), bottom, top)
+    mean, std = sketch.moments(lower=bottom, upper=top)
+    assert mean == pytest.approx(clipped.mean(), rel=0.001)
+    assert std == pytest.approx(clipped.std(), rel=0.001)
+
+
+def test_merge(values):
+    whole = QuantileSketch().add(values)
+    first, second = np.array_split(values, 2)
+    merged = QuantileSketch().add(first).merge(pickle.loads(pickle.dumps(QuantileSketch().add(second))))
+
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    assert merged.percentile(50) == whole.percentile(50)
+    assert merged.moments() == pytest.approx(whole.moments())
+
+    with pytest.raises(ValueError, match='relative accuracy'):
+        merged.merge(QuantileSketch(0.001))
+
+
+def test_zeros_and_non_finite_values():
+    sketch = QuantileSketch().add(np.array([-2.0, 0.0, 0.0, np.nan, np.inf, 3.0]))
+    assert sketch.count == 4
+    assert sketch.percentile(50) == 0.0
+    assert sketch.min == -2.0
+    assert sketch.max == 3.0
+    assert sketch.mean == pytest.approx(0.25)
+
+
+def test_empty():
+    sketch = QuantileSketch().add(np.array([np.nan]))
+    assert sketch.count == 0
+    with pytest.raises(ValueError, match='empty'):
+        sketch.percentile(50)
+    with pytest.raises(ValueError, match='empty'):
+        sketch.moments()
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from hyp3_gamma.task_runner import TaskRunner, get_max_workers
+
+
+def test_get_max_workers(monkeypatch):
+    monkeypatch.setenv('OMP_NUM_THREADS', '3')
+    assert get_max_workers() == 3
+
+    monkeypatch.setattr('os.cpu_count', lambda: 5)
+    monkeypatch.setenv('OMP_NUM_THREADS', '0')
+    assert get_max_workers() == 5
+    monkeypatch.setenv('OMP_NUM_THREADS', 'foo')
+    assert get_max_workers() == 5
+    monkeypatch.delenv('OMP_NUM_THREADS')
+    assert get_max_workers() == 5
+
+    assert TaskRunner().max_workers == 5
+    assert TaskRunner(max_workers=2).max_workers == 2
+
+
+def test_add():
+    tasks = TaskRunner()
+    tasks.add('a', print)
+    assert 'a' in tasks
+    assert len(tasks) == 1
+
+    with pytest.raises(ValueError, match='already been added'):
+        tasks.add('a', print)
+
+    with pytest.raises(ValueError, match='unknown task'):
+        tasks.add('b', print, depends_on=['c'])
+
+
+def test_run_respects_dependencies():
+    finished = []
+    lock = threading.Lock()
+
+    def task(name, seconds=0.0):
+        time.sleep(seconds)
+        with lock:
+            finished.append(name)
+        return name.upper()
+
+    tasks = TaskRunner(max_workers=4)
+    tasks.add('slow', task, 'slow', seconds=0.2)
+    tasks.add('fast', task, 'fast')
+    tasks.add('after_slow', task, 'after_slow', depends_on=['slow'])
+    tasks.add('after_both', task, name='after_both', depends_on=['after_slow', 'fast'])
+
+    results = tasks.run()
+
+    assert results == {'slow': 'SLOW', 'fast': 'FAST', 'after_slow': 'AFTER_SLOW', 'after_both': 'AFTER_BOTH'}
+    assert finished.index('fast') < finished.index('slow')
+    assert finished.index('slow') < finished.index('after_slow') < finished.index('after_both')
+
+
+def test_run_is_bounded():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def task():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    tasks = TaskRunner(max_workers=2)
+    for ii in range(6):
+        tasks.add(str(ii), task)
+    tasks.run()
+
+    assert peak == 2
+
+
+def test_run_stops_on_error():
+    ran: list[str] = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    tasks = TaskRunner(max_workers=1)
+    tasks.add('fail', fail)
+    tasks.add('dependent', ran.append, 'dependent', depends_on=['fail'])
+    tasks.add('independent', ran.append, 'independent')
+
+    with pytest.raises(RuntimeError, match='boom'):
+        tasks.run()
+    assert 'dependent' not in ran
+
+
+def test_run_cancels_queued_tasks_on_error():
+    ran = []
+    started = threading.Event()
+
+    def fail():
+        started.wait()
+        raise RuntimeError('boom')
+
+    def slow():
+        started.set()
+        time.sleep(0.1)
+        ran.append('slow')
+
+    tasks = TaskRunner(max_workers=2)
+    tasks.add('fail', fail)
+    tasks.add('slow', slow)
+    for ii in range(4):
+        tasks.add(f'queued{ii}', ran.append, f'queued{ii}')
+
+    with pytest.raises(RuntimeError, match='boom'):
+        tasks.run()
+    assert ran == ['slow']
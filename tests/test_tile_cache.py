@@ -0,0 +1,131 @@
+import hashlib
+import os
+
+import pytest
+
+from hyp3_gamma import prefetch_tiles, tile_cache, water_mask
+from hyp3_gamma.tile_cache import ChecksumError, TileCache
+
+
+def test_get_from_http(tmp_path, http_server):
+    url, content, requests = http_server
+    content['/tiles/n00e000.tif'] = b'tile' * 1000
+    cache = TileCache(tmp_path / 'cache')
+
+    path = cache.get(f'/vsicurl/{url}/tiles/n00e000.tif')
+    assert path == str(tmp_path / 'cache' / tile_cache.get_tile_name(f'{url}/tiles/n00e000.tif'))
+    assert path.endswith('-n00e000.tif')
+    assert open(path, 'rb').read() == content['/tiles/n00e000.tif']
+    assert len(requests) == 1
+
+    assert cache.get(f'/vsicurl/{url}/tiles/n00e000.tif') == path
+    assert cache.get(f'{url}/tiles/n00e000.tif') == path
+    assert len(requests) == 1
+
+    # a corrupt tile is fetched again
+    with open(path, 'r+b') as f:
+        f.write(b'xxxx')
+    assert open(cache.get(f'{url}/tiles/n00e000.tif'), 'rb').read() == content['/tiles/n00e000.tif']
+    assert len(requests) == 2
+
+
+def test_get_from_directory(tmp_path):
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    (tiles / 'n00e000.tif').write_bytes(b'tile')
+    (tmp_path / 'other').mkdir()
+    (tmp_path / 'other' / 'n00e000.tif').write_bytes(b'other tile')
+    cache = TileCache(tmp_path / 'cache')
+
+    path = cache.get(str(tiles / 'n00e000.tif'))
+    assert open(path, 'rb').read() == b'tile'
+    assert open(cache.get(str(tmp_path / 'other' / 'n00e000.tif')), 'rb').read() == b'other tile'
+
+    with pytest.raises(FileNotFoundError):
+        cache.get(str(tiles / 'missing.tif'))
+    assert len([name for name in os.listdir(tmp_path / 'cache') if not name.startswith('.')]) == 2
+    assert not [name for name in os.listdir(tmp_path / 'cache') if name.startswith('.tmp-')]
+
+
+def test_verify_etag():
+    md5 = hashlib.md5(b'tile').hexdigest()
+    tile_cache.verify_etag('url', f'"{md5}"', md5)
+    tile_cache.verify_etag('url', None, md5)
+    tile_cache.verify_etag('url', '"0123456789abcdef0123456789abcdef-2"', md5)
+    with pytest.raises(ChecksumError, match='ETag'):
+        tile_cache.verify_etag('url', '"0123456789abcdef0123456789abcdef"', md5)
+
+
+def test_evict(tmp_path):
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    cache = TileCache(tmp_path / 'cache')
+    paths = {}
+    for i, name in enumerate(['old', 'used', 'new']):
+        (tiles / name).write_bytes(bytes(40))
+        paths[name] = cache.get(str(tiles / name))
+        os.utime(paths[name], (i, i))
+    cache.max_bytes = 100
+
+    # using a tile makes it the most recently used
+    cache.get(str(tiles / 'old'))
+    assert cache.evict() == [os.path.basename(paths['used'])]
+    assert not os.path.exists(paths['used'])
+    assert not os.path.exists(tmp_path / 'cache' / f'.{os.path.basename(paths["used"])}.sha256')
+
+    cache.max_bytes = 0
+    with cache.use(str(tiles / 'new')):
+        assert cache.evict() == [os.path.basename(paths['old'])]
+    assert cache.evict() == [os.path.basename(paths['new'])]
+
+
+def test_use_holds_tiles(tmp_path):
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    for name in ('n00e000.tif', 'n01e000.tif'):
+        (tiles / name).write_bytes(bytes(40))
+    cache = TileCache(tmp_path / 'cache', max_bytes=0)
+
+    with cache.use(str(tiles / 'n00e000.tif')) as first:
+        # fetching another tile evicts the cache down to max_bytes, but not the tile in use
+        with cache.use(str(tiles / 'n01e000.tif')) as second:
+            assert cache.evict() == []
+            assert open(first, 'rb').read() == bytes(40)
+            assert open(second, 'rb').read() == bytes(40)
+        assert cache.evict() == [os.path.basename(second)]
+    assert cache.evict() == [os.path.basename(first)]
+
+
+def test_evict_vanished_tile(tmp_path):
+    cache = TileCache(tmp_path / 'cache', max_bytes=0)
+    # a tile that's gone by the time it's stat'ed, as when another job evicts it during the scan
+    (tmp_path / 'cache' / 'n00e000.tif').symlink_to(tmp_path / 'missing')
+    assert cache.evict() == []
+
+
+def test_tile_paths(tmp_path, monkeypatch):
+    (tmp_path / 'n00e000.tif').write_bytes(b'tile')
+    tile = str(tmp_path / 'n00e000.tif')
+
+    monkeypatch.delenv('HYP3_TILE_CACHE', raising=False)
+    with tile_cache.tile_paths([tile]) as paths:
+        assert paths == [tile]
+
+    monkeypatch.setenv('HYP3_TILE_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setenv('HYP3_TILE_CACHE_MAX_BYTES', '0')
+    with tile_cache.tile_paths([tile]) as paths:
+        assert paths == [str(tmp_path / 'cache' / tile_cache.get_tile_name(tile))]
+        assert open(paths[0], 'rb').read() == b'tile'
+
+
+def test_prefetch_water_mask_tiles(tmp_path, monkeypatch):
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    for name in ('n15w100.tif', 'n10w100.tif'):
+        (tiles / name).write_bytes(name.encode())
+    monkeypatch.setattr(water_mask, 'TILE_PATH', f'{tiles}/')
+
+    footprint = prefetch_tiles.read_footprint('POLYGON ((-96 14, -95 14, -95 16, -96 16, -96 14))')
+    cache = TileCache(tmp_path / 'cache')
+    paths = prefetch_tiles.prefetch_tiles([footprint, footprint], cache, dem=False)
+    assert sorted(open(path, 'rb').read() for path in paths) == [b'n10w100.tif', b'n15w100.tif']
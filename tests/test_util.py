@@ -1,6 +1,7 @@
 import os
 import shutil
 
+from PIL import Image
 from osgeo import gdal
 
 from hyp3_gamma import util
@@ -68,6 +69,78 @@ def test_unzip_granule_and_remove(tmp_path, test_data_dir):
     assert not os.path.exists(zip_file)
 
 
+def test_unzip_granule_polarizations_and_swaths(tmp_path, test_data_dir):
+    zip_file = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE.zip'
+    shutil.copy(test_data_dir / zip_file, tmp_path)
+    os.chdir(tmp_path)
+
+    safe_dir = util.unzip_granule(zip_file, polarizations=['VV'], swaths=[1, 3])
+    assert sorted(os.listdir(f'{safe_dir}/measurement')) == [
+        's1a-iw1-slc-vv-20170525t025147-20170525t025155-016732-01bca6-004.tiff',
+        's1a-iw3-slc-vv-20170525t025146-20170525t025157-016732-01bca6-006.tiff',
+    ]
+    assert sorted(os.listdir(f'{safe_dir}/annotation')) == [
+        'calibration',
+        's1a-iw1-slc-vv-20170525t025147-20170525t025155-016732-01bca6-004.xml',
+        's1a-iw3-slc-vv-20170525t025146-20170525t025157-016732-01bca6-006.xml',
+    ]
+    assert len(os.listdir(f'{safe_dir}/annotation/calibration')) == 4
+    assert os.path.isfile(f'{safe_dir}/manifest.safe')
+    assert os.path.isdir(f'{safe_dir}/support')
+
+
+def test_unzip_granule_dry_run(tmp_path, test_data_dir):
+    zip_file = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE.zip'
+    shutil.copy(test_data_dir / zip_file, tmp_path)
+    os.chdir(tmp_path)
+
+    safe_dir = util.unzip_granule(zip_file, remove=True, polarizations=['vv'], dry_run=True)
+    assert safe_dir == 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE.SAFE'
+    assert os.listdir(tmp_path) == [zip_file]
+
+
+def test_get_safe_member_filter():
+    safe = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE.SAFE'
+    names = [
+        f'{safe}/',
+        f'{safe}/manifest.safe',
+        f'{safe}/measurement/',
+        f'{safe}/measurement/s1a-iw1-slc-vv-20170525t025147-20170525t025155-016732-01bca6-004.tiff',
+        f'{safe}/measurement/s1a-iw2-slc-vh-20170525t025145-20170525t025156-016732-01bca6-002.tiff',
+        f'{safe}/annotation/s1a-iw3-slc-vh-20170525t025146-20170525t025157-016732-01bca6-003.xml',
+        f'{safe}/annotation/calibration/calibration-s1a-iw1-slc-vh-20170525t025147-20170525t025155-016732-01bca6-001.xml',
+        f'{safe}/annotation/calibration/noise-s1a-iw2-slc-vv-20170525t025145-20170525t025156-016732-01bca6-005.xml',
+        f'{safe}/annotation/rfi/rfi-s1a-iw3-slc-vv-20170525t025146-20170525t025157-016732-01bca6-006.xml',
+        f'{safe}/{safe}-report-20170525T123839.pdf',
+    ]
+
+    assert list(filter(util.get_safe_member_filter(), names)) == names
+    assert [name for name in names if not util.get_safe_member_filter(polarizations=['vv'])(name)] == [
+        names[4],
+        names[5],
+        names[6],
+    ]
+    assert [name for name in names if not util.get_safe_member_filter(swaths=[1, 2])(name)] == [names[5], names[8]]
+    assert [name for name in names if not util.get_safe_member_filter(['VH'], [3])(name)] == [
+        names[3],
+        names[4],
+        names[6],
+        names[7],
+        names[8],
+    ]
+    assert [name for name in names if not util.get_safe_member_filter(['vv'], required_only=True)(name)] == [
+        names[4],
+        names[5],
+        names[6],
+        names[9],
+    ]
+
+    grd = 'S1A_IW_GRDH_1SDV_20170525T025145_20170525T025157_016732_01BCA6_ABCD.SAFE'
+    is_needed = util.get_safe_member_filter(polarizations=['vv'], swaths=[1])
+    assert is_needed(f'{grd}/measurement/s1a-iw-grd-vv-20170525t025145-20170525t025157-016732-01bca6-001.tiff')
+    assert not is_needed(f'{grd}/measurement/s1a-iw-grd-vh-20170525t025145-20170525t025157-016732-01bca6-002.tiff')
+
+
 def test_set_pixel_as_point(tmp_path, test_data_dir):
     shutil.copy(test_data_dir / 'test_geotiff.tif', tmp_path)
     geotiff = str(tmp_path / 'test_geotiff.tif')
@@ -94,3 +167,92 @@ def test_set_pixel_as_point_with_shift(tmp_path, test_data_dir):
     point_info = gdal.Info(geotiff, format='json')
     assert point_info['metadata']['']['AREA_OR_POINT'] == 'Point'
     assert point_info['geoTransform'] == [440750.0, 60.0, 0.0, 3751290.0, 0.0, -60.0]
+
+
+def test_is_required_safe_member():
+    safe = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE.SAFE'
+    assert util.is_required_safe_member(f'{safe}/')
+    assert util.is_required_safe_member(f'{safe}/manifest.safe')
+    assert util.is_required_safe_member(f'{safe}/annotation/')
+    assert util.is_required_safe_member(f'{safe}/annotation/calibration/noise-s1a-iw1-slc-vh-001.xml')
+    assert util.is_required_safe_member(f'{safe}/measurement/s1a-iw1-slc-vh-001.tiff')
+    assert util.is_required_safe_member(f'{safe}/preview/map-overlay.kml')
+
+    assert not util.is_required_safe_member(f'{safe}/preview/quick-look.png')
+    assert not util.is_required_safe_member(f'{safe}/preview/icons/logo.png')
+    assert not util.is_required_safe_member(f'{safe}/support/s1-object-types.xsd')
+    assert not util.is_required_safe_member(f'{safe}/{safe}-report-20170525T123839.pdf')
+
+
+def test_get_granule_stream(tmp_path, test_data_dir, http_server, monkeypatch):
+    granule = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE'
+    url, content, _ = http_server
+    content['/granule.zip'] = (test_data_dir / f'{granule}.zip').read_bytes()
+    monkeypatch.setattr(util, 'get_download_url', lambda _: f'{url}/granule.zip')
+    monkeypatch.chdir(tmp_path)
+
+    safe_dir = util.get_granule(granule)
+    assert safe_dir == f'{granule}.SAFE'
+    assert os.path.isfile(f'{safe_dir}/manifest.safe')
+    assert os.path.isfile(f'{safe_dir}/preview/map-overlay.kml')
+    assert len(os.listdir(f'{safe_dir}/measurement')) == 6
+    assert not os.path.exists(f'{safe_dir}/support')
+    assert not os.path.exists(f'{safe_dir}/preview/quick-look.png')
+    assert os.listdir(tmp_path) == [safe_dir]
+
+
+def test_get_granule_stream_polarization(tmp_path, test_data_dir, http_server, monkeypatch):
+    granule = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE'
+    url, content, _ = http_server
+    content['/granule.zip'] = (test_data_dir / f'{granule}.zip').read_bytes()
+    monkeypatch.setattr(util, 'get_download_url', lambda _: f'{url}/granule.zip')
+    monkeypatch.chdir(tmp_path)
+
+    safe_dir = util.get_granule(granule, polarizations=['vv'], dry_run=True)
+    assert safe_dir == f'{granule}.SAFE'
+    assert os.listdir(tmp_path) == []
+
+    safe_dir = util.get_granule(granule, polarizations=['vv'])
+    assert len(os.listdir(f'{safe_dir}/measurement')) == 3
+    assert all('-vv-' in name for name in os.listdir(f'{safe_dir}/measurement'))
+
+
+def test_get_granule_stream_not_supported(tmp_path, test_data_dir, http_server, monkeypatch):
+    granule = 'S1A_IW_SLC__1SDV_20170525T025145_20170525T025157_016732_01BCA6_CEBE'
+    url, content, _ = http_server
+    content['/no-ranges.zip'] = (test_data_dir / f'{granule}.zip').read_bytes()
+    monkeypatch.setattr(util, 'get_download_url', lambda _: f'{url}/no-ranges.zip')
+
+    def download_file(download_url, chunk_size):
+        assert download_url == f'{url}/no-ranges.zip'
+        shutil.copy(test_data_dir / f'{granule}.zip', tmp_path)
+        return f'{granule}.zip'
+
+    monkeypatch.setattr(util, 'download_file', download_file)
+    monkeypatch.chdir(tmp_path)
+
+    safe_dir = util.get_granule(granule, dry_run=True)
+    assert safe_dir == f'{granule}.SAFE'
+    assert os.listdir(tmp_path) == []
+
+    safe_dir = util.get_granule(granule)
+    assert safe_dir == f'{granule}.SAFE'
+    assert os.path.isfile(f'{safe_dir}/preview/map-overlay.kml')
+    assert not os.path.exists(f'{safe_dir}/support')
+    assert not os.path.exists(f'{safe_dir}/preview/quick-look.png')
+    assert os.listdir(tmp_path) == [safe_dir]
+
+
+def test_create_thumbnails(tmp_path):
+    for name in ('product_VV.png', 'product_rgb.png'):
+        Image.new('L', (400, 200)).save(tmp_path / name)
+    (tmp_path / 'product_VV.tif').touch()
+
+    thumbnails = util.create_thumbnails(tmp_path, max_workers=2)
+    assert thumbnails == [tmp_path / 'product_VV_thumb.png', tmp_path / 'product_rgb_thumb.png']
+    for thumbnail in thumbnails:
+        assert Image.open(thumbnail).size == (100, 50)
+
+    assert util.create_thumbnails(tmp_path) == []
+    (tmp_path / 'product_rgb_thumb.png').unlink()
+    assert util.create_thumbnails(tmp_path) == [tmp_path / 'product_rgb_thumb.png']
@@ -78,3 +78,37 @@ def test_create_water_mask(tmp_path, test_data_dir):
     info_from_img = gdal.Info(output_image)
     info_from_txt = open(validation_text).read()
     assert info_from_img.split('\n')[4:] == info_from_txt.split('\n')[4:]
+
+
+def test_create_water_mask_local_tile(tmp_path, test_data_dir, monkeypatch):
+    tiles = tmp_path / 'tiles'
+    tiles.mkdir()
+    tile = str(tiles / 'n15w100.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(tile, 100, 100, 1, gdal.GDT_Byte)
+    ds.SetGeoTransform([-95.82, 0.0005, 0.0, 15.9, 0.0, -0.0005])
+    ds.SetProjection('EPSG:4326')
+    land = (np.indices((100, 100)).sum(axis=0) // 3 % 2).astype(np.uint8)
+    ds.GetRasterBand(1).WriteArray(land)
+    ds = None
+    monkeypatch.setattr(water_mask, 'TILE_PATH', f'{tiles}/')
+    monkeypatch.chdir(tmp_path)
+
+    output_image = str(tmp_path / 'water_mask.tif')
+    water_mask.create_water_mask(str(test_data_dir / 'water_mask_input.tif'), output_image)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['tiles', 'water_mask.tif']
+
+    output = gdal.Open(output_image)
+    assert output.GetRasterBand(1).DataType == gdal.GDT_Byte
+    assert output.GetRasterBand(1).GetNoDataValue() == 255
+
+    expected = gdal.Warp(
+        '',
+        tile,
+        format='MEM',
+        outputBounds=water_mask.get_extent(output_image, epsg='EPSG:32615'),
+        xRes=output.GetGeoTransform()[1],
+        yRes=output.GetGeoTransform()[1],
+        dstSRS='EPSG:32615',
+    ).ReadAsArray()
+    assert 0 < expected.sum() < expected.size
+    np.testing.assert_array_equal(output.ReadAsArray(), 1 - expected)